@@ -0,0 +1,255 @@
+"""
+CSV Ingest
+
+Reads the data of many candidates from the csv exports of an applicant tracking system, one
+candidate at a time: the rows of a candidate are read, assembled into a resume builder and handed
+over before the rows of the next candidate are read, so the memory used stays the same whatever
+the size of the export (a single pass over the files). Two layouts are supported:
+- a directory with the five csv files of the data directory, each with a "candidate id" column.
+  The files list the candidates in the same order (the order of personal_info.csv, one row per
+  candidate), with the rows of a candidate next to each other, as exports sorted by candidate are.
+  The order is checked by reading the candidate ids of the files once before the candidates;
+- a single csv file with a "candidate id" column and a "section" column (personal_info,
+  experience, education, certifications or skills) next to the columns of all the sections, with
+  the rows of a candidate next to each other.
+
+The encoding of the files is explicit instead of the default of the platform: a byte order mark
+decides it when there is one (UTF-8, or UTF-16/UTF-32 as written by the "Unicode text" export of
+Excel), otherwise the files are read as UTF-8 unless another encoding (e.g. cp1252) is given. The
+column headers are compared without case and surrounding spaces.
+"""
+
+import codecs
+import csv
+import os
+import re
+
+from resume_model import Certification, Education, Experience, PersonalInfo, ResumeDataError, Skill
+
+ID_COLUMN = "candidate id"
+SECTION_COLUMN = "section"
+DEFAULT_ENCODING = "utf-8"
+
+# The record class of every section (the section of the data directory file <section>.csv)
+SECTIONS = {"personal_info": PersonalInfo, "experience": Experience, "education": Education,
+            "certifications": Certification, "skills": Skill}
+
+_BOMS = ((codecs.BOM_UTF32_LE, "utf-32"), (codecs.BOM_UTF32_BE, "utf-32"), (codecs.BOM_UTF8, "utf-8-sig"),
+         (codecs.BOM_UTF16_LE, "utf-16"), (codecs.BOM_UTF16_BE, "utf-16")) # UTF-32 first: its LE mark starts like UTF-16's
+
+
+def detect_encoding(file_path, encoding=None) -> str:
+    """
+    Find the encoding of a text file from its byte order mark.
+
+    Args:
+        file_path (str): Path of the file.
+        encoding (str, optional): The encoding of a file without a byte order mark. Defaults to UTF-8.
+
+    Returns:
+        str: The encoding to read the file with (the byte order mark is skipped when reading).
+    """
+    with open(file_path, 'rb') as file:
+        start = file.read(4)
+    for bom, bom_encoding in _BOMS:
+        if start.startswith(bom):
+            return bom_encoding
+    return encoding or DEFAULT_ENCODING
+
+
+def open_csv(file_path, encoding=None):
+    """
+    Open a csv file for reading, with an explicit encoding (see detect_encoding) and without
+    newline translation, so quoted fields can hold line breaks.
+
+    Args:
+        file_path (str): Path of the csv file.
+        encoding (str, optional): The encoding of a file without a byte order mark. Defaults to UTF-8.
+
+    Returns:
+        TextIO: The open file.
+    """
+    return open(file_path, 'r', encoding=detect_encoding(file_path, encoding), newline="")
+
+
+def read_rows(file_path, encoding=None, required=()):
+    """
+    Read the rows of a csv file one at a time, with the headers in lower case.
+
+    Args:
+        file_path (str): Path of the csv file.
+        encoding (str, optional): The encoding of a file without a byte order mark.
+        required (Iterable[str]): Columns the file must have.
+
+    Yields:
+        tuple[int, dict]: The line number and the row.
+
+    Raises:
+        ResumeDataError: If a required column is missing or the file is not in the encoding.
+    """
+    with open_csv(file_path, encoding) as file:
+        reader = csv.DictReader(file)
+        try:
+            reader.fieldnames = [name.strip().lower() for name in reader.fieldnames or []]
+            for column in required:
+                if column not in reader.fieldnames:
+                    raise ResumeDataError(f"{file_path}: the '{column}' column is missing")
+            for row in reader:
+                yield reader.line_num, row
+        except UnicodeDecodeError as e:
+            raise ResumeDataError(f"{file_path} (after line {reader.line_num}): the file is not {file.encoding} text "
+                                  f"({e.reason}), give its encoding (e.g. cp1252)") from e
+
+
+def is_multi_candidate(directory, encoding=None, id_column=ID_COLUMN) -> bool:
+    """
+    Check if a data directory holds the export of many candidates (with a candidate id column).
+
+    Args:
+        directory (str): The directory of the five csv files.
+        encoding (str, optional): The encoding of a file without a byte order mark. Defaults to UTF-8.
+        id_column (str): The header of the candidate id column.
+
+    Returns:
+        bool: True if personal_info.csv has a candidate id column.
+    """
+    path = os.path.join(directory, "personal_info.csv")
+    if not os.path.isfile(path):
+        return False
+    # Only the header is checked, the errors of the other lines are reported when they are read
+    with open(path, 'r', encoding=detect_encoding(path, encoding), errors="replace", newline="") as file:
+        header = next(csv.reader(file), [])
+    return id_column in (name.strip().lower() for name in header)
+
+
+def candidate_filename(candidate_id) -> str:
+    """
+    Turn a candidate id into a name for the output files.
+
+    Args:
+        candidate_id (str): The candidate id.
+
+    Returns:
+        str: The id, with the characters that are not allowed in file names replaced by _.
+    """
+    return re.sub(r"[^\w.-]", "_", candidate_id.strip()) or "candidate"
+
+
+class _SectionReader:
+    """The rows of a section file, handed over by groups of rows of the same candidate."""
+
+    def __init__(self, file_path, encoding, id_column):
+        self.file_path = file_path
+        self.id_column = id_column
+        self.rows = read_rows(file_path, encoding, (id_column,))
+        self.next = next(self.rows, None) # the first row not handed over yet
+
+    def take(self, candidate_id) -> list:
+        """Get the rows of a candidate, if they are the next rows of the file."""
+        group = []
+        while self.next is not None and self.next[1][self.id_column] == candidate_id:
+            group.append(self.next)
+            self.next = next(self.rows, None)
+        return group
+
+
+def iter_directory(directory, encoding=None, id_column=ID_COLUMN, on_error=None):
+    """
+    Read the candidates of a directory with the five csv files, each with a candidate id column.
+
+    Args:
+        directory (str): The directory of the five csv files.
+        encoding (str, optional): The encoding of the files without a byte order mark. Defaults to UTF-8.
+        id_column (str): The header of the candidate id column.
+        on_error (callable, optional): Function called as on_error(candidate_id, error) for a candidate
+            with invalid rows, which is then skipped. Defaults to raising the error.
+
+    Yields:
+        tuple[str, ResumeBuilder]: The candidate id and the resume builder holding the candidate data.
+
+    Raises:
+        ResumeDataError: If a row is invalid (and there is no on_error), or the files do not list
+            the candidates in the same order.
+    """
+    # A first pass over the files, without creating the records, checks their order: a misordered
+    # export fails before any of its candidates is handed over (with some sections missing)
+    for _ in _iter_groups(directory, encoding, id_column):
+        pass
+    for candidate_id, groups in _iter_groups(directory, encoding, id_column):
+        yield from _assemble(candidate_id, groups, on_error)
+
+
+def _iter_groups(directory, encoding, id_column):
+    """Get the rows of every section of each candidate of a directory, raising at the end if rows were left over."""
+    readers = {}
+    try:
+        for section in SECTIONS:
+            readers[section] = _SectionReader(os.path.join(directory, f"{section}.csv"), encoding, id_column)
+        personal_info = readers["personal_info"]
+        while personal_info.next is not None:
+            candidate_id = personal_info.next[1][id_column]
+            yield candidate_id, {section: [(f"{reader.file_path} line {line}", row) for line, row in reader.take(candidate_id)]
+                                 for section, reader in readers.items()}
+
+        for reader in readers.values():
+            if reader.next is not None:
+                line, row = reader.next
+                raise ResumeDataError(f"{reader.file_path} line {line}: candidate {row[id_column]} is not in "
+                                      f"personal_info.csv, or the files do not list the candidates in the same order")
+    finally:
+        for reader in readers.values():
+            reader.rows.close()
+
+
+def iter_combined(file_path, encoding=None, id_column=ID_COLUMN, section_column=SECTION_COLUMN, on_error=None):
+    """
+    Read the candidates of a single csv file with a candidate id column and a section column.
+
+    Args:
+        file_path (str): Path of the csv file.
+        encoding (str, optional): The encoding of a file without a byte order mark. Defaults to UTF-8.
+        id_column (str): The header of the candidate id column.
+        section_column (str): The header of the column naming the section of each row.
+        on_error (callable, optional): Function called as on_error(candidate_id, error) for a candidate
+            with invalid rows, which is then skipped. Defaults to raising the error.
+
+    Yields:
+        tuple[str, ResumeBuilder]: The candidate id and the resume builder holding the candidate data.
+
+    Raises:
+        ResumeDataError: If a row is invalid (and there is no on_error).
+    """
+    candidate_id, groups = None, None
+    for line, row in read_rows(file_path, encoding, (id_column, section_column)):
+        if row[id_column] != candidate_id:
+            if groups is not None:
+                yield from _assemble(candidate_id, groups, on_error)
+            candidate_id, groups = row[id_column], {section: [] for section in SECTIONS}
+        section = (row[section_column] or "").strip().lower()
+        groups.setdefault(section, []).append((f"{file_path} line {line}", row))
+    if groups is not None:
+        yield from _assemble(candidate_id, groups, on_error)
+
+
+def _assemble(candidate_id, groups, on_error):
+    """Create the resume builder of a candidate from the rows of each section."""
+    from resume_builder import ResumeBuilder
+
+    try:
+        unknown = [rows[0][0] + f": unknown section '{section}'" for section, rows in groups.items() if section not in SECTIONS]
+        if unknown:
+            raise ResumeDataError(f"{unknown[0]} (expected one of {', '.join(SECTIONS)})")
+        if len(groups["personal_info"]) != 1:
+            raise ResumeDataError(f"candidate {candidate_id}: expected one row of personal information, "
+                                  f"found {len(groups['personal_info'])}")
+        builder = ResumeBuilder()
+        for section, record_class in SECTIONS.items():
+            records = [record_class.from_row(row, source) for source, row in groups[section]]
+            setattr(builder, section, records[0] if section == "personal_info" else records)
+        builder.is_loaded = True
+    except ResumeDataError as e:
+        if on_error is None:
+            raise
+        on_error(candidate_id, e)
+        return
+    yield candidate_id, builder
@@ -0,0 +1,159 @@
+"""
+Data Tracker
+
+Keeps the resume data of a data directory between two generations, so clicking "Generate" again
+does not redo work for files that did not change. The state of every csv file (modification time,
+size and content hash) is remembered with the records parsed from it:
+- a file with the same modification time and size is not read again;
+- a file that was saved again without edits (new modification time, same hash) is read and
+  hashed, but not parsed again;
+- only the files whose content changed are parsed again.
+
+The tracker also remembers the fingerprint (the hashes of the data files, of the template and of
+the generation options) of every output it generated, so a generation whose inputs did not change
+since its output was written can be skipped. The reload and skip decisions are printed.
+"""
+
+import hashlib
+import os
+import threading
+from dataclasses import dataclass
+
+from csv_ingest import SECTIONS
+
+
+@dataclass
+class FileState:
+    """The state of a file when it was last hashed."""
+    mtime_ns: int
+    size: int
+    digest: str
+
+
+def file_digest(file_path) -> str:
+    """
+    Hash the content of a file.
+
+    Args:
+        file_path (str): Path of the file.
+
+    Returns:
+        str: The hex SHA-256 digest of the file.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DataTracker:
+    """The resume data of a data directory, reparsed only for the csv files that changed."""
+
+    def __init__(self, data_dir="data"):
+        self.data_dir = data_dir
+        self.states = {} # path -> FileState of every file hashed so far
+        self.records = {} # section -> (digest of its csv file, records parsed from it)
+        self.generated = {} # output path -> (fingerprint of its inputs, modification time of the output)
+        self._lock = threading.Lock() # the generations run on the worker threads of the GUI
+
+    def _digest(self, file_path) -> str:
+        """Get the digest of a file, hashing it again only if its modification time or size changed."""
+        stat = os.stat(file_path)
+        state = self.states.get(file_path)
+        if state is not None and state.mtime_ns == stat.st_mtime_ns and state.size == stat.st_size:
+            return state.digest
+        digest = file_digest(file_path)
+        self.states[file_path] = FileState(stat.st_mtime_ns, stat.st_size, digest)
+        return digest
+
+    def load(self, builder=None):
+        """
+        Load the resume data of the data directory into a resume builder, parsing again only
+        the csv files whose content changed since the last load.
+
+        Args:
+            builder (ResumeBuilder, optional): The resume builder to fill. Defaults to a new one.
+
+        Returns:
+            ResumeBuilder: The resume builder holding the data.
+
+        Raises:
+            ResumeDataError: If a csv file is invalid. It is parsed again on the next load.
+        """
+        if builder is None:
+            from resume_builder import ResumeBuilder
+            builder = ResumeBuilder()
+
+        with self._lock:
+            reparsed = []
+            for section in SECTIONS:
+                path = os.path.join(self.data_dir, f"{section}.csv")
+                digest = self._digest(path)
+                cached = self.records.get(section)
+                if cached is None or cached[0] != digest:
+                    self.records.pop(section, None)
+                    getattr(builder, f"load_{section}")(path) # parses the file into the builder
+                    self.records[section] = (digest, getattr(builder, section))
+                    reparsed.append(f"{section}.csv")
+                else:
+                    records = cached[1]
+                    setattr(builder, section, records if section == "personal_info" else list(records))
+
+        if not reparsed:
+            print(f"Data: no changes in {self.data_dir}, reused the parsed files")
+        elif len(reparsed) == len(SECTIONS):
+            print(f"Data: parsed the {len(SECTIONS)} files of {self.data_dir}")
+        else:
+            print(f"Data: parsed {', '.join(reparsed)} again, reused the {len(SECTIONS) - len(reparsed)} unchanged files")
+        return builder
+
+    def fingerprint(self, *file_paths, options=()) -> str:
+        """
+        Get the fingerprint of the inputs of a generation: the data files, the given files (e.g.
+        the template) and the options of the generation.
+
+        Args:
+            *file_paths (str): The files the generation reads besides the data files.
+            options (Iterable): Other values the output depends on, e.g. the output filename.
+
+        Returns:
+            str: The hex digest of the inputs.
+        """
+        digest = hashlib.sha256()
+        with self._lock:
+            paths = [os.path.join(self.data_dir, f"{section}.csv") for section in SECTIONS] + list(file_paths)
+            for path in paths:
+                digest.update(self._digest(path).encode() if os.path.isfile(path) else b"missing")
+                digest.update(b"\0")
+        digest.update(repr(tuple(options)).encode("utf-8"))
+        return digest.hexdigest()
+
+    def is_up_to_date(self, output_path, fingerprint) -> bool:
+        """
+        Check if an output was generated from the same inputs and was not changed since.
+
+        Args:
+            output_path (str): Path of the generated file, e.g. the PDF.
+            fingerprint (str): The fingerprint of the inputs (see fingerprint).
+
+        Returns:
+            bool: True if generating it again would give the same output.
+        """
+        generated = self.generated.get(output_path)
+        if generated is None or generated[0] != fingerprint:
+            return False
+        try:
+            return os.stat(output_path).st_mtime_ns == generated[1]
+        except OSError: # removed, e.g. by "Clean Output Directory"
+            return False
+
+    def mark_generated(self, output_path, fingerprint):
+        """
+        Remember that an output was generated from some inputs.
+
+        Args:
+            output_path (str): Path of the generated file.
+            fingerprint (str): The fingerprint of the inputs (see fingerprint).
+        """
+        self.generated[output_path] = (fingerprint, os.stat(output_path).st_mtime_ns)
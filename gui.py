@@ -1,15 +1,36 @@
+import json
 import os
+import shutil
 import time
+STARTUP = time.perf_counter() # for the startup timing report
+
 import tkinter as tk
-from tkinter import messagebox, filedialog
-from tkPDFViewer2 import tkPDFViewer as pdf
-from resume_builder import ResumeBuilder
-from resume_improver import ResumeImprover
-from resume_rater import ResumeRater
-from resume_latex_generator import ResumeLatexGenerator
+from tkinter import messagebox
+from resume_builder import DOCUMENT_CLASS, ResumeBuilder
+from resume_model import ResumeDataError
+from resume_database import DATABASE_PATH, get_resume_database
+from latex_compiler import compile_latex
+from data_tracker import DataTracker
+from gui_pdf import PdfView
+from gui_tasks import TaskExecutor, TaskPanel
+
+# The LLM modules (with requests), the file dialogs, PyMuPDF and the live preview are imported on
+# first use, so they do not slow down the start of the GUI
+
+def report_startup(event):
+    """
+    Print how long after the start of the GUI an event happened, if startup_timing=1 is set in
+    the environment.
+
+    Args:
+        event (str): The event, e.g. window interactive.
+    """
+    if os.getenv("startup_timing", "0").lower() not in ("0", "off", "false", ""):
+        print(f"[startup] {event}: {(time.perf_counter() - STARTUP) * 1000:.0f} ms")
 
 class ResumeBuilderGUI:
     def __init__(self, window):
+        report_startup("modules imported")
 
         ## Header Section
         self.window = window
@@ -17,10 +38,10 @@ class ResumeBuilderGUI:
 
         ## ReadMe Section
 
-        self.readme = tk.Frame(window, width=100, bg='grey')
-        pdf_obj = pdf.ShowPdf()
-        pdf_view = pdf_obj.pdf_view(window, pdf_location="ReadMe.pdf", width=100, height=50)
-        pdf_view.pack(expand=True, fill='both', side='right')
+        # The pages of the ReadMe are rendered in the background, one at a time, once the window is up
+        self.readme = PdfView(window, on_page=self.readme_page_shown)
+        self.readme.pack(expand=True, fill='both', side='right')
+        self.window.after_idle(self.readme.load, "ReadMe.pdf")
 
         ## Sidebar Section
         self.sidebar = tk.Frame(window, width=200, bg='grey')
@@ -31,11 +52,11 @@ class ResumeBuilderGUI:
         self.fill_env_button = tk.Button(self.sidebar, text="Fill .env File", command=self.fill_env, width=20, height=2)
         self.fill_env_button.pack()
 
-        # Button for saving the current resume builder to a file
+        # Button for saving the current resume builder to the resume database
         self.save_button = tk.Button(self.sidebar, text="Save Resume Builder", command=self.save_state, width=20, height=2)
         self.save_button.pack()
 
-        # Button for loading a resume builder from a file
+        # Button for finding and loading a saved resume builder
         self.load_button = tk.Button(self.sidebar, text="Load Resume Builder", command=self.load_state, width=20, height=2)
         self.load_button.pack()
 
@@ -55,10 +76,21 @@ class ResumeBuilderGUI:
         self.generate_button = tk.Button(self.sidebar, text="Generate from Template", command=self.generate_resume_from_template_latex, width=20, height=2)
         self.generate_button.pack()
 
+        # The compiles and the calls to the model run in the background: the task panel shows
+        # the running and queued operations, with a button to cancel each of them
+        self.tasks = TaskExecutor(window)
+        self.task_panel = TaskPanel(self.sidebar, self.tasks, bg='grey')
+        self.task_panel.pack(fill='x', pady=10)
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+
         ## Main Section
 
         self.builder = ResumeBuilder()
 
+        # The parsed data directory: only the CSV files that changed are parsed again, and a
+        # generation is skipped when its data and template did not change since its output
+        self.data = DataTracker('data')
+
         # Output filename
         self.filename_label = tk.Label(window, text="Output Filename:")
         self.filename_label.pack()
@@ -70,6 +102,13 @@ class ResumeBuilderGUI:
         self.preserve_check = tk.Checkbutton(window, text="Preserve LaTeX File", variable=self.preserve_var)
         self.preserve_check.pack()
 
+        # Live preview: a pane showing the resume PDF, compiled again whenever the CSV files in
+        # the data directory (or the template class) change
+        self.preview = None # created the first time it is shown
+        self.preview_var = tk.BooleanVar()
+        self.preview_check = tk.Checkbutton(window, text="Live Preview", variable=self.preview_var, command=self.toggle_preview)
+        self.preview_check.pack()
+
         # Generate button
         self.generate_button = tk.Button(window, text="Generate Resume", command=self.generate_resume, width=20, height=2)
         self.generate_button.pack()
@@ -89,6 +128,14 @@ class ResumeBuilderGUI:
         self.feedback_text = tk.Text(window, height=10, width=50)
         self.feedback_text.pack()
 
+        report_startup("window built")
+        self.window.after(0, report_startup, "window interactive")
+
+    def readme_page_shown(self, pages):
+        """Report the first page of the ReadMe in the startup timing report."""
+        if pages == 1:
+            report_startup("first ReadMe page shown")
+
     def fill_env(self):
         def save_env():
             with open('.env', 'w') as f:
@@ -124,16 +171,50 @@ class ResumeBuilderGUI:
         if not self.builder.is_loaded:
             messagebox.showerror("Resume Builder", "Empty resume builder! Please generate a resume first!")
             return
-        self.builder.save_resume_builder_pkl(filename)
+        self.builder.save_resume_builder(filename)
         messagebox.showinfo("Resume Builder", "Resume builder state saved successfully!")
         self.feedback_text.delete("1.0", tk.END)
         self.feedback_text.insert(tk.END, "Resume builder state saved successfully!")
 
     def load_state(self):
-        filepath = filedialog.askopenfilename(initialdir="saved", title="Select file", filetypes=((".pkl files", "*.pkl"),))
+        from gui_saved import SavedResumesWindow
+
+        # Find the resume in the resume database (or load it from a file)
+        SavedResumesWindow(self.window, self.load_saved_state, self.load_state_file)
+
+    def load_saved_state(self, name) -> bool:
+        """
+        Load a resume builder state saved in the resume database.
+
+        Args:
+            name (str): The name the state was saved under.
+
+        Returns:
+            bool: True if the state was loaded.
+        """
+        try:
+            loaded = self.builder.load_saved_resume(name)
+        except ResumeDataError as e:
+            messagebox.showerror("Resume Builder", f"Could not load the resume builder state: {e}")
+            return False
+        if loaded:
+            self.show_state_loaded()
+        return loaded
+
+    def load_state_file(self):
+        from tkinter import filedialog
+
+        filepath = filedialog.askopenfilename(initialdir="saved", title="Select file", filetypes=(("Saved resumes", "*.resume *.pkl"),))
         if len(filepath.strip()) == 0: # the user closed the dialog and didn't select a file
             return
-        self.builder.load_resume_builder_pkl(filepath)
+        try:
+            self.builder.load_resume_builder(filepath)
+        except (ResumeDataError, OSError) as e:
+            messagebox.showerror("Resume Builder", f"Could not load the resume builder state: {e}")
+            return
+        self.show_state_loaded()
+
+    def show_state_loaded(self):
         messagebox.showinfo("Resume Builder", "Resume builder state loaded successfully!")
         self.feedback_text.delete("1.0", tk.END)
         self.feedback_text.insert(tk.END, "Resume builder state loaded successfully!")
@@ -144,20 +225,33 @@ class ResumeBuilderGUI:
             messagebox.showerror("Resume Builder", "Please enter a filename for the output PDF in the Output Filename field!")
             return
         preserve_latex = self.preserve_var.get()
-
-        # Load data from csv files
-        self.builder.load_personal_info('data/personal_info.csv')
-        self.builder.load_education('data/education.csv')
-        self.builder.load_experience('data/experience.csv')
-        self.builder.load_certifications('data/certifications.csv')
-        self.builder.load_skills('data/skills.csv')
-
-        # Generate the resume
-        try:
-            self.builder.generate_resume(output_filename, preserve_latex=preserve_latex)
-            messagebox.showinfo("Resume Builder", "Resume generated successfully!")
-        except Exception as e:
-            messagebox.showerror("Resume Builder", f"Error: {e}")
+        output_path = f"output/{output_filename}.pdf"
+
+        def work(task):
+            # Skip the generation if the output was generated from the same data and template
+            fingerprint = self.data.fingerprint(DOCUMENT_CLASS + ".cls", options=(output_filename, preserve_latex))
+            if self.data.is_up_to_date(output_path, fingerprint):
+                print(f"Skipped generating {output_path}: the data and the template did not change since it was generated.")
+                return None
+
+            # Load data from csv files (only the changed ones are parsed again)
+            builder = self.data.load()
+
+            # Generate the resume
+            task.set_progress("compiling")
+            if builder.generate_resume(output_filename, preserve_latex=preserve_latex, on_job=task.watch_job):
+                self.data.mark_generated(output_path, fingerprint)
+            return builder
+
+        def done(builder):
+            if builder is None:
+                messagebox.showinfo("Resume Builder", f"{output_path} is up to date: the data and the template did not change since it was generated.")
+                return
+            self.builder = builder
+            if self.show_compile_result("Resume Builder", builder.compile_result):
+                messagebox.showinfo("Resume Builder", "Resume generated successfully!")
+
+        self.tasks.submit(f"Generate {output_filename}", work, done, self.show_error("Resume Builder"))
 
     def clean_output_directory(self) -> bool:
         """
@@ -167,45 +261,90 @@ class ResumeBuilderGUI:
             bool: True if the output directory was cleaned successfully.
         """
         for file in os.listdir("output"):
-            os.remove(os.path.join("output", file))
+            path = os.path.join("output", file)
+            if os.path.isdir(path): # e.g. the output/batch directory of the batch mode
+                shutil.rmtree(path)
+            else:
+                os.remove(path)
         print("Output directory cleaned!")
         messagebox.showinfo("Resume Builder", "Output directory cleaned!")
         return True
 
     def clean_saved_directory(self) -> bool:
         """
-        Clean the saved directory by removing all the saved resume builder files.
+        Clean the saved directory by removing all the saved resume builders (use the "Load Resume
+        Builder" window to delete some of them only).
 
         Returns:
             bool: True if the saved directory was cleaned successfully.
         """
+        get_resume_database().clear()
         for file in os.listdir("saved"):
-            os.remove(os.path.join("saved", file))
+            path = os.path.join("saved", file)
+            if not path.startswith(DATABASE_PATH): # the database and its journal stay (empty)
+                os.remove(path)
         print("Saved directory cleaned!")
         messagebox.showinfo("Resume Builder", "Saved directory cleaned!")
         return True
 
     def improve_resume(self):
-        content = self.builder.get_resume_builder_json()
-        print(content)
+        from llm_client import LLMError
+        from resume_improver import ResumeImprover
+
         if not self.builder.is_loaded:
             messagebox.showerror("Resume Builder", "Please generate a resume first!")
             return
 
-        resume_improver = ResumeImprover()
-        reply_text = resume_improver.get_advice(content, prompt="You are a resume writing tutor. Your job is to improve the quality of the user's resume and make the expression as professional and human-like as possible, while not distorting the truth. Please provide the improved version of the resume following the original JSON format. DO NOT change ANY of the keys.")
-        self.feedback_text.delete("1.0", tk.END)
-        self.feedback_text.insert(tk.END, reply_text)
-
-        if not isinstance(reply_text, Exception):
+        # Only the entries that changed since the last improvement are sent to the model, and the
+        # replies are shown in the feedback box as they stream in
+        self.clear_feedback()
+        resume_data = json.loads(self.builder.get_resume_builder_json())
+
+        def work(task):
+            def on_token(label, text):
+                task.check_cancelled()
+                task.call_in_gui(self.stream_feedback_entry, label, text)
+
+            task.set_progress("asking the model")
+            resume_improver = ResumeImprover()
+            improved_data, report = resume_improver.improve_entries(resume_data, on_token=on_token)
+            print(report.summary())
+            if len(report.improved) == 0 and len(report.reused) == 0:
+                raise LLMError(report.failed[0][1])
+            reply_text = json.dumps(improved_data, indent=2)
+            task.call_in_gui(self.show_improvement, report, reply_text)
+
+            task.check_cancelled()
+            task.set_progress("compiling")
             improve_resume_builder = ResumeBuilder()
             improve_resume_builder.load_resume_builder_json(reply_text)
-            improve_resume_builder.generate_resume("improved_resume_" + time.strftime("%Y-%m-%d-%H_%M_%S"), preserve_latex=False)
-            messagebox.showinfo("Resume Builder", "Resume improved successfully!")
-        else:
-            messagebox.showerror("Resume Builder", f"Error: {reply_text}")
+            improve_resume_builder.generate_resume("improved_resume_" + time.strftime("%Y-%m-%d-%H_%M_%S"),
+                                                   preserve_latex=False, on_job=task.watch_job)
+            return improve_resume_builder.compile_result
+
+        def done(result):
+            if self.show_compile_result("Resume Builder", result):
+                messagebox.showinfo("Resume Builder", "Resume improved successfully!")
+
+        self.tasks.submit("Improve resume", work, done, self.show_error("Resume Builder"))
+
+    def show_improvement(self, report, reply_text):
+        """
+        Replace the streamed replies in the feedback box by the summary and the improved resume data.
+
+        Args:
+            report (ImprovementReport): Which entries were improved, reused or kept.
+            reply_text (str): The improved resume builder data in JSON format.
+        """
+        self.clear_feedback()
+        self.feedback_text.insert(tk.END, report.summary() + "\n")
+        for label, error in report.failed:
+            self.feedback_text.insert(tk.END, f"Kept {label} as it was: {error}\n")
+        self.feedback_text.insert(tk.END, "\n" + reply_text)
 
     def rate_resume(self):
+        from resume_rater import ResumeRater
+
         content = self.builder.get_resume_content()
         theme = self.input_text.get("1.0", tk.END)
         if not self.builder.is_loaded:
@@ -216,17 +355,79 @@ class ResumeBuilderGUI:
             messagebox.showerror("Resume Builder", "Please enter a theme in the input text box!")
             return
 
-        resume_rater = ResumeRater()
-        reply_text = resume_rater.get_advice(theme, content)
+        # The rating is shown in the feedback box as it streams in
+        self.clear_feedback()
+
+        def work(task):
+            def on_token(text):
+                task.check_cancelled()
+                task.call_in_gui(self.stream_feedback, text)
+
+            # The offline pre-screen takes a millisecond, so it is shown while the model answers
+            from resume_scorer import ResumeScorer
+            result = ResumeScorer().score(content, theme)
+            missing = ", ".join(result.missing) or "none"
+            task.call_in_gui(self.stream_feedback, f"Offline pre-screen: {result.score:.0f}/100 (missing keywords: {missing})\n\n")
+
+            task.set_progress("asking the model")
+            resume_rater = ResumeRater()
+            return resume_rater.get_advice(theme, content, on_token=on_token)
+
+        self.tasks.submit("Rate resume", work, lambda reply_text: messagebox.showinfo("Resume Builder", "Resume rated successfully!"),
+                          self.show_error("Resume Builder"))
+
+    def show_error(self, title):
+        """
+        Get a function that shows the error of a failed task in a message box.
+
+        Args:
+            title (str): The title of the message box.
+
+        Returns:
+            callable: The function, to pass as the on_error of a task.
+        """
+        def on_error(e):
+            print(f"Error: {e}")
+            messagebox.showerror(title, f"Error: {e}")
+        return on_error
+
+    def clear_feedback(self):
+        """Empty the feedback box, including the blocks of the streamed entries."""
         self.feedback_text.delete("1.0", tk.END)
-        self.feedback_text.insert(tk.END, reply_text)
+        for mark in self.feedback_text.mark_names():
+            if mark.startswith("entry_"):
+                self.feedback_text.mark_unset(mark)
 
-        if not isinstance(reply_text, Exception):
-            messagebox.showinfo("Resume Builder", "Resume rated successfully!")
-        else:
-            messagebox.showerror("Resume Builder", f"Error: {reply_text}")
+    def stream_feedback(self, text):
+        """
+        Append a piece of a streamed reply to the feedback box and show it right away.
+
+        Args:
+            text (str): The piece of the reply.
+        """
+        self.feedback_text.insert(tk.END, text)
+        self.feedback_text.see(tk.END)
+
+    def stream_feedback_entry(self, label, text):
+        """
+        Append a piece of a streamed reply for one resume entry to the feedback box. Every entry
+        gets its own block (under a [label] header), so concurrent replies do not get mixed up.
+
+        Args:
+            label (str): The label of the entry, e.g. experience 2.
+            text (str): The piece of the reply.
+        """
+        mark = "entry_" + label.replace(" ", "_")
+        if mark not in self.feedback_text.mark_names():
+            self.feedback_text.insert(tk.END, f"[{label}]\n\n\n")
+            self.feedback_text.mark_set(mark, "end-3c") # before the blank line that ends the block
+            self.feedback_text.mark_gravity(mark, tk.RIGHT)
+        self.feedback_text.insert(mark, text)
+        self.feedback_text.see(mark)
 
     def compile_resume_from_latex(self):
+        from tkinter import filedialog
+
         filename = self.filename_entry.get()
         if len(filename.strip()) == 0:
             messagebox.showerror("Resume Compiler", "Please enter a filename for the output PDF in the Output Filename field!")
@@ -235,44 +436,41 @@ class ResumeBuilderGUI:
         latex_filepath = filedialog.askopenfilename(initialdir="output", title="Select file", filetypes=((".tex files", "*.tex"),))
         if len(latex_filepath.strip()) == 0: # the user closed the dialog and didn't select a file
             return
-        self.builder = ResumeBuilder()
-
-        try:
-            # Compile the LaTeX file to generate the PDF
-            print("Outputing resume pdf...")
-            os.system(f'xelatex "{latex_filepath}" -output-directory=output -interaction=nonstopmode')
-
-            # Check if the PDF file was generated successfully and rename it
-            latex_filename = latex_filepath.split("/")[-1].removesuffix(".tex")
-            if os.path.exists(f"output/{latex_filename}.pdf"):
-                os.rename(f"output/{latex_filename}.pdf", f"output/{filename}.pdf")
 
+        def work(task):
+            try:
+                # Compile the LaTeX file to generate the PDF (named after the output filename)
+                print("Outputing resume pdf...")
+                task.set_progress("compiling")
+                # A file of the user is compiled as the engine would on its own: it recovers from its
+                # errors, which are listed in the feedback box
+                return compile_latex(latex_filepath, "output", jobname=filename, on_job=task.watch_job, halt_on_error=False)
+            finally:
+                # The compile has exited by now: clean up the auxiliary files right away
+                self.remove_auxiliary_files(filename)
+
+        def done(result):
+            if not self.show_compile_result("Resume Compiler", result):
+                return
+
+            self.builder = ResumeBuilder()
             self.builder.is_loaded = True
             print("\nResume generated successfully!")
 
             # Save the resume builder data to a file
-            self.builder.save_resume_builder_pkl(filename)
-            messagebox.showinfo("Resume Compiler", "Resume compiled successfully!")
-
-        except Exception as e:
-            print(f"Error: {e}")
-            messagebox.showerror("Resume Compiler", f"Error: {e}")
-        
-        finally:
-            # Clean up temporary files
-            time.sleep(1)
-            if os.path.exists("output/temp_resume.pdf"):
-                os.remove("output/temp_resume.pdf")
+            self.builder.save_resume_builder(filename)
+            if result.errors:
+                messagebox.showwarning("Resume Compiler", f"Resume compiled, but the LaTeX engine reported {len(result.errors)} "
+                                                          f"errors (see the feedback box): the PDF may have glitches.")
+            else:
+                messagebox.showinfo("Resume Compiler", "Resume compiled successfully!")
 
-            # Remove auxiliary files
-            try:
-                os.remove("output/temp_resume.aux")
-                os.remove("output/temp_resume.log")
-                os.remove("output/temp_resume.out")
-            except:
-                pass
+        self.tasks.submit(f"Compile {filename}", work, done, self.show_error("Resume Compiler"))
 
     def generate_resume_from_template_latex(self):
+        from tkinter import filedialog
+        from resume_latex_generator import ResumeLatexGenerator, TemplateSkeletonError
+
         filename = self.filename_entry.get()
         if len(filename.strip()) == 0:
             messagebox.showerror("Resume LaTeX Generator", "Please enter a filename for the output PDF in the Output Filename field!")
@@ -282,17 +480,20 @@ class ResumeBuilderGUI:
         if len(template_filepath.strip()) == 0:
             return
         
-        # Load data from csv files
-        self.builder = ResumeBuilder()
-        self.builder.load_personal_info('data/personal_info.csv')
-        self.builder.load_education('data/education.csv')
-        self.builder.load_experience('data/experience.csv')
-        self.builder.load_certifications('data/certifications.csv')
-        self.builder.load_skills('data/skills.csv')
-        self.builder.is_loaded = True
-
-        resume_latex_generator = ResumeLatexGenerator()
-        data = self.builder.get_resume_content()
+        # The skeleton of the template may have been edited or forgotten since (see template_skeleton.py), so an
+        # unchanged generation is only skipped if the user agrees
+        output_path = f"output/{filename}.pdf"
+        fingerprint = self.data.fingerprint(template_filepath, options=(filename,))
+        if self.data.is_up_to_date(output_path, fingerprint):
+            if not messagebox.askyesno("Resume LaTeX Generator", f"The data and the template did not change since {output_path} was generated. Generate it again?"):
+                print(f"Skipped generating {output_path}: the data and the template did not change since it was generated.")
+                return
+
+        # Load data from csv files (only the changed ones are parsed again)
+        builder = self.data.load()
+        builder.is_loaded = True
+
+        data = builder.get_resume_content()
         with open(template_filepath, 'r', encoding="utf-8") as file:
             template = file.read()
         
@@ -304,45 +505,114 @@ class ResumeBuilderGUI:
             messagebox.showerror("Resume LaTeX Generator", "Please provide a non-empty LaTeX example file!")
             return
 
-        try:
-            # Generate the resume from the template LaTeX file
-            reply_text = resume_latex_generator.get_latex(data, template)
-            if isinstance(reply_text, Exception):
-                messagebox.showerror("Resume LaTeX Generator", f"Error: {reply_text}")
-
-            # Save the generated LaTeX file
-            with open(f"output/{filename}.tex", 'w', encoding="utf-8") as file:
-                file.write(reply_text)
-
-            self.feedback_text.delete("1.0", tk.END)
-            self.feedback_text.insert(tk.END, reply_text)
-
-            # Compile the LaTeX file to generate the PDF
-            print("Outputing resume pdf...")
+        def work(task):
             try:
-                os.system(f'xelatex "output/{filename}.tex" -output-directory=output -interaction=nonstopmode')
-            except Exception as e:
-                print(f"Error: {e}")
-                messagebox.showerror("Resume LaTeX Generator", f"Error: {e}")
+                # Fill the skeleton of the template LaTeX file (the model is only asked the first time the template is used)
+                task.set_progress("filling the template")
+                resume_latex_generator = ResumeLatexGenerator()
+                try:
+                    reply_text = resume_latex_generator.render_resume(builder, template)
+                except TemplateSkeletonError as e:
+                    print(f"The template could not be turned into a skeleton ({e}), asking the model for the whole resume instead.")
+                    task.set_progress("asking the model")
+                    reply_text = resume_latex_generator.get_latex(data, template)
+                task.check_cancelled()
+
+                # Save the generated LaTeX file
+                with open(f"output/{filename}.tex", 'w', encoding="utf-8") as file:
+                    file.write(reply_text)
+                task.call_in_gui(self.show_feedback, reply_text)
+
+                # Compile the LaTeX file to generate the PDF
+                print("Outputing resume pdf...")
+                task.set_progress("compiling")
+                result = compile_latex(f"output/{filename}.tex", "output", on_job=task.watch_job)
+                if result.success:
+                    self.data.mark_generated(output_path, fingerprint)
+                return result
+            finally:
+                self.remove_auxiliary_files(filename)
+
+        def done(result):
+            if not self.show_compile_result("Resume LaTeX Generator", result):
+                return
 
             # Save the resume builder data to a file
-            self.builder.save_resume_builder_pkl(filename)
+            self.builder = builder
+            self.builder.save_resume_builder(filename)
             messagebox.showinfo("Resume LaTeX Generator", "Resume generated successfully!")
 
-        except Exception as e:
-            messagebox.showerror("Resume LaTeX Generator", f"Error: {e}")
+        self.tasks.submit(f"Generate {filename} from template", work, done, self.show_error("Resume LaTeX Generator"))
 
-        finally:
-            time.sleep(1)
+    def show_feedback(self, text):
+        """
+        Show a text in the feedback box, replacing its contents.
 
-            # Remove auxiliary files
-            try:
-                os.remove(f"output/{filename}.aux")
-                os.remove(f"output/{filename}.log")
-                os.remove(f"output/{filename}.out")
-            except:
-                pass
+        Args:
+            text (str): The text to show.
+        """
+        self.clear_feedback()
+        self.feedback_text.insert(tk.END, text)
 
+    def show_compile_result(self, title, result) -> bool:
+        """
+        Show the diagnostics of a compile at the end of the feedback box, and an error message if
+        the compile did not produce a PDF.
+
+        Args:
+            title (str): The title of the error message.
+            result (CompileResult): The outcome of the compile.
+
+        Returns:
+            bool: True if the PDF was produced.
+        """
+        lines = [str(issue) for issue in result.preflight] + [str(diagnostic) for diagnostic in result.diagnostics]
+        if lines:
+            separator = "\n\n" if self.feedback_text.get("1.0", "end-1c") else ""
+            self.stream_feedback(f"{separator}[Compile diagnostics]\n" + "\n".join(lines) + "\n")
+        if result.success:
+            return True
+        if result.cancelled:
+            messagebox.showinfo(title, result.error_message())
+        elif result.log_excerpt and not result.timed_out and not result.errors: # the errors are in the message
+            messagebox.showerror(title, f"{result.error_message()}\n\n{result.log_excerpt}")
+        else:
+            messagebox.showerror(title, result.error_message())
+        return False
+
+    def remove_auxiliary_files(self, jobname):
+        """
+        Remove the auxiliary files that the LaTeX engine left in the output directory.
+
+        Args:
+            jobname (str): Base name of the compiled files.
+        """
+        for extension in (".aux", ".log", ".out"):
+            path = f"output/{jobname}{extension}"
+            if os.path.exists(path):
+                os.remove(path)
+
+    def toggle_preview(self):
+        """Show the live preview pane and start watching the data files, or hide it and stop."""
+        if self.preview_var.get():
+            if self.preview is None:
+                from gui_preview import LivePreview
+                self.preview = LivePreview(self.window, data_dir='data')
+            self.preview.pack(expand=True, fill='both', side='right')
+            self.preview.start()
+        elif self.preview is not None:
+            self.preview.stop()
+            self.preview.pack_forget()
+
+    def close(self):
+        """Cancel the running and queued tasks, then close the window."""
+        if self.preview is not None:
+            self.preview.stop()
+            self.preview.executor.shutdown()
+            self.preview.view.close()
+        self.readme.close()
+        self.tasks.shutdown()
+        self.window.destroy()
 
 if __name__ == "__main__":
     root = tk.Tk()
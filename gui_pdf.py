@@ -0,0 +1,312 @@
+"""
+GUI PDF View
+
+A scrollable view of the pages of a PDF for the GUI. Only the pages in view, plus a few pages of
+prefetch around them, are rasterised (with PyMuPDF, on a background worker), and the rendered
+pages are kept in a least recently used cache bounded by the memory of the images. Scrolling
+away from a page drops it from the canvas, and zooming renders the pages again at the new scale
+when they come into view. The memory used therefore stays the same however long the document
+is. PyMuPDF itself is only imported when the first PDF is opened.
+"""
+
+import bisect
+import tkinter as tk
+from collections import OrderedDict
+
+from gui_tasks import TaskExecutor
+
+ZOOM = 1.0 # scale of the rendered pages (1.0 is 72 dpi)
+ZOOM_STEP = 1.25
+MIN_ZOOM = 0.25
+MAX_ZOOM = 4.0
+PAGE_GAP = 10 # pixels around the pages
+PREFETCH_PAGES = 2 # pages rendered ahead of (and behind) the pages in view
+CACHE_BYTES = 64 * 1024 * 1024 # memory for the rendered pages
+
+
+def render_page(page, zoom=ZOOM) -> bytes:
+    """
+    Render a page of a PDF into an image.
+
+    Args:
+        page (pymupdf.Page): The page.
+        zoom (float): Scale of the page.
+
+    Returns:
+        bytes: The page as a PPM image, ready for tk.PhotoImage.
+    """
+    import pymupdf # loaded on first use: importing it takes longer than opening the window
+    return page.get_pixmap(matrix=pymupdf.Matrix(zoom, zoom), alpha=False).tobytes("ppm")
+
+
+class PageCache:
+    """A least recently used cache of rendered pages, bounded by the memory of the images."""
+
+    def __init__(self, max_bytes=CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.pages = OrderedDict() # (page index, zoom) -> tk.PhotoImage
+        self.bytes = 0
+
+    @staticmethod
+    def size(image) -> int:
+        """The memory used by an image (Tk keeps 4 bytes per pixel)."""
+        return image.width() * image.height() * 4
+
+    def get(self, key):
+        """
+        Get a rendered page and mark it as recently used.
+
+        Args:
+            key (tuple[int, float]): The page index and the zoom.
+
+        Returns:
+            tk.PhotoImage: The rendered page, or None if it is not in the cache.
+        """
+        image = self.pages.get(key)
+        if image is not None:
+            self.pages.move_to_end(key)
+        return image
+
+    def put(self, key, image, pinned=()):
+        """
+        Add a rendered page and evict the least recently used pages while over the memory limit.
+
+        Args:
+            key (tuple[int, float]): The page index and the zoom.
+            image (tk.PhotoImage): The rendered page.
+            pinned (Collection[tuple[int, float]]): Keys that must not be evicted (the pages in view).
+
+        Returns:
+            list[tuple[int, float]]: The keys of the evicted pages.
+        """
+        if key in self.pages:
+            self.bytes -= self.size(self.pages.pop(key))
+        self.pages[key] = image
+        self.bytes += self.size(image)
+
+        evicted = []
+        for old_key in list(self.pages):
+            if self.bytes <= self.max_bytes:
+                break
+            if old_key == key or old_key in pinned:
+                continue
+            self.bytes -= self.size(self.pages.pop(old_key))
+            evicted.append(old_key)
+        return evicted
+
+    def clear(self):
+        """Remove all the rendered pages."""
+        self.pages.clear()
+        self.bytes = 0
+
+
+class PdfView(tk.Frame):
+    """A scrollable view of the pages of a PDF that only renders the pages around the view."""
+
+    def __init__(self, master, zoom=ZOOM, width=640, height=800, on_page=None, cache_bytes=CACHE_BYTES, **kwargs):
+        super().__init__(master, **kwargs)
+        self.zoom = zoom
+        self.on_page = on_page # called with the number of pages rendered since the PDF was opened
+        self.cache = PageCache(cache_bytes)
+        self.page_sizes = [] # (width, height) of every page in points
+        self.offsets = [] # top of every page on the canvas at the current zoom
+        self.items = {} # page index -> canvas item of the pages near the view
+        self.wanted = set() # indexes of the pages near the view
+        self.visible = set() # keys of the pages in view, never evicted from the cache
+        self.pending = [] # page indexes the render task is working on
+        self.rendered = 0
+        self.generation = 0 # changes with every PDF opened, to drop the pages of the previous one
+        self.render_task = None
+        self._document = None # only used on the worker thread
+        self._update_scheduled = False
+
+        # Opening and rendering run on one worker thread, which owns the open document
+        self.executor = TaskExecutor(self, max_workers=1)
+
+        toolbar = tk.Frame(self)
+        toolbar.pack(fill="x", side="top")
+        tk.Button(toolbar, text="-", width=2, command=self.zoom_out).pack(side="left")
+        tk.Button(toolbar, text="+", width=2, command=self.zoom_in).pack(side="left")
+        self.zoom_label = tk.Label(toolbar, text=f"{self.zoom:.0%}")
+        self.zoom_label.pack(side="left")
+        self.page_label = tk.Label(toolbar, text="")
+        self.page_label.pack(side="right")
+
+        scroll_y = tk.Scrollbar(self, orient="vertical")
+        scroll_y.pack(fill="y", side="right")
+        self.canvas = tk.Canvas(self, width=width, height=height, bg="grey", highlightthickness=0)
+        self.canvas.pack(expand=True, fill="both", side="left")
+
+        def on_scroll(first, last):
+            scroll_y.set(first, last)
+            self._schedule_update()
+
+        self.canvas.config(yscrollcommand=on_scroll)
+        scroll_y.config(command=self.canvas.yview)
+        self.canvas.bind("<Configure>", lambda event: self._schedule_update())
+        self.canvas.bind("<MouseWheel>", self._on_wheel) # Windows and MacOS
+        self.canvas.bind("<Button-4>", lambda event: self.canvas.yview_scroll(-3, "units")) # Linux
+        self.canvas.bind("<Button-5>", lambda event: self.canvas.yview_scroll(3, "units"))
+        self.canvas.bind("<Control-MouseWheel>", lambda event: self.zoom_in() if event.delta > 0 else self.zoom_out())
+
+    def load(self, pdf, keep_position=False):
+        """
+        Show a PDF, replacing the current one. The pages are rendered when they come into view.
+
+        Args:
+            pdf (str | bytes): Path of the PDF, or its contents (e.g. of a file that a new compile
+                may overwrite while it is shown).
+            keep_position (bool): Flag to keep the scroll position, e.g. for a new version of the same document.
+        """
+        self.generation += 1
+        generation = self.generation
+        position = self.canvas.yview()[0] if keep_position else 0.0
+        self._cancel_render()
+        self.cache.clear()
+        self.page_sizes = []
+        self.rendered = 0
+        self._layout()
+        name = pdf if isinstance(pdf, str) else "the PDF"
+
+        def work(task):
+            import pymupdf
+            if self._document is not None:
+                self._document.close()
+            self._document = pymupdf.open(stream=pdf, filetype="pdf") if isinstance(pdf, bytes) else pymupdf.open(pdf)
+            return [(page.rect.width, page.rect.height) for page in self._document]
+
+        self.executor.submit(f"Open {name}", work, lambda sizes: self._set_pages(generation, sizes, position),
+                             lambda e: print(f"Error: could not show {name}: {e}"))
+
+    def set_zoom(self, zoom):
+        """
+        Change the scale of the pages. The pages in view are rendered again at the new scale.
+
+        Args:
+            zoom (float): The new scale (1.0 is 72 dpi).
+        """
+        zoom = min(max(zoom, MIN_ZOOM), MAX_ZOOM)
+        if zoom == self.zoom:
+            return
+        position = self.canvas.yview()[0]
+        self.zoom = zoom
+        self.zoom_label.config(text=f"{zoom:.0%}")
+        self._cancel_render()
+        self.cache.clear() # the pages at the old scale are of no use anymore
+        self._layout()
+        self.canvas.yview_moveto(position)
+        self._update()
+
+    def zoom_in(self):
+        self.set_zoom(self.zoom * ZOOM_STEP)
+
+    def zoom_out(self):
+        self.set_zoom(self.zoom / ZOOM_STEP)
+
+    def close(self):
+        """Stop rendering the pages."""
+        self.generation += 1
+        self.executor.shutdown()
+
+    def _set_pages(self, generation, sizes, position=0.0):
+        if generation != self.generation:
+            return
+        self.page_sizes = sizes
+        self._layout()
+        self.canvas.yview_moveto(position)
+        self._update()
+
+    def _layout(self):
+        """Place the pages on the canvas at the current zoom (only the pages near the view get an image)."""
+        self.canvas.delete("all")
+        self.items = {}
+        self.offsets = []
+        top, width = PAGE_GAP, 0
+        for page_width, page_height in self.page_sizes:
+            self.offsets.append(top)
+            top += round(page_height * self.zoom) + PAGE_GAP
+            width = max(width, round(page_width * self.zoom))
+        self.canvas.config(scrollregion=(0, 0, width + 2 * PAGE_GAP, top))
+
+    def _schedule_update(self):
+        # Scrolling fires many events: update the pages once they are handled
+        if not self._update_scheduled:
+            self._update_scheduled = True
+            self.after_idle(self._update)
+
+    def _update(self):
+        """Show the cached pages near the view and render the missing ones."""
+        self._update_scheduled = False
+        if not self.page_sizes:
+            return
+        count = len(self.page_sizes)
+        top = self.canvas.canvasy(0)
+        bottom = self.canvas.canvasy(self.canvas.winfo_height())
+        first = max(bisect.bisect_right(self.offsets, top) - 1, 0)
+        last = max(bisect.bisect_right(self.offsets, bottom) - 1, first)
+        self.page_label.config(text=f"Page {first + 1} / {count}")
+
+        # The pages in view first, then the prefetch below and above them
+        wanted = list(range(first, last + 1)) + list(range(last + 1, min(last + 1 + PREFETCH_PAGES, count))) \
+            + list(range(max(first - PREFETCH_PAGES, 0), first))
+        self.visible = {(index, self.zoom) for index in range(first, last + 1)}
+        self.wanted = set(wanted)
+
+        for index in list(self.items):
+            if index not in wanted:
+                self.canvas.delete(self.items.pop(index))
+        missing = []
+        for index in wanted:
+            image = self.cache.get((index, self.zoom))
+            if image is None:
+                missing.append(index)
+            elif index not in self.items:
+                self._draw(index, image)
+
+        if not set(missing) <= set(self.pending): # the running render does not cover the view anymore
+            self._cancel_render()
+            self._render(missing)
+
+    def _draw(self, index, image):
+        if index in self.items:
+            self.canvas.delete(self.items[index])
+        self.items[index] = self.canvas.create_image(PAGE_GAP, self.offsets[index], image=image, anchor="nw")
+
+    def _render(self, indexes):
+        generation, zoom = self.generation, self.zoom
+        self.pending = indexes
+
+        def work(task):
+            for index in indexes:
+                task.check_cancelled()
+                task.call_in_gui(self._add_page, generation, zoom, index, render_page(self._document[index], zoom))
+
+        self.render_task = self.executor.submit("Render pages", work, lambda result: self._render_done(generation))
+
+    def _render_done(self, generation):
+        if generation == self.generation:
+            self.pending = []
+
+    def _cancel_render(self):
+        if self.render_task is not None:
+            self.render_task.cancel()
+            self.render_task = None
+        self.pending = []
+
+    def _add_page(self, generation, zoom, index, page):
+        if generation != self.generation or zoom != self.zoom: # a page of a replaced PDF or of an old zoom
+            return
+        image = tk.PhotoImage(data=page)
+        for evicted_index, evicted_zoom in self.cache.put((index, zoom), image, self.visible):
+            if evicted_zoom == self.zoom and evicted_index in self.items:
+                self.canvas.delete(self.items.pop(evicted_index))
+        if index in self.wanted:
+            self._draw(index, image)
+        self.rendered += 1
+        if self.on_page is not None:
+            self.on_page(self.rendered)
+
+    def _on_wheel(self, event):
+        # Windows reports multiples of 120, MacOS small deltas
+        steps = event.delta // 120 if abs(event.delta) >= 120 else (1 if event.delta > 0 else -1)
+        self.canvas.yview_scroll(-steps, "units")
@@ -0,0 +1,179 @@
+"""
+GUI Live Preview
+
+A pane that shows the resume PDF and keeps it up to date while the CSV files are edited. The data
+files (data/*.csv) and the chosen template class are polled for changes (a few stat calls every
+fraction of a second, so an idle preview costs next to nothing). Once they stop changing for a
+short debounce interval, the resume is rendered again on a background worker.
+
+Only the CSV files whose content changed are parsed again (see data_tracker.py). The compile is
+skipped when the rendered LaTeX and the class did not change (e.g. a CSV file was saved without
+edits), and the pages shown are only replaced after a compile succeeds, so a typo in a CSV file
+never blanks the preview. The pages are shown in a PdfView (see gui_pdf.py), which only renders
+the pages around the view, however long the resume is.
+"""
+
+import glob
+import os
+import time
+import tkinter as tk
+
+from data_tracker import DataTracker
+from gui_pdf import PdfView
+from gui_tasks import TaskExecutor
+from latex_compiler import ENGINE, compile_latex
+from pdf_cache import PdfCache
+from resume_builder import DOCUMENT_CLASS, DOCUMENT_CLASS_OPTIONS
+
+PREVIEW_DIR = os.path.join(".cache", "preview")
+WATCH_INTERVAL = 300 # milliseconds between two checks of the watched files
+DEBOUNCE = 0.5 # seconds without changes before the preview is rendered again
+ZOOM = 0.8 # scale of the rendered pages (1.0 is 72 dpi)
+
+
+def template_classes(templates_dir="templates"):
+    """
+    Get the template classes of a directory, as written in \\documentclass.
+
+    Args:
+        templates_dir (str): The directory of the .cls files.
+
+    Returns:
+        list[str]: The class names, e.g. templates/resume_config.
+    """
+    return [os.path.splitext(path)[0].replace(os.sep, "/") for path in sorted(glob.glob(os.path.join(templates_dir, "*.cls")))]
+
+
+class LivePreview(tk.Frame):
+    """A pane showing the resume PDF, compiled again whenever its data or its template class change."""
+
+    def __init__(self, master, data_dir="data", document_class=DOCUMENT_CLASS, class_options=DOCUMENT_CLASS_OPTIONS, **kwargs):
+        super().__init__(master, **kwargs)
+        self.data_dir = data_dir
+        self.document_class = document_class
+        self.class_options = class_options
+        self.data = DataTracker(data_dir) # only the CSV files that changed are parsed again
+
+        self.signature = None # the state of the watched files at the last check
+        self.changed_at = None # when the watched files last changed, if the preview is behind
+        self.rendered_key = None # the cache key of the LaTeX shown in the preview
+        self.task = None
+        self._after_id = None
+
+        # Only one preview compile runs at a time, on its own worker, so it never waits behind
+        # the tasks of the main window
+        self.executor = TaskExecutor(self, max_workers=1)
+
+        header = tk.Frame(self)
+        header.pack(fill="x")
+        self.class_var = tk.StringVar(value=document_class)
+        classes = template_classes() or [document_class]
+        tk.OptionMenu(header, self.class_var, *classes, command=self.set_document_class).pack(side="left")
+        self.status_label = tk.Label(header, text="", anchor="w")
+        self.status_label.pack(side="left", fill="x", expand=True)
+
+        self.view = PdfView(self, zoom=ZOOM, width=500)
+        self.view.pack(expand=True, fill="both")
+
+    def start(self):
+        """Render the preview and start watching the files."""
+        self.signature = None # the first check sees a change
+        if self._after_id is None:
+            self._watch()
+
+    def stop(self):
+        """Stop watching the files and cancel the running compile."""
+        if self._after_id is not None:
+            self.after_cancel(self._after_id)
+            self._after_id = None
+        if self.task is not None:
+            self.task.cancel()
+
+    def set_document_class(self, document_class):
+        """
+        Preview the resume with another template class.
+
+        Args:
+            document_class (str): The class name as written in \\documentclass.
+        """
+        self.document_class = document_class # the new class file changes the signature
+
+    def watched_files(self):
+        """
+        Get the files the preview depends on.
+
+        Returns:
+            list[str]: The CSV files of the data directory and the template class file.
+        """
+        return sorted(glob.glob(os.path.join(self.data_dir, "*.csv"))) + [self.document_class + ".cls"]
+
+    def _signature(self):
+        signature = []
+        for path in self.watched_files():
+            try:
+                stat = os.stat(path)
+                signature.append((path, stat.st_mtime_ns, stat.st_size))
+            except OSError: # removed (or being replaced by an editor)
+                signature.append((path, None, None))
+        return tuple(signature)
+
+    def _watch(self):
+        now = time.monotonic()
+        signature = self._signature()
+        if signature != self.signature:
+            self.signature = signature
+            self.changed_at = now
+            if self.task is not None and self.task.active:
+                self.task.cancel() # its data is outdated: start over once the edits settle
+
+        busy = self.task is not None and self.task.active
+        if self.changed_at is not None and now - self.changed_at >= DEBOUNCE and not busy:
+            self.changed_at = None
+            self._render()
+        self._after_id = self.after(WATCH_INTERVAL, self._watch)
+
+    def _render(self):
+        document_class, class_options, rendered_key = self.document_class, self.class_options, self.rendered_key
+
+        def work(task):
+            builder = self.data.load()
+            latex = builder.render_latex(document_class, class_options)
+            key = PdfCache.make_key(latex, ENGINE) # covers the class file as well
+            if key == rendered_key:
+                return None
+
+            task.call_in_gui(self._set_status, "Compiling...")
+            os.makedirs(PREVIEW_DIR, exist_ok=True)
+            tex_path = os.path.join(PREVIEW_DIR, "preview.tex")
+            with open(tex_path, 'w', encoding="utf-8") as file:
+                file.write(latex)
+            result = compile_latex(tex_path, PREVIEW_DIR, quiet=True, on_job=task.watch_job)
+            task.check_cancelled()
+            # The contents are shown, not the file: the next compile overwrites it
+            if not result.success:
+                return key, result, None
+            with open(result.pdf_path, 'rb') as file:
+                return key, result, file.read()
+
+        self.task = self.executor.submit("Live preview", work, self._show,
+                                         lambda e: self._set_status(f"Could not render the preview: {e}"))
+
+    def _show(self, outcome):
+        if outcome is None:
+            self._set_status("Up to date (no changes to compile)")
+            return
+        key, result, pdf = outcome
+        if pdf is None:
+            message = "timed out" if result.timed_out else str(result.errors[0]) if result.errors \
+                else (result.log_excerpt.splitlines() or ["no PDF"])[0]
+            self._set_status(f"LaTeX error, showing the last good version: {message}")
+            return
+
+        # Swap in the new version and keep the scroll position
+        self.view.load(pdf, keep_position=True)
+        self.rendered_key = key
+        source = "from the PDF cache" if result.cached else f"compiled in {result.elapsed:.1f}s"
+        self._set_status(f"Updated at {time.strftime('%H:%M:%S')} ({source})")
+
+    def _set_status(self, text):
+        self.status_label.config(text=text)
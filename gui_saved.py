@@ -0,0 +1,126 @@
+"""
+GUI Saved Resumes
+
+A window to find, load and delete the resume builders saved in the resume database (see
+resume_database.py). The saved resumes are listed page by page from the most recent save, and can
+be filtered by the start of the save name, the candidate name, the email, a company or a school,
+or searched by the words of their bullets. The queries use the indexes of the database and take a
+few milliseconds, so they run on the main thread.
+"""
+
+import time
+import tkinter as tk
+from tkinter import messagebox
+
+from resume_database import PAGE_SIZE, get_resume_database
+
+# The filters of the window, and the matching fields of the database (None for the full-text search)
+FIELDS = {"Candidate": "name", "Save name": "save", "Email": "email", "Company": "company", "School": "school",
+          "Bullets (words)": None}
+
+
+class SavedResumesWindow(tk.Toplevel):
+    """A window listing the saved resumes, with a filter, paging, and buttons to load or delete them."""
+
+    def __init__(self, master, on_load, on_load_file=None, page_size=PAGE_SIZE, **kwargs):
+        super().__init__(master, **kwargs)
+        self.title("Saved Resumes")
+        self.on_load = on_load # called with the name of the resume to load, returns True if it was loaded
+        self.page_size = page_size
+        self.database = get_resume_database()
+        self.pages = [None] # the last resume before each page up to the current one (None for the first page)
+        self.resumes = [] # the resumes of the current page
+        self.has_next = False
+
+        search = tk.Frame(self)
+        search.pack(fill="x")
+        self.field_var = tk.StringVar(value="Candidate")
+        tk.OptionMenu(search, self.field_var, *FIELDS, command=lambda value: self.refresh()).pack(side="left")
+        self.query_entry = tk.Entry(search, width=40)
+        self.query_entry.pack(side="left", fill="x", expand=True)
+        self.query_entry.bind("<Return>", lambda event: self.refresh())
+        tk.Button(search, text="Search", command=self.refresh).pack(side="left")
+
+        listing = tk.Frame(self)
+        listing.pack(expand=True, fill="both")
+        scroll_y = tk.Scrollbar(listing, orient="vertical")
+        scroll_y.pack(fill="y", side="right")
+        self.listbox = tk.Listbox(listing, width=110, height=20, selectmode="extended", font="TkFixedFont",
+                                  yscrollcommand=scroll_y.set)
+        self.listbox.pack(expand=True, fill="both", side="left")
+        scroll_y.config(command=self.listbox.yview)
+        self.listbox.bind("<Double-Button-1>", lambda event: self.load_selected())
+
+        buttons = tk.Frame(self)
+        buttons.pack(fill="x")
+        self.previous_button = tk.Button(buttons, text="< Previous", command=self.previous_page)
+        self.previous_button.pack(side="left")
+        self.next_button = tk.Button(buttons, text="Next >", command=self.next_page)
+        self.next_button.pack(side="left")
+        self.page_label = tk.Label(buttons, text="")
+        self.page_label.pack(side="left")
+        tk.Button(buttons, text="Delete", command=self.delete_selected).pack(side="right")
+        tk.Button(buttons, text="Load", command=self.load_selected).pack(side="right")
+        if on_load_file is not None: # e.g. a .resume file, or a .pkl file saved by an older version
+            tk.Button(buttons, text="Load from File...", command=on_load_file).pack(side="right")
+
+        self.refresh()
+        self.query_entry.focus_set()
+
+    def refresh(self):
+        """Show the first page of the resumes matching the filter."""
+        self.pages = [None]
+        self._show_page()
+
+    def next_page(self):
+        if self.has_next:
+            self.pages.append(self.resumes[-1])
+            self._show_page()
+
+    def previous_page(self):
+        if len(self.pages) > 1:
+            self.pages.pop()
+            self._show_page()
+
+    def load_selected(self):
+        """Load the selected resume into the resume builder and close the window."""
+        selected = self._selected()
+        if len(selected) != 1:
+            messagebox.showerror("Saved Resumes", "Please select one resume to load!", parent=self)
+            return
+        if self.on_load(selected[0].name):
+            self.destroy()
+
+    def delete_selected(self):
+        """Delete the selected resumes, after a confirmation."""
+        selected = self._selected()
+        if not selected:
+            messagebox.showerror("Saved Resumes", "Please select the resumes to delete!", parent=self)
+            return
+        names = ", ".join(resume.name for resume in selected[:5]) + (", ..." if len(selected) > 5 else "")
+        if not messagebox.askyesno("Saved Resumes", f"Delete {len(selected)} saved resume(s)? ({names})", parent=self):
+            return
+        self.database.delete(resume.id for resume in selected)
+        self._show_page()
+
+    def _selected(self) -> list:
+        return [self.resumes[index] for index in self.listbox.curselection()]
+
+    def _show_page(self):
+        # One more resume than the page is fetched, to know if there is a next page
+        after = self.pages[-1]
+        field, text = FIELDS[self.field_var.get()], self.query_entry.get().strip()
+        if field is None and text:
+            resumes = self.database.search(text, after, self.page_size + 1)
+        else:
+            resumes = self.database.list_page(field, text, after, self.page_size + 1)
+        self.has_next = len(resumes) > self.page_size
+        self.resumes = resumes[:self.page_size]
+
+        self.listbox.delete(0, tk.END)
+        for resume in self.resumes:
+            saved = time.strftime("%Y-%m-%d %H:%M", time.localtime(resume.saved))
+            self.listbox.insert(tk.END, f"{resume.name[:30]:<32}{resume.candidate[:30]:<32}{resume.email[:34]:<36}{saved}")
+        self.page_label.config(text=f"Page {len(self.pages)} of the {self.database.count()} saved resumes")
+        self.previous_button.config(state="normal" if len(self.pages) > 1 else "disabled")
+        self.next_button.config(state="normal" if self.has_next else "disabled")
@@ -0,0 +1,239 @@
+"""
+GUI Tasks
+
+Runs the slow operations of the GUI (LaTeX compiles and calls to the language model) on
+background worker threads, so the window stays responsive while they run. Tk widgets may only be
+touched from the main thread: the workers hand their results, progress and streamed text back
+through a queue that the main thread drains with after() callbacks.
+
+Operations are queued when all the workers are busy, and every task can be cancelled: a queued
+task is skipped, a running compile is killed and a streamed reply stops at its next piece. The
+task panel lists the running and recent tasks with their status and elapsed time.
+"""
+
+import queue
+import threading
+import time
+import tkinter as tk
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+POLL_INTERVAL = 50 # milliseconds between two checks of the result queue
+REFRESH_INTERVAL = 250 # milliseconds between two updates of the elapsed times in the task panel
+MAX_FINISHED_TASKS = 5 # number of finished tasks still shown in the task panel
+
+
+class TaskCancelled(Exception):
+    """Raised inside a task that was cancelled, to stop it at the next check."""
+
+
+class Task:
+    """An operation queued on (or running on) the task executor."""
+
+    def __init__(self, executor, name):
+        self.executor = executor
+        self.name = name
+        self.status = "queued" # then running, and finally done, failed or cancelled
+        self.progress = ""
+        self.started = None
+        self.finished = None
+        self.cancelled = False
+        self._cancel_callbacks = []
+        self._lock = threading.Lock()
+
+    @property
+    def active(self) -> bool:
+        return self.status in ("queued", "running")
+
+    @property
+    def elapsed(self) -> float:
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.monotonic()) - self.started
+
+    def cancel(self):
+        """Cancel the task: a queued task is skipped and the cancel callbacks of a running task are called."""
+        with self._lock:
+            if self.cancelled or not self.active:
+                return
+            self.cancelled = True
+            callbacks = list(self._cancel_callbacks)
+        for callback in callbacks:
+            callback()
+        # cancel may be called from a worker thread: the listeners update Tk widgets on the main thread
+        self.executor._calls.put((self.executor._changed, ()))
+
+    def on_cancel(self, callback):
+        """
+        Register a function to call when the task is cancelled. It is called right away if the
+        task was already cancelled.
+
+        Args:
+            callback (callable): The function to call, e.g. the cancel method of a compile job.
+        """
+        with self._lock:
+            if not self.cancelled:
+                self._cancel_callbacks.append(callback)
+                return
+        callback()
+
+    def watch_job(self, job):
+        """Kill a compile job (see latex_compiler.CompileJob) when the task is cancelled."""
+        self.on_cancel(job.cancel)
+
+    def check_cancelled(self):
+        """
+        Stop the task if it was cancelled.
+
+        Raises:
+            TaskCancelled: If the task was cancelled.
+        """
+        if self.cancelled:
+            raise TaskCancelled(f"{self.name} was cancelled")
+
+    def set_progress(self, text):
+        """
+        Set the progress message shown next to the task in the task panel.
+
+        Args:
+            text (str): The progress message, e.g. compiling.
+        """
+        self.progress = text
+        self.executor._calls.put((self.executor._changed, ()))
+
+    def call_in_gui(self, function, *args):
+        """
+        Run a function on the main thread (e.g. to update a widget) without waiting for it.
+
+        Args:
+            function (callable): The function to run.
+            *args: The arguments of the function.
+        """
+        self.executor._calls.put((function, args))
+
+
+class TaskExecutor:
+    """A pool of worker threads for the operations of the GUI."""
+
+    def __init__(self, window, max_workers=2):
+        self.window = window
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="gui-task")
+        self.tasks = []
+        self.listeners = [] # functions called on the main thread whenever a task changes
+        self._calls = queue.Queue() # (function, args) to run on the main thread
+        self.window.after(POLL_INTERVAL, self._poll)
+
+    def submit(self, name, work, on_done=None, on_error=None) -> Task:
+        """
+        Queue an operation. It runs on a worker thread as soon as one is free.
+
+        Args:
+            name (str): The name of the task shown in the task panel.
+            work (callable): Function called as work(task) on a worker thread. It must not touch
+                the widgets (use task.call_in_gui for that).
+            on_done (callable, optional): Function called with the return value of work on the main thread.
+            on_error (callable, optional): Function called with the exception raised by work on the
+                main thread. Defaults to printing the error. Neither is called for a cancelled task.
+
+        Returns:
+            Task: The queued task.
+        """
+        task = Task(self, name)
+        self.tasks.append(task)
+        self.pool.submit(self._run, task, work, on_done, on_error)
+        self._changed()
+        return task
+
+    def shutdown(self):
+        """Cancel all the tasks and stop the worker threads once they are done."""
+        for task in list(self.tasks):
+            task.cancel()
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, task, work, on_done, on_error):
+        if task.cancelled:
+            self._finish(task, "cancelled")
+            return
+        task.started = time.monotonic()
+        task.status = "running"
+        self._calls.put((self._changed, ()))
+
+        try:
+            result = work(task)
+        except Exception as e:
+            if task.cancelled or isinstance(e, TaskCancelled):
+                self._finish(task, "cancelled")
+            else:
+                traceback.print_exc()
+                self._finish(task, "failed", on_error, e)
+            return
+        if task.cancelled: # the result came in after the cancel: drop it
+            self._finish(task, "cancelled")
+        else:
+            self._finish(task, "done", on_done, result)
+
+    def _finish(self, task, status, callback=None, value=None):
+        task.finished = time.monotonic()
+        task.status = status
+        if callback is not None:
+            self._calls.put((callback, (value,)))
+        self._calls.put((self._changed, ()))
+
+    def _changed(self):
+        # Keep the active tasks and only the most recent finished ones
+        finished = [task for task in self.tasks if not task.active]
+        for task in finished[:-MAX_FINISHED_TASKS]:
+            self.tasks.remove(task)
+        for listener in self.listeners:
+            listener()
+
+    def _poll(self):
+        try:
+            while True:
+                function, args = self._calls.get_nowait()
+                try:
+                    function(*args)
+                except Exception:
+                    traceback.print_exc() # a failing callback must not stop the polling
+        except queue.Empty:
+            pass
+        self.window.after(POLL_INTERVAL, self._poll)
+
+
+class TaskPanel(tk.Frame):
+    """A list of the running and recent tasks, with their elapsed time and a cancel button."""
+
+    def __init__(self, master, executor, **kwargs):
+        super().__init__(master, **kwargs)
+        self.executor = executor
+        self.rows = {} # task -> (label, cancel button)
+        tk.Label(self, text="Tasks:", bg=self["bg"]).pack(anchor="w")
+        executor.listeners.append(self.refresh)
+        self._tick()
+
+    def refresh(self):
+        """Add the rows of the new tasks, remove the rows of the dropped ones and update the others."""
+        for task in list(self.rows):
+            if task not in self.executor.tasks:
+                self.rows.pop(task)[0].master.destroy()
+        for task in self.executor.tasks:
+            if task not in self.rows:
+                row = tk.Frame(self, bg=self["bg"])
+                row.pack(fill="x")
+                label = tk.Label(row, anchor="w", justify="left", bg=self["bg"], wraplength=150)
+                label.pack(side="left", fill="x", expand=True)
+                button = tk.Button(row, text="Cancel", command=task.cancel)
+                button.pack(side="right")
+                self.rows[task] = (label, button)
+            label, button = self.rows[task]
+            text = f"{task.name}\n{task.status} {task.elapsed:.1f}s"
+            if task.progress and task.active:
+                text += f" ({task.progress})"
+            label.config(text=text)
+            if not task.active or task.cancelled:
+                button.config(state="disabled")
+
+    def _tick(self):
+        if any(task.active for task in self.executor.tasks):
+            self.refresh()
+        self.after(REFRESH_INTERVAL, self._tick)
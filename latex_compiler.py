@@ -0,0 +1,367 @@
+"""
+LaTeX Compiler
+
+Turns .tex files into PDFs with the xelatex engine. The compiles run on a long-lived compile
+service: a small pool of worker threads fed by a bounded job queue. Every job has a timeout, its
+completion is detected from the exit status of the engine (no fixed waiting), and it returns a
+structured CompileResult with the exit code, the PDF path, the elapsed time, the diagnostics and
+an excerpt of the log. A hung compile is killed when its timeout expires instead of stalling the
+other jobs.
+
+The output of the engine is parsed while it runs (see latex_log.py): errors, missing packages
+and fonts, and overfull boxes become diagnostics of the result, and the engine is stopped at the
+first fatal error instead of going on to the end of a document that cannot produce a PDF. A
+compile with halt_on_error=False (e.g. of a .tex file written by the user) lets the engine
+recover from its errors as it does in nonstopmode: the PDF may then have glitches, which the
+diagnostics list.
+
+Every compile writes its PDF and auxiliary files into the output directory it is given, so
+several compiles can run at the same time as long as each one uses its own directory.
+
+Documents that use one of the template classes of this project, with nothing else in their
+preamble, are compiled with a precompiled format of that class (see latex_format.py), which
+skips loading the packages.
+Documents that were compiled before are not compiled again: their PDF comes from the PDF cache
+(see pdf_cache.py). The other documents are checked first (see latex_preflight.py): a document
+that cannot compile is rejected without running the engine, and one that can be repaired is
+compiled from a repaired copy (the file itself is left as it is).
+"""
+
+import os
+import queue
+import sys
+import re
+import subprocess
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+
+import latex_format
+from latex_log import LogParser
+from latex_preflight import ERROR, check_latex
+from pdf_cache import PdfCache, get_pdf_cache
+
+ENGINE = "xelatex"
+DEFAULT_TIMEOUT = 120 # seconds
+LOG_EXCERPT_LINES = 20
+MAX_PRINT_LINE = 10000 # the engine wraps its messages at 79 characters by default
+
+# The cache key only covers the main file, so documents pulling in other files are always compiled
+_INCLUDE_PATTERN = re.compile(r"\\(input|include|includegraphics|bibliography|addbibresource)\b")
+
+
+@dataclass
+class CompileResult:
+    """The outcome of a compile."""
+    exit_code: int
+    pdf_path: str = None # None if no PDF was produced
+    elapsed: float = 0.0
+    log_excerpt: str = ""
+    timed_out: bool = False
+    cancelled: bool = False
+    cached: bool = False
+    rejected: bool = False # the preflight checks found errors, the engine was not run
+    preflight: list = field(default_factory=list) # the PreflightIssue found before the compile
+    aborted: bool = False # the engine was stopped at the first error
+    diagnostics: list = field(default_factory=list) # the Diagnostic parsed from the output of the engine
+
+    @property
+    def success(self) -> bool:
+        return self.pdf_path is not None
+
+    @property
+    def errors(self) -> list:
+        return [diagnostic for diagnostic in self.diagnostics if diagnostic.severity == ERROR]
+
+    def error_message(self) -> str:
+        """
+        Describe why the compile did not produce a PDF.
+
+        Returns:
+            str: The reason, or an empty string if the PDF was produced.
+        """
+        if self.success:
+            return ""
+        if self.cancelled:
+            return "The compile was cancelled."
+        if self.rejected:
+            return "The LaTeX file has errors, it was not compiled."
+        if self.timed_out:
+            return f"The LaTeX engine did not finish within {self.elapsed:.0f}s and was stopped."
+        if self.errors:
+            return f"The LaTeX engine stopped at an error: {self.errors[0]}"
+        return f"The LaTeX engine did not produce a PDF (exit code {self.exit_code})."
+
+
+class CompileJob:
+    """A compile waiting in (or taken from) the queue of the compile service."""
+
+    def __init__(self, tex_path, output_dir, jobname=None, quiet=False, use_format=True, use_cache=True,
+                 timeout=DEFAULT_TIMEOUT, preflight=True, halt_on_error=True):
+        self.tex_path = tex_path
+        self.output_dir = output_dir
+        self.jobname = jobname or os.path.splitext(os.path.basename(tex_path))[0]
+        self.quiet = quiet
+        self.use_format = use_format
+        self.use_cache = use_cache
+        self.timeout = timeout
+        self.preflight = preflight
+        self.halt_on_error = halt_on_error
+        self.future = Future()
+        self.process = None
+        self.cancelled = False
+        self._lock = threading.Lock()
+
+    def result(self, timeout=None) -> CompileResult:
+        """
+        Wait for the job to finish.
+
+        Args:
+            timeout (float, optional): Maximum number of seconds to wait. Defaults to waiting forever.
+
+        Returns:
+            CompileResult: The outcome of the compile.
+        """
+        return self.future.result(timeout)
+
+    def cancel(self):
+        """Cancel the job: a queued job is skipped and a running engine is killed."""
+        with self._lock:
+            self.cancelled = True
+            if self.process is not None and self.process.poll() is None:
+                self.process.kill()
+
+    def _start(self, command):
+        """Start the engine, with its output in a pipe, unless the job was cancelled in the meantime."""
+        with self._lock:
+            if self.cancelled:
+                return None
+            self.process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                            env=dict(os.environ, max_print_line=str(MAX_PRINT_LINE)),
+                                            encoding="utf-8", errors="replace")
+            return self.process
+
+
+class CompileService:
+    """A pool of compile worker threads fed by a bounded job queue."""
+
+    def __init__(self, workers=2, queue_size=32):
+        self.jobs = queue.Queue(maxsize=queue_size)
+        self.workers = [threading.Thread(target=self._work, name=f"compile-worker-{i}", daemon=True)
+                        for i in range(workers)]
+        for worker in self.workers:
+            worker.start()
+
+    def submit(self, tex_path, output_dir, jobname=None, quiet=False, use_format=True, use_cache=True,
+               timeout=DEFAULT_TIMEOUT, block=True, preflight=True, halt_on_error=True) -> CompileJob:
+        """
+        Queue a compile.
+
+        Args:
+            tex_path (str): Path of the .tex file to compile.
+            output_dir (str): Directory that receives the PDF and the auxiliary files.
+            jobname (str, optional): Base name of the generated files. Defaults to the name of the .tex file.
+            quiet (bool): Flag to hide the output of the LaTeX engine.
+            use_format (bool): Flag to use the precompiled format of the document class when there is one.
+            use_cache (bool): Flag to reuse the PDF of an identical earlier compile from the PDF cache.
+            timeout (float): Number of seconds after which the engine is killed.
+            block (bool): Flag to wait for room in the queue when it is full (otherwise queue.Full is raised).
+            preflight (bool): Flag to check (and repair) the document before running the engine.
+            halt_on_error (bool): Flag to stop the engine at the first error, instead of letting it
+                recover and produce a PDF anyway.
+
+        Returns:
+            CompileJob: The queued job.
+        """
+        job = CompileJob(tex_path, output_dir, jobname, quiet, use_format, use_cache, timeout, preflight, halt_on_error)
+        self.jobs.put(job, block=block)
+        return job
+
+    def _work(self):
+        while True:
+            job = self.jobs.get()
+            try:
+                job.future.set_result(_compile(job))
+            except Exception as e:
+                job.future.set_exception(e)
+            finally:
+                self.jobs.task_done()
+
+
+_compile_service = None
+_compile_service_lock = threading.Lock()
+
+
+def get_compile_service() -> CompileService:
+    """
+    Get the shared compile service of this process, starting it on first use.
+
+    Returns:
+        CompileService: The compile service.
+    """
+    global _compile_service
+    with _compile_service_lock:
+        if _compile_service is None:
+            _compile_service = CompileService()
+        return _compile_service
+
+
+def compile_latex(tex_path, output_dir, jobname=None, quiet=False, use_format=True, use_cache=True,
+                  timeout=DEFAULT_TIMEOUT, on_job=None, preflight=True, halt_on_error=True) -> CompileResult:
+    """
+    Compile a LaTeX file into a PDF on the compile service and wait for the result.
+
+    Args:
+        tex_path (str): Path of the .tex file to compile.
+        output_dir (str): Directory that receives the PDF and the auxiliary files.
+        jobname (str, optional): Base name of the generated files. Defaults to the name of the .tex file.
+        quiet (bool): Flag to hide the output of the LaTeX engine.
+        use_format (bool): Flag to use the precompiled format of the document class when there is one.
+        use_cache (bool): Flag to reuse the PDF of an identical earlier compile from the PDF cache.
+        timeout (float): Number of seconds after which the engine is killed.
+        on_job (callable, optional): Function called with the queued CompileJob, e.g. to keep a
+            handle for cancelling it from another thread.
+        preflight (bool): Flag to check (and repair) the document before running the engine.
+        halt_on_error (bool): Flag to stop the engine at the first error, instead of letting it
+            recover and produce a PDF anyway.
+
+    Returns:
+        CompileResult: The outcome of the compile.
+    """
+    job = get_compile_service().submit(tex_path, output_dir, jobname, quiet, use_format, use_cache, timeout,
+                                       preflight=preflight, halt_on_error=halt_on_error)
+    if on_job is not None:
+        on_job(job)
+    return job.result()
+
+
+def _compile(job) -> CompileResult:
+    """Run a compile job: look up the PDF cache, then run the engine (with the format if there is one)."""
+    start = time.perf_counter()
+    if job.cancelled:
+        return CompileResult(-1, cancelled=True)
+
+    with open(job.tex_path, 'r', encoding="utf-8", errors="replace") as file:
+        tex_source = file.read()
+    pdf_path = os.path.join(job.output_dir, job.jobname + ".pdf")
+    log_path = os.path.join(job.output_dir, job.jobname + ".log")
+
+    cache_key = None
+    if job.use_cache and not _INCLUDE_PATTERN.search(tex_source):
+        cache_key = PdfCache.make_key(tex_source, ENGINE)
+        if get_pdf_cache().fetch(cache_key, pdf_path):
+            if not job.quiet:
+                print("Identical resume found in the PDF cache, skipping the compile.")
+            return CompileResult(0, pdf_path, time.perf_counter() - start, cached=True)
+
+    # A stale PDF or log must not be mistaken for the output of this compile
+    for path in (pdf_path, log_path):
+        if os.path.exists(path):
+            os.remove(path)
+
+    # Check the document first: a document that cannot compile is rejected in milliseconds
+    tex_path, issues = job.tex_path, []
+    if job.preflight:
+        preflight = check_latex(tex_source)
+        issues = preflight.issues
+        if not job.quiet and issues:
+            print(preflight.report())
+        if not preflight.ok:
+            return CompileResult(-1, None, time.perf_counter() - start, preflight.report(), rejected=True, preflight=issues)
+        if preflight.repaired:
+            tex_path = os.path.join(job.output_dir, job.jobname + ".preflight.tex")
+            with open(tex_path, 'w', encoding="utf-8") as file:
+                file.write(preflight.source)
+
+    try:
+        format_path = _find_format(tex_source) if job.use_format else None
+        exit_code, timed_out, aborted, log = _run_engine(job, tex_path, format_path, start)
+
+        # An engine that cannot load the format stops before writing the log: fall back to a plain compile
+        if format_path is not None and exit_code != 0 and not timed_out and not job.cancelled \
+                and not os.path.exists(log_path):
+            latex_format.mark_format_failed(format_path)
+            exit_code, timed_out, aborted, log = _run_engine(job, tex_path, None, start)
+    finally:
+        if tex_path != job.tex_path and os.path.exists(tex_path):
+            os.remove(tex_path)
+
+    # Only clean compiles are cached, so a document with errors is compiled (and reported) again
+    produced = os.path.exists(pdf_path) and not timed_out and not job.cancelled
+    if cache_key is not None and exit_code == 0 and produced:
+        get_pdf_cache().store(cache_key, pdf_path)
+
+    # The log file of an aborted compile may be cut short: the parsed errors tell more
+    log_excerpt = "\n".join(str(error) for error in log.errors) if log.errors else _log_excerpt(log_path)
+    return CompileResult(exit_code, pdf_path if produced else None, time.perf_counter() - start, log_excerpt,
+                         timed_out, job.cancelled, preflight=issues, aborted=aborted and not produced,
+                         diagnostics=log.diagnostics)
+
+
+def _find_format(tex_source):
+    """Get the precompiled format for the document class of a LaTeX source, if it can use one."""
+    document_class = latex_format.find_format_class(tex_source)
+    if document_class is None:
+        return None
+    return latex_format.get_format(document_class[0], document_class[1], ENGINE)
+
+
+def _run_engine(job, tex_path, format_path, start):
+    """
+    Run the LaTeX engine once, parsing its output as it comes, and return its exit code, whether
+    it was killed by the timeout, whether it was stopped at the first error and the LogParser of
+    its output.
+    """
+    command = [ENGINE, "-interaction=nonstopmode", "-file-line-error", f"-output-directory={job.output_dir}",
+               f"-jobname={job.jobname}"]
+    if job.halt_on_error:
+        command.insert(2, "-halt-on-error")
+    if format_path is not None:
+        command.append(f"-fmt={format_path}")
+    command.append(tex_path)
+
+    log = LogParser(MAX_PRINT_LINE)
+    process = job._start(command)
+    if process is None: # cancelled before the engine started
+        return -1, False, False, log
+
+    # The output is read until the engine exits, so the timeout is enforced by a timer
+    expired = threading.Event()
+
+    def expire():
+        expired.set()
+        process.kill()
+
+    timer = threading.Timer(max(job.timeout - (time.perf_counter() - start), 0), expire)
+    timer.start()
+    aborted = False
+    try:
+        for line in process.stdout:
+            if not job.quiet:
+                sys.stdout.write(line)
+            if log.feed(line) and job.halt_on_error: # the first error: the rest of the run cannot produce a PDF
+                process.kill()
+                aborted = True
+                break
+    finally:
+        timer.cancel()
+        process.stdout.close()
+    log.close()
+    return process.wait(), expired.is_set(), aborted, log
+
+
+def _log_excerpt(log_path) -> str:
+    """Get the error messages of a LaTeX log, or its last lines if there are none."""
+    try:
+        with open(log_path, 'r', encoding="utf-8", errors="replace") as file:
+            lines = file.read().splitlines()
+    except OSError:
+        return ""
+    errors = [i for i, line in enumerate(lines) if line.startswith("!")]
+    if errors:
+        excerpt = []
+        for i in errors[:5]: # the error and the line it happened on
+            excerpt += lines[i:i + 3]
+        return "\n".join(excerpt)
+    return "\n".join(lines[-LOG_EXCERPT_LINES:])
@@ -0,0 +1,209 @@
+"""
+LaTeX Format Cache
+
+Most of the time of a xelatex run goes into loading the packages required by the document class
+(fontspec, fontawesome5, hyperref, titlesec, ...). This module dumps the preamble of a template
+class into a precompiled format file once (using the mylatexformat package) and hands it to every
+later compile, which then starts with all the packages already loaded.
+
+The formats are stored in .cache/formats. Each format file is named after a fingerprint of the
+.cls file contents, the class options and the TeX installation (engine version and base format),
+so it is rebuilt automatically when the template or the TeX installation changes.
+
+A document compiled with a format skips its own preamble (mylatexformat jumps to
+\\begin{document}), so only documents whose preamble is just their \\documentclass can use one
+(see find_format_class). The others, e.g. a .tex file with its own \\usepackage lines, are
+compiled without a format.
+"""
+
+import hashlib
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+
+FORMAT_DIR = os.path.join(".cache", "formats")
+FORMAT_BUILD_TIMEOUT = 300 # seconds
+
+_DOCUMENT_CLASS_PATTERN = re.compile(r"^[^%\n]*\\documentclass\s*(?:\[([^\]]*)\])?\s*\{([^}]*)\}", re.MULTILINE)
+_CLASS_ONLY_PREAMBLE = re.compile(r"\\documentclass\s*(?:\[([^\]]*)\])?\s*\{([^}]*)\}")
+_COMMENT = re.compile(r"(?<!\\)%[^\n]*")
+
+_engine_fingerprints = {}
+_failed_formats = set()
+_build_lock = threading.Lock() # the compile service may ask for the same format from two workers
+
+
+def find_document_class(tex_source):
+    """
+    Find the document class of a LaTeX document.
+
+    Args:
+        tex_source (str): The LaTeX source (the preamble is enough).
+
+    Returns:
+        tuple[str, str]: The class name and the class options, or None if there is no \\documentclass.
+    """
+    match = _DOCUMENT_CLASS_PATTERN.search(tex_source)
+    if match is None:
+        return None
+    return match.group(2).strip(), (match.group(1) or "").strip()
+
+
+def find_format_class(tex_source):
+    """
+    Find the document class of a LaTeX document that can be compiled with a format: one whose
+    preamble holds nothing but its \\documentclass (the rest of the preamble would be skipped).
+
+    Args:
+        tex_source (str): The LaTeX source.
+
+    Returns:
+        tuple[str, str]: The class name and the class options, or None if the document needs its own preamble.
+    """
+    begin = tex_source.find("\\begin{document}")
+    if begin < 0:
+        return None
+    match = _CLASS_ONLY_PREAMBLE.fullmatch(_COMMENT.sub("", tex_source[:begin]).strip())
+    if match is None:
+        return None
+    return match.group(2).strip(), (match.group(1) or "").strip()
+
+
+def engine_fingerprint(engine) -> str:
+    """
+    Get a string that changes whenever the TeX installation changes: the version banner of the
+    engine and the location, size and modification time of its base LaTeX format.
+
+    Args:
+        engine (str): The LaTeX engine, e.g. xelatex.
+
+    Returns:
+        str: The fingerprint of the engine.
+    """
+    if engine in _engine_fingerprints:
+        return _engine_fingerprints[engine]
+
+    parts = []
+    try:
+        version = subprocess.run([engine, "--version"], capture_output=True, text=True).stdout
+        parts.append(version.splitlines()[0] if version else "")
+        base_format = subprocess.run(["kpsewhich", f"-engine={engine.removesuffix('latex')}tex", f"{engine}.fmt"],
+                                     capture_output=True, text=True).stdout.strip()
+        if base_format and os.path.exists(base_format):
+            stat = os.stat(base_format)
+            parts += [base_format, str(stat.st_size), str(stat.st_mtime_ns)]
+    except OSError:
+        pass # no kpsewhich (or no engine): the version banner is the best we can do
+
+    _engine_fingerprints[engine] = "\n".join(parts)
+    return _engine_fingerprints[engine]
+
+
+def get_format(class_name, class_options="", engine="xelatex"):
+    """
+    Get the precompiled format of a template class, building it first if needed.
+
+    Only classes that are .cls files of this project (e.g. templates/resume_config) get a format.
+
+    Args:
+        class_name (str): The class name as written in \\documentclass, e.g. templates/resume_config.
+        class_options (str): The class options as written in \\documentclass, e.g. letterpaper.
+        engine (str): The LaTeX engine.
+
+    Returns:
+        str: Path of the format file without the .fmt extension, or None if there is no usable format.
+    """
+    class_path = class_name if class_name.endswith(".cls") else class_name + ".cls"
+    if not os.path.isfile(class_path):
+        return None
+
+    with open(class_path, 'rb') as file:
+        class_contents = file.read()
+    digest = hashlib.sha256()
+    for part in (class_contents, class_name.encode(), class_options.encode(), engine_fingerprint(engine).encode()):
+        digest.update(part)
+        digest.update(b"\0")
+    # The options have their own part of the name, so a new format only replaces the older ones of the same options
+    options_key = hashlib.sha256(f"{class_name}\0{class_options}".encode()).hexdigest()[:8]
+    stem = f"{os.path.splitext(os.path.basename(class_path))[0]}-{options_key}-{digest.hexdigest()[:16]}"
+    format_path = os.path.abspath(os.path.join(FORMAT_DIR, stem))
+
+    with _build_lock:
+        if os.path.exists(format_path + ".fmt"):
+            return format_path
+        if stem in _failed_formats or os.path.exists(format_path + ".failed"):
+            return None
+        if build_format(class_name, class_options, format_path, engine):
+            return format_path
+        return None
+
+
+def build_format(class_name, class_options, format_path, engine="xelatex") -> bool:
+    """
+    Dump the preamble of a template class into a format file.
+
+    The format is built in a scratch directory and then moved into place, so concurrent builds
+    never see a half-written format.
+
+    Args:
+        class_name (str): The class name as written in \\documentclass.
+        class_options (str): The class options as written in \\documentclass.
+        format_path (str): Path of the format file to create, without the .fmt extension.
+        engine (str): The LaTeX engine.
+
+    Returns:
+        bool: True if the format was built successfully.
+    """
+    os.makedirs(os.path.dirname(format_path), exist_ok=True)
+    stem = os.path.basename(format_path)
+    build_dir = tempfile.mkdtemp(prefix="resume_format_")
+    try:
+        preamble_path = os.path.join(build_dir, "preamble.tex")
+        with open(preamble_path, 'w', encoding="utf-8") as file:
+            options = f"[{class_options}]" if class_options else ""
+            file.write(f"\\documentclass{options}{{{class_name}}}\n\\begin{{document}}\n\\end{{document}}\n")
+
+        print(f"Building the LaTeX format for {class_name}...")
+        command = [engine, "-ini", "-interaction=nonstopmode", f"-jobname={stem}", f"-output-directory={build_dir}",
+                   f"&{engine}", "mylatexformat.ltx", preamble_path]
+        subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=FORMAT_BUILD_TIMEOUT)
+
+        built_path = os.path.join(build_dir, stem + ".fmt")
+        if not os.path.exists(built_path):
+            print(f"Warning: could not build the LaTeX format for {class_name}, compiling without it.")
+            mark_format_failed(format_path)
+            return False
+
+        # Remove the outdated formats of the same class and options before adding the new one
+        prefix = stem.rsplit("-", 1)[0] + "-"
+        for file in os.listdir(os.path.dirname(format_path)):
+            if file.startswith(prefix) and file.endswith(".fmt"):
+                os.remove(os.path.join(os.path.dirname(format_path), file))
+        os.replace(built_path, format_path + ".fmt")
+        return True
+    except (OSError, subprocess.SubprocessError): # no engine, or it hung
+        mark_format_failed(format_path)
+        return False
+    finally:
+        shutil.rmtree(build_dir, ignore_errors=True)
+
+
+def mark_format_failed(format_path):
+    """
+    Remember that a format cannot be built or loaded, so the compiles stop trying to use it.
+    The marker is tied to the fingerprint, so it goes away with the next template or TeX change.
+
+    Args:
+        format_path (str): Path of the format file without the .fmt extension.
+    """
+    _failed_formats.add(os.path.basename(format_path))
+    try:
+        if os.path.exists(format_path + ".fmt"):
+            os.remove(format_path + ".fmt")
+        with open(format_path + ".failed", 'w') as file:
+            file.write("")
+    except OSError:
+        pass
@@ -0,0 +1,187 @@
+"""
+LaTeX Log
+
+Parses the output of the LaTeX engine into diagnostics while the engine is running (see
+latex_compiler.py), instead of reading the log file once the compile is over:
+- the errors, with the file and line they happened on and the source line the engine stopped at;
+- the packages, classes and fonts that are not installed;
+- the characters that are missing from a font;
+- the overfull boxes (text sticking out into the margin).
+The engine is run with -file-line-error and a long max_print_line, so every message is a single
+line starting with its file and line number (the lines of a log written with the default
+max_print_line, wrapped at 79 characters, are joined again). It is usually run with -halt-on-error too, so the
+first error is fatal: the parser reports it as soon as the engine printed where it stopped, and
+the compile is aborted right then (the compiles that let the engine recover from its errors
+still get all of them as diagnostics).
+
+Command line usage: python latex_log.py <.log file>
+"""
+
+import re
+import sys
+from dataclasses import dataclass
+
+from latex_preflight import ERROR, WARNING
+
+WRAP_WIDTH = 79 # the engines wrap their lines at max_print_line characters, 79 by default
+
+# The kinds of diagnostics
+LATEX_ERROR = "error"
+MISSING_PACKAGE = "missing package"
+MISSING_FONT = "missing font"
+MISSING_CHARACTER = "missing character"
+OVERFULL_BOX = "overfull box"
+
+_FILE_LINE_ERROR = re.compile(r"^(.+?\.(?:tex|sty|cls|def|cfg|fd|ldf|clo)):(\d+): (.*)$")
+_ERROR = re.compile(r"^! (.*)$")
+_CONTEXT = re.compile(r"^l\.(\d+) ?(.*)$")
+# The messages that follow an error without being one themselves
+_CONSEQUENCE = re.compile(r"^(?:Emergency stop|==> Fatal error occurred|Fatal error occurred|Interruption)")
+_MISSING_FILE = re.compile(r"File [`']([^']+?)\.(sty|cls)' not found")
+_MISSING_FONT = re.compile(r'The font "([^"]+)" cannot be found|^Font \\[^=]+=(.+?)(?: at [\d.]+pt)? not loadable')
+_MISSING_CHARACTER = re.compile(r"^Missing character: There is no (.+?) in font (.+?)!$")
+_OVERFULL = re.compile(r"^Overfull \\([hv]box) \(([\d.]+pt) too (wide|high)\)(?: .*?(?:at lines? (\d+)))?")
+# The start of a message: the line before it was not wrapped, it was just as long as a wrapped line
+_MESSAGE_START = re.compile(r"^(?:! |l\.\d+ |[^:\s]+\.(?:tex|sty|cls|def|cfg|fd|ldf|clo):\d+: |Overfull \\|Missing character: )")
+
+
+@dataclass
+class Diagnostic:
+    """A message of the LaTeX engine about a document."""
+    severity: str
+    kind: str
+    message: str
+    file: str = None
+    line: int = None # the line of the file, if the engine gave one
+    context: str = "" # the source the engine stopped at, for an error
+
+    def __str__(self):
+        location = "" if self.line is None else f"{self.file}:{self.line}: " if self.file else f"line {self.line}: "
+        context = f" (at: {self.context})" if self.context else ""
+        return f"{location}{self.severity}: {self.message}{context}"
+
+
+class LogParser:
+    """Turns the output of the LaTeX engine into diagnostics, one line at a time."""
+
+    def __init__(self, line_width=WRAP_WIDTH):
+        self.diagnostics = []
+        self.fatal = False # an error was found and the engine printed where it stopped
+        self.line_width = line_width # the max_print_line of the engine: longer lines are wrapped
+        self._pending = None # the last error, waiting for its context line
+        self._wrapped = "" # the start of a line wrapped by the engine, waiting for the rest
+
+    @property
+    def errors(self) -> list:
+        return [diagnostic for diagnostic in self.diagnostics if diagnostic.severity == ERROR]
+
+    def feed(self, line) -> bool:
+        """
+        Parse a line of the output of the engine. A line of exactly line_width characters was
+        wrapped by the engine: it is parsed with the next one.
+
+        Args:
+            line (str): The line, with or without its line break.
+
+        Returns:
+            bool: True if the line made the compile fail (the engine can be stopped).
+        """
+        line = line.rstrip("\r\n")
+        was_fatal = self.fatal
+        wrapped, self._wrapped = self._wrapped, ""
+        if wrapped and _MESSAGE_START.match(line):
+            self._parse(wrapped)
+            wrapped = ""
+        if len(line) == self.line_width:
+            self._wrapped = wrapped + line
+        else:
+            self._parse(wrapped + line)
+        return self.fatal and not was_fatal
+
+    def _parse(self, line):
+        """Parse a whole line of the output (once joined again if the engine wrapped it)."""
+        match = _FILE_LINE_ERROR.match(line)
+        if match:
+            self._error(match.group(3), match.group(1), int(match.group(2)))
+        elif _ERROR.match(line):
+            self._error(_ERROR.match(line).group(1), None, None)
+        elif self._pending is not None and _CONTEXT.match(line):
+            match = _CONTEXT.match(line)
+            self._pending.line = self._pending.line or int(match.group(1))
+            self._pending.context = match.group(2).strip()
+            self._pending = None
+            self.fatal = True
+        elif _MISSING_CHARACTER.match(line):
+            match = _MISSING_CHARACTER.match(line)
+            self.diagnostics.append(Diagnostic(WARNING, MISSING_CHARACTER,
+                                               f"there is no {match.group(1)} in the font {match.group(2)}"))
+        elif _OVERFULL.match(line):
+            match = _OVERFULL.match(line)
+            line_number = int(match.group(4)) if match.group(4) else None
+            self.diagnostics.append(Diagnostic(WARNING, OVERFULL_BOX, f"{match.group(1)} {match.group(2)} too "
+                                               f"{match.group(3)}", line=line_number))
+
+    def _error(self, message, file, line):
+        """Record an error (or the end of the compile it caused)."""
+        message = message.strip() # the fatal error of -halt-on-error is printed as "!  ==> Fatal error occurred"
+        if _CONSEQUENCE.match(message) and self.errors:
+            self.fatal = self.fatal or self._pending is None # else once the context line of the error is read
+            return
+        if self._pending is not None: # a second error: the first one had no context line
+            self.fatal = True
+        kind, text = LATEX_ERROR, message
+        missing_file = _MISSING_FILE.search(message)
+        missing_font = _MISSING_FONT.search(message)
+        if missing_file:
+            kind = MISSING_PACKAGE
+            text = f"the {'class' if missing_file.group(2) == 'cls' else 'package'} {missing_file.group(1)} is not installed"
+        elif missing_font:
+            kind = MISSING_FONT
+            text = f"the font {(missing_font.group(1) or missing_font.group(2)).strip()} is not installed"
+        self._pending = Diagnostic(ERROR, kind, text, file, line)
+        self.diagnostics.append(self._pending)
+
+    def close(self) -> list:
+        """
+        Finish parsing once the engine has exited.
+
+        Returns:
+            list[Diagnostic]: All the diagnostics, in the order the engine printed them.
+        """
+        if self._wrapped:
+            self._parse(self._wrapped)
+            self._wrapped = ""
+        if self._pending is not None:
+            self._pending = None
+            self.fatal = True
+        return self.diagnostics
+
+
+def parse_log(text, line_width=WRAP_WIDTH) -> list:
+    """
+    Parse the whole output (or log file) of a compile.
+
+    Args:
+        text (str): The output of the engine.
+        line_width (int): The max_print_line the engine was run with.
+
+    Returns:
+        list[Diagnostic]: The diagnostics, in the order the engine printed them.
+    """
+    parser = LogParser(line_width)
+    for line in text.splitlines():
+        parser.feed(line)
+    return parser.close()
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2:
+        print("Usage: python latex_log.py <.log file>")
+        sys.exit(1)
+    with open(sys.argv[1], 'r', encoding="utf-8", errors="replace") as file:
+        found = parse_log(file.read())
+    for diagnostic in found:
+        print(diagnostic)
+    if not found:
+        print("No errors, missing fonts or packages, or overfull boxes")
+    sys.exit(1 if any(diagnostic.severity == ERROR for diagnostic in found) else 0)
@@ -0,0 +1,387 @@
+"""
+LaTeX Preflight
+
+Fast checks of a LaTeX document before it is compiled, so a broken document is rejected (or
+repaired) in milliseconds instead of after a full run of the engine:
+- the document must have a \\begin{document} (a missing \\end{document} is added);
+- the braces must be balanced;
+- every \\end must close an open \\begin (the environments left open inside it, or at the end of
+  the document, are closed);
+- the commands defined by the template class (or the preamble) must get all their arguments,
+  and a command or environment that is not defined but looks like one of the class (e.g.
+  \\Workexperience) is reported;
+- an & in plain text (e.g. R&D), which is only allowed in tables, is escaped.
+The contents of verbatim environments and \\verb are skipped, and so are comments.
+
+escape_latex escapes the values of the resume data, so characters such as & % $ # _ in the csv
+files are printed as they are instead of being read as LaTeX.
+
+Command line usage: python latex_preflight.py <.tex file> [--fix]
+"""
+
+import difflib
+import os
+import re
+import sys
+from dataclasses import dataclass, field
+from functools import lru_cache
+
+ERROR = "error" # the document cannot be compiled
+REPAIRED = "repaired" # the problem was fixed in the source that is compiled
+WARNING = "warning" # the document may not compile
+
+# The special characters of LaTeX and how to print them in text
+_ESCAPES = str.maketrans({"\\": r"\textbackslash{}", "&": r"\&", "%": r"\%", "$": r"\$", "#": r"\#", "_": r"\_",
+                          "{": r"\{", "}": r"\}", "~": r"\textasciitilde{}", "^": r"\textasciicircum{}"})
+_SPECIAL = re.compile(r"[\\&%$#_{}~^\n]")
+_LINE_BREAK = re.compile(r"\s*\n\s*")
+
+_TOKEN = re.compile(r"\\verb\*?|\\[A-Za-z@]+\*?|\\.|%[^\n]*|[{}&\n]", re.DOTALL)
+_ENVIRONMENT_NAME = re.compile(r"\s*\{([^{}]*)\}")
+_VERBATIM = {"verbatim", "verbatim*", "Verbatim", "lstlisting", "minted", "comment"}
+# The environments where & is plain text (elsewhere it may be an alignment tab, e.g. in a tabular)
+_TEXT = {"document", "itemize", "enumerate", "description", "center", "flushleft", "flushright", "quote", "quotation"}
+
+_NEW_COMMAND = re.compile(r"\\(?:newcommand|renewcommand|providecommand|DeclareRobustCommand)\*?\s*\{?\s*\\([A-Za-z@]+)\s*\}?"
+                          r"\s*(?:\[(\d)\])?(\s*\[)?")
+_DOCUMENT_COMMAND = re.compile(r"\\(?:New|Renew|Provide|Declare)DocumentCommand\s*\{?\s*\\([A-Za-z@]+)\s*\}?"
+                               r"\s*\{((?:[^{}]|\{[^{}]*\})*)\}")
+_DEF = re.compile(r"\\[gex]?def\s*\\([A-Za-z@]+)((?:#\d)*)\s*\{")
+_NEW_ENVIRONMENT = re.compile(r"\\(?:(?:re)?newenvironment|(?:New|Renew|Provide|Declare)DocumentEnvironment)\*?\s*\{([^{}]+)\}")
+_DOCUMENT_CLASS = re.compile(r"\\documentclass\s*(?:\[[^\]]*\])?\s*\{([^{}]+)\}")
+
+
+def escape_latex(text) -> str:
+    """
+    Escape a value for the text of a LaTeX document: the special characters are printed as they
+    are, and line breaks become spaces (a blank line would end the argument of a command).
+
+    Args:
+        text (str): The value, e.g. a field of a csv file.
+
+    Returns:
+        str: The LaTeX source printing the value.
+    """
+    if not _SPECIAL.search(text):
+        return text
+    return _LINE_BREAK.sub(" ", text).translate(_ESCAPES)
+
+
+@dataclass
+class PreflightIssue:
+    """A problem found in a LaTeX document."""
+    line: int
+    message: str
+    severity: str = ERROR
+
+    def __str__(self):
+        return f"line {self.line}: {self.severity}: {self.message}"
+
+
+@dataclass
+class PreflightResult:
+    """The outcome of the checks of a LaTeX document."""
+    source: str # the source to compile, with the repairs
+    issues: list = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        """True if the document can be compiled (possibly after the repairs)."""
+        return not any(issue.severity == ERROR for issue in self.issues)
+
+    @property
+    def repaired(self) -> bool:
+        return any(issue.severity == REPAIRED for issue in self.issues)
+
+    def report(self) -> str:
+        """The issues, one per line."""
+        return "\n".join(str(issue) for issue in self.issues)
+
+
+@dataclass
+class Definitions:
+    """The commands and environments defined by a class file or a preamble."""
+    commands: dict # name -> (number of mandatory arguments, flag for a first optional argument)
+    environments: set
+
+
+def find_definitions(source) -> Definitions:
+    """
+    Find the commands and environments defined in a LaTeX source, e.g. a class file.
+
+    Args:
+        source (str): The LaTeX source.
+
+    Returns:
+        Definitions: The defined commands, with their number of arguments, and environments.
+    """
+    commands = {}
+    for match in _NEW_COMMAND.finditer(source):
+        count, optional = int(match.group(2) or 0), match.group(3) is not None
+        commands[match.group(1)] = (count - 1 if optional else count, optional)
+    for match in _DOCUMENT_COMMAND.finditer(source):
+        spec = re.sub(r"\{[^{}]*\}", "", match.group(2))
+        commands[match.group(1)] = (spec.count("m"), spec.lstrip("+ ")[:1] in ("o", "O"))
+    for match in _DEF.finditer(source):
+        commands.setdefault(match.group(1), (len(match.group(2)) // 2, False))
+    return Definitions(commands, {match.group(1) for match in _NEW_ENVIRONMENT.finditer(source)})
+
+
+@lru_cache(maxsize=32)
+def _class_definitions(path, mtime_ns, size) -> Definitions:
+    """The definitions of a class file, read again only when the file changes."""
+    with open(path, 'r', encoding="utf-8", errors="replace") as file:
+        return find_definitions(file.read())
+
+
+def class_definitions(source, base_dir="."):
+    """
+    Get the definitions of the class of a document, if it is a class file of this project (a .cls
+    file under the working directory, where the engine runs, e.g. templates/resume_config).
+
+    Args:
+        source (str): The LaTeX source of the document.
+        base_dir (str): The directory the class path is relative to.
+
+    Returns:
+        Definitions: The definitions of the class, or None for a class of the LaTeX installation.
+    """
+    match = _DOCUMENT_CLASS.search(_strip_comments(source))
+    if match is None:
+        return None
+    path = os.path.join(base_dir, match.group(1).strip() + ".cls")
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return _class_definitions(path, stat.st_mtime_ns, stat.st_size)
+
+
+def check_latex(source, base_dir=".") -> PreflightResult:
+    """
+    Check a LaTeX document before compiling it, and repair what can be repaired safely.
+
+    Args:
+        source (str): The LaTeX source.
+        base_dir (str): The directory the path of the document class is relative to.
+
+    Returns:
+        PreflightResult: The issues found, and the source with the repairs.
+    """
+    issues, edits = [], [] # edits: (position, length of the replaced text, replacement)
+    template = class_definitions(source, base_dir)
+    preamble = find_definitions(source)
+    commands = {**(template.commands if template else {}), **preamble.commands}
+    custom = set(template.commands) if template else set()
+
+    braces = [] # line of every open brace
+    environments = [] # (name, line, brace depth) of every open environment
+    body = None # position of \begin{document}
+    end = None # position of \end{document}
+    line = 1
+    position = 0
+    while end is None:
+        token = _TOKEN.search(source, position)
+        if token is None:
+            break
+        text = token.group()
+        position = token.end()
+        if text == "\n":
+            line += 1
+        elif text == "{":
+            braces.append(line)
+        elif text == "}":
+            if braces and environments and len(braces) <= environments[-1][2]:
+                issues.append(PreflightIssue(line, f"this }} closes a brace opened before \\begin{{{environments[-1][0]}}} "
+                                                   f"(line {environments[-1][1]})"))
+            if not braces:
+                issues.append(PreflightIssue(line, "this } has no matching {"))
+            else:
+                braces.pop()
+        elif text == "&":
+            if body is not None and not braces[environments[0][2]:] \
+                    and all(name in _TEXT for name, start, depth in environments):
+                issues.append(PreflightIssue(line, "& in the text was escaped (it is only allowed in tables)", REPAIRED))
+                edits.append((token.start(), 1, r"\&"))
+        elif text.startswith("\\verb"):
+            # \verb|text|: skip to the closing delimiter
+            if position < len(source):
+                close = source.find(source[position], position + 1)
+                if close != -1:
+                    line += source.count("\n", position, close)
+                    position = close + 1
+        elif text in ("\\begin", "\\end"):
+            name = _ENVIRONMENT_NAME.match(source, position)
+            if name is None:
+                issues.append(PreflightIssue(line, f"{text} without an environment name"))
+                continue
+            position = name.end()
+            environment = name.group(1).strip()
+            if body is None and environment != "document":
+                continue # the environments of the preamble are in definitions
+            if text == "\\begin":
+                if environment == "document":
+                    body = token.start()
+                    if environments or braces:
+                        issues.append(PreflightIssue(line, "\\begin{document} inside an environment or a brace group"))
+                elif template and environment not in template.environments | preamble.environments:
+                    similar = _similar(environment, template.environments)
+                    if similar is not None and similar != environment:
+                        issues.append(PreflightIssue(line, f"the environment {environment} is not defined by the template class, "
+                                                           f"did you mean {similar}?", WARNING))
+                environments.append((environment, line, len(braces)))
+                if environment in _VERBATIM:
+                    close = source.find(f"\\end{{{environment}}}", position)
+                    if close == -1:
+                        issues.append(PreflightIssue(line, f"\\begin{{{environment}}} is not closed"))
+                        break
+                    line += source.count("\n", position, close)
+                    position = close
+            elif environment == "document":
+                end = token.start()
+            elif any(name == environment for name, start, depth in environments[1:]):
+                # Close the environments left open inside this one
+                closing = ""
+                while environments[-1][0] != environment:
+                    name, start, depth = environments.pop()
+                    issues.append(PreflightIssue(start, f"\\begin{{{name}}} was not closed, \\end{{{name}}} was added "
+                                                        f"before \\end{{{environment}}}", REPAIRED))
+                    closing += f"\\end{{{name}}}\n"
+                edits.append((token.start(), 0, closing))
+                environments.pop()
+            elif environments[-1][0] != environment:
+                issues.append(PreflightIssue(line, f"\\end{{{environment}}} found, expected \\end{{{environments[-1][0]}}} "
+                                                   f"for line {environments[-1][1]}"))
+            else:
+                environments.pop()
+        elif body is not None and text[1:] in commands:
+            issues += _check_arguments(source, position, text[1:], commands[text[1:]], line)
+        elif body is not None and custom and text[1:].rstrip("*") not in commands and len(text) > 3:
+            similar = _similar(text[1:], custom)
+            if similar is not None:
+                issues.append(PreflightIssue(line, f"{text} is not defined by the template class, did you mean \\{similar}?", WARNING))
+
+    if body is None:
+        issues.insert(0, PreflightIssue(1, "the document has no \\begin{document}"))
+        return PreflightResult(source, issues)
+    # Close the environments left open (the first one is the document), and the document
+    closing = ""
+    for name, start, depth in reversed(environments[1:]):
+        issues.append(PreflightIssue(start, f"\\begin{{{name}}} was not closed, \\end{{{name}}} was added", REPAIRED))
+        closing += f"\\end{{{name}}}\n"
+    if end is None or closing:
+        if end is None:
+            issues.append(PreflightIssue(line, "the document has no \\end{document}, it was added", REPAIRED))
+            edits.append((len(source), 0, ("\n" if not source.endswith("\n") else "") + closing + "\\end{document}\n"))
+        elif closing:
+            edits.append((end, 0, closing))
+    for start in braces:
+        issues.append(PreflightIssue(start, "this { is not closed"))
+    issues.sort(key=lambda issue: issue.line)
+    return PreflightResult(_apply(source, edits), issues)
+
+
+def _check_arguments(source, position, name, definition, line) -> list:
+    """
+    Check that a defined command is given all its mandatory arguments. An argument is a brace
+    group or a single token (e.g. \\foo\\relax or \\foo x), as for TeX: only a } or the end of
+    the document leaves it missing, and a blank line (a \\par, only allowed in the arguments of
+    some commands) is a warning.
+    """
+    count, optional = definition
+    given = 0
+    while given < count:
+        start, blank = _skip_spaces(source, position)
+        if blank:
+            return [PreflightIssue(line, f"\\{name} takes {count} arguments, a blank line comes after {given}", WARNING)]
+        if optional and given == 0 and start < len(source) and source[start] == "[":
+            close = source.find("]", start)
+            if close == -1:
+                break
+            position = close + 1
+            continue
+        if start >= len(source) or source[start] == "}":
+            break
+        if source[start] == "{":
+            position = _group_end(source, start)
+            if position is None:
+                return [] # the unclosed brace is reported on its own
+        elif source[start] == "\\":
+            position = _TOKEN.match(source, start).end()
+        else:
+            position = start + 1
+        given += 1
+    if given < count:
+        return [PreflightIssue(line, f"\\{name} takes {count} arguments, it was given {given}")]
+    return []
+
+
+def _skip_spaces(source, position):
+    """The position of the next token after spaces, line breaks and comments, and whether a blank line was skipped."""
+    blank = after_line_break = False
+    while position < len(source):
+        char = source[position]
+        if char == "%":
+            end = source.find("\n", position)
+            position = len(source) if end == -1 else end + 1
+            after_line_break = False
+            continue
+        if char == "\n":
+            blank = blank or after_line_break
+            after_line_break = True
+        elif char not in " \t\r":
+            break
+        position += 1
+    return position, blank
+
+
+def _group_end(source, start):
+    """The position after the brace that closes the brace at start (None if it is not closed)."""
+    depth = 0
+    position = start
+    while True:
+        token = _TOKEN.search(source, position)
+        if token is None:
+            return None
+        position = token.end()
+        if token.group() == "{":
+            depth += 1
+        elif token.group() == "}":
+            depth -= 1
+            if depth == 0:
+                return position
+
+
+def _similar(name, names):
+    """A command (or environment) of the template class that an undefined one is probably a misspelling of."""
+    lowered = {command.lower(): command for command in names}
+    if name.lower() in lowered:
+        return lowered[name.lower()]
+    matches = difflib.get_close_matches(name.lower(), lowered, n=1, cutoff=0.9)
+    return lowered[matches[0]] if matches else None
+
+
+def _strip_comments(source) -> str:
+    return re.sub(r"(?<!\\)%[^\n]*", "", source)
+
+
+def _apply(source, edits) -> str:
+    """Apply the edits (position, length, replacement) to a source."""
+    for position, length, replacement in sorted(edits, reverse=True):
+        source = source[:position] + replacement + source[position + length:]
+    return source
+
+
+if __name__ == '__main__':
+    if len(sys.argv) not in (2, 3) or (len(sys.argv) == 3 and sys.argv[2] != "--fix"):
+        print("Usage: python latex_preflight.py <.tex file> [--fix]")
+        sys.exit(1)
+
+    with open(sys.argv[1], 'r', encoding="utf-8") as file:
+        result = check_latex(file.read())
+    print(result.report() or "No problems found")
+    if result.repaired and len(sys.argv) == 3:
+        with open(sys.argv[1], 'w', encoding="utf-8") as file:
+            file.write(result.source)
+        print(f"Repaired {sys.argv[1]}")
+    sys.exit(0 if result.ok else 1)
@@ -0,0 +1,92 @@
+"""
+LaTeX Renderer
+
+Renders the resume data of a ResumeBuilder into a LaTeX document in memory, without touching the
+disk. Everything that does not depend on the data of a candidate is prepared once per template
+class in a RenderPlan: the fixed text of the document, one format string per entry type and the
+getters that pick the fields out of each record (see resume_model.py). Rendering a resume then
+only fills the format strings with the escaped values (see latex_preflight.escape_latex) and
+joins the pieces.
+"""
+
+from functools import lru_cache
+from operator import attrgetter
+
+from latex_preflight import escape_latex
+from resume_model import Certification, Education, Experience, PersonalInfo
+
+
+class RenderPlan:
+    """The precompiled rendering steps of the resume template class."""
+
+    def __init__(self, document_class, class_options=""):
+        options = f"[{class_options}]" if class_options else ""
+        self.prologue = f"\\documentclass{options}{{{document_class}}}\n\n\\begin{{document}}\n\n"
+        self.epilogue = "\\end{document}"
+
+        self.header = "\\Header\n    {%s}\n    {%s, %s}\n    {%s}\n    {%s}\n    {%s}\n\n"
+        self.experience = "\\WorkExperience\n    {%s}\n    {%s}\n    {%s}\n    {%s, %s}\n    {\n"
+        self.explanation = "        \\item %s\n"
+        self.education = "\\EducationExperience\n    {%s}\n    {%s}\n    {%s}\n    {%s, %s}\n\n\n"
+        self.certification = "\\Certification\n    {%s}\n    {%s}\n    {%s}\n\n\n"
+        self.skill = "\n    \\item %s"
+
+        self.personal_info_fields = attrgetter(*PersonalInfo.attributes())
+        self.experience_fields = attrgetter(*Experience.attributes())
+        self.education_fields = attrgetter(*Education.attributes())
+        self.certification_fields = attrgetter(*Certification.attributes())
+
+    def render(self, personal_info, experience, education, certifications, skills) -> str:
+        """
+        Render the resume data into a LaTeX document.
+
+        Args:
+            personal_info (PersonalInfo): The personal information.
+            experience (list[Experience]): The work experience entries.
+            education (list[Education]): The education entries.
+            certifications (list[Certification]): The certification entries.
+            skills (list[Skill]): The skills.
+
+        Returns:
+            str: The LaTeX source of the resume.
+        """
+        parts = [self.prologue, self.header % tuple(map(escape_latex, self.personal_info_fields(personal_info))),
+                 "\\section{Experience}\n\n"]
+        append = parts.append
+
+        for exp in experience:
+            append(self.experience % tuple(map(escape_latex, self.experience_fields(exp))))
+            for bullet in exp.bullets:
+                append(self.explanation % escape_latex(bullet))
+            append("}\n\n")
+
+        append("\n\n\\section{Education}\n\n")
+        for edu in education:
+            append(self.education % tuple(map(escape_latex, self.education_fields(edu))))
+
+        append("\n\n\\section{Certifications}\n\n")
+        for cert in certifications:
+            append(self.certification % tuple(map(escape_latex, self.certification_fields(cert))))
+
+        append("\n\n\\section{Skills}\n\n\\begin{SkillsList}")
+        for skill in skills:
+            append(self.skill % escape_latex(skill.name))
+        append("\n\\end{SkillsList}\n\n")
+
+        append(self.epilogue)
+        return "".join(parts)
+
+
+@lru_cache(maxsize=None)
+def get_render_plan(document_class, class_options="") -> RenderPlan:
+    """
+    Get the render plan of a template class. The plan is built once and then reused.
+
+    Args:
+        document_class (str): The class name as written in \\documentclass, e.g. templates/resume_config.
+        class_options (str): The class options, e.g. letterpaper.
+
+    Returns:
+        RenderPlan: The render plan of the template class.
+    """
+    return RenderPlan(document_class, class_options)
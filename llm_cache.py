@@ -0,0 +1,220 @@
+"""
+LLM Response Cache
+
+A disk-backed cache of model replies, keyed on the model, the system prompt and the user message.
+Identical requests (clicking a button again, re-running a batch after a crash) are answered from
+the cache instead of the model. The cache survives restarts: it is stored in .cache/llm.
+
+Entries expire after a time-to-live, and the total size of the cache is bounded: when it grows
+over the limit, the least recently used entries are evicted. The most recently used replies are
+also kept in memory, so repeated hits do not touch the disk at all.
+
+Settings can be changed in the .env file:
+- llm_cache: set to "off" to disable the cache
+- llm_cache_ttl: time-to-live of an entry in seconds (7 days by default)
+- llm_cache_max_mb: maximum size of the cache in MB (50 by default)
+
+Command line usage: python llm_cache.py (stats|clear)
+"""
+
+import hashlib
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+CACHE_DIR = os.path.join(".cache", "llm")
+DEFAULT_TTL = 7 * 24 * 60 * 60 # 7 days
+DEFAULT_MAX_BYTES = 50 * 1024 * 1024 # 50 MB
+MEMORY_ENTRIES = 256
+
+
+class ResponseCache:
+    def __init__(self, cache_dir=CACHE_DIR, ttl=DEFAULT_TTL, max_bytes=DEFAULT_MAX_BYTES, memory_entries=MEMORY_ENTRIES):
+        self.path = os.path.join(cache_dir, "responses.sqlite")
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.memory_entries = memory_entries
+        self.memory = OrderedDict() # key -> (reply, created)
+        self.counters = {"hits": 0, "memory_hits": 0, "misses": 0, "expired": 0, "evictions": 0}
+        self._lock = threading.Lock()
+
+        os.makedirs(cache_dir, exist_ok=True)
+        with self._connect() as connection:
+            connection.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, reply TEXT NOT NULL, "
+                               "size INTEGER NOT NULL, created REAL NOT NULL, last_used REAL NOT NULL)")
+            connection.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+
+    @contextmanager
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=30)
+        try:
+            with connection: # commit (or roll back) the transaction
+                yield connection
+        finally:
+            connection.close()
+
+    @staticmethod
+    def make_key(model, system, user) -> str:
+        """
+        Compute the cache key of a request.
+
+        Args:
+            model (str): The model name.
+            system (str): The system prompt.
+            user (str): The user message.
+
+        Returns:
+            str: The hex digest identifying the request.
+        """
+        digest = hashlib.sha256()
+        for part in (model, system, user):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def get(self, key):
+        """
+        Get the cached reply of a request.
+
+        Args:
+            key (str): The cache key.
+
+        Returns:
+            str: The cached reply, or None on a miss (or if the entry expired).
+        """
+        now = time.time()
+        with self._lock:
+            if key in self.memory:
+                reply, created = self.memory[key]
+                if now - created <= self.ttl:
+                    self.memory.move_to_end(key)
+                    self.counters["hits"] += 1
+                    self.counters["memory_hits"] += 1
+                    return reply
+                del self.memory[key]
+
+        with self._connect() as connection:
+            row = connection.execute("SELECT reply, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None and now - row[1] > self.ttl:
+                connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._count("expired")
+                row = None
+            if row is None:
+                self._count("misses")
+                return None
+            connection.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+
+        self._count("hits")
+        self._remember(key, row[0], row[1])
+        return row[0]
+
+    def put(self, key, reply):
+        """
+        Add the reply of a request to the cache and evict the least recently used entries if needed.
+
+        Args:
+            key (str): The cache key.
+            reply (str): The reply of the model.
+        """
+        now = time.time()
+        with self._connect() as connection:
+            connection.execute("INSERT OR REPLACE INTO responses (key, reply, size, created, last_used) "
+                               "VALUES (?, ?, ?, ?, ?)", (key, reply, len(reply.encode("utf-8")), now, now))
+            total = connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if total > self.max_bytes:
+                for old_key, size in connection.execute("SELECT key, size FROM responses ORDER BY last_used").fetchall():
+                    if total <= self.max_bytes:
+                        break
+                    connection.execute("DELETE FROM responses WHERE key = ?", (old_key,))
+                    with self._lock:
+                        self.memory.pop(old_key, None)
+                    self._count("evictions")
+                    total -= size
+        self._remember(key, reply, now)
+
+    def _remember(self, key, reply, created):
+        with self._lock:
+            self.memory[key] = (reply, created)
+            self.memory.move_to_end(key)
+            while len(self.memory) > self.memory_entries:
+                self.memory.popitem(last=False)
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def stats(self) -> dict:
+        """
+        Get the statistics of the cache: the counters of this process and the size of the cache on disk.
+
+        Returns:
+            dict: The number of hits (and how many came from memory), misses, expired entries and
+                evictions, and the number and total size of the entries.
+        """
+        with self._lock:
+            stats = dict(self.counters)
+        with self._connect() as connection:
+            stats["entries"], stats["bytes"] = connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        return stats
+
+    def clear(self):
+        """Remove all the cached replies."""
+        with self._lock:
+            self.memory.clear()
+        with self._connect() as connection:
+            connection.execute("DELETE FROM responses")
+
+
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    """
+    Get the shared response cache of this process, configured from the .env file.
+
+    Returns:
+        ResponseCache: The response cache, or None if it is disabled with llm_cache=off.
+    """
+    global _response_cache
+    if os.getenv("llm_cache", "on").lower() in ("off", "false", "0"):
+        return None
+    with _response_cache_lock:
+        if _response_cache is None:
+            _response_cache = ResponseCache(ttl=_setting("llm_cache_ttl", DEFAULT_TTL),
+                                            max_bytes=_setting("llm_cache_max_mb", DEFAULT_MAX_BYTES / 1024 / 1024) * 1024 * 1024)
+        return _response_cache
+
+
+def _setting(name, default) -> float:
+    """A number of the .env file, or its default (with a warning) if it is not a positive number."""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    try:
+        number = float(value)
+        if number > 0:
+            return number
+    except ValueError:
+        pass
+    print(f"Warning: {name}={value} in the .env file is not a positive number, using {default:g} instead.")
+    return default
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2 or sys.argv[1] not in ("stats", "clear"):
+        print("Usage: python llm_cache.py (stats|clear)")
+        sys.exit(1)
+
+    cache = ResponseCache()
+    if sys.argv[1] == "stats":
+        for name, value in cache.stats().items():
+            print(f"{name}: {value}")
+    else:
+        cache.clear()
+        print("LLM response cache cleared!")
@@ -0,0 +1,282 @@
+"""
+LLM Client
+
+The chat-completions client shared by the resume improver, the resume rater and the resume LaTeX
+generator. It keeps one pooled HTTP session (keep-alive connections are reused between calls),
+applies connect and read timeouts, retries rate-limited (429) and server-side (5xx) failures with
+exponential backoff, and raises structured LLMError exceptions instead of returning them.
+Replies are cached on disk (see llm_cache.py), so identical requests are not sent twice.
+Replies can also be streamed piece by piece as the model generates them.
+
+Settings are read from the .env file:
+- url: the chat-completions endpoint
+- auth_key: the API key
+- connect_timeout, read_timeout (seconds) and max_retries (optional)
+
+The .env file is read when the first client is created, not when this module is imported.
+"""
+
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+
+import requests
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+
+from llm_cache import ResponseCache, get_response_cache
+
+DEFAULT_MODEL = "gpt-3.5-turbo"
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+_settings_loaded = False
+
+
+def load_settings():
+    """Load the settings of the .env file into the environment, once per process."""
+    global _settings_loaded
+    if not _settings_loaded:
+        load_dotenv()
+        _settings_loaded = True
+
+
+class LLMError(Exception):
+    """An error while talking to the language model."""
+
+    def __init__(self, message, status_code=None, retryable=False):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retryable = retryable
+
+
+class LLMConfigError(LLMError):
+    """The url or the auth_key is missing from the .env file."""
+
+
+class LLMHTTPError(LLMError):
+    """The endpoint could not be reached or answered with an error status."""
+
+
+class LLMResponseError(LLMError):
+    """The endpoint answered with something that is not a chat completion."""
+
+
+class ChatClient:
+    def __init__(self, url=None, auth_key=None, connect_timeout=None, read_timeout=None, max_retries=None,
+                 backoff=1.0, pool_size=16):
+        load_settings()
+        self.url = url or os.getenv('url')
+        self.auth_key = auth_key or os.getenv("auth_key")
+        self.connect_timeout = connect_timeout if connect_timeout is not None else float(os.getenv("connect_timeout", 10))
+        self.read_timeout = read_timeout if read_timeout is not None else float(os.getenv("read_timeout", 120))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("max_retries", 3))
+        self.backoff = backoff
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def complete(self, system: str, user: str, model=DEFAULT_MODEL, use_cache=True, on_token=None) -> str:
+        """
+        Send a system prompt and a user message to the model and get the reply.
+        Identical requests are answered from the response cache (see llm_cache.py).
+
+        With on_token, the reply is streamed (server-sent events): on_token is called with each
+        piece of text as soon as it arrives, and the whole reply is still returned at the end.
+
+        Args:
+            system (str): The system prompt.
+            user (str): The user message.
+            model (str): The model name.
+            use_cache (bool): Flag to use the response cache. Set it to False to always ask the model
+                (the new reply still replaces the cached one).
+            on_token (callable, optional): Function called with every piece of the reply as it streams in.
+
+        Returns:
+            str: The content of the reply.
+
+        Raises:
+            LLMError: If the model could not be reached or did not answer properly.
+        """
+        payload = {
+            "model": model,
+            "messages": [
+                {"role": "system", "content": system},
+                {"role": "user", "content": user}
+            ]
+        }
+        cache = get_response_cache()
+        key = ResponseCache.make_key(model, system, user)
+        if cache is not None and use_cache:
+            reply = cache.get(key)
+            if reply is not None:
+                if on_token is not None:
+                    on_token(reply)
+                return reply
+
+        if on_token is not None:
+            payload["stream"] = True
+        response = self._post(payload, stream=on_token is not None)
+        if on_token is not None and response.headers.get("Content-Type", "").startswith("text/event-stream"):
+            reply = self._read_stream(response, on_token)
+        else:
+            try:
+                reply = response.json()["choices"][0]["message"]["content"]
+            except (ValueError, KeyError, IndexError, TypeError) as e:
+                raise LLMResponseError(f"Unexpected response from the model: {response.text[:200]}") from e
+            if on_token is not None: # the endpoint does not stream: hand over the reply at once
+                on_token(reply)
+        if cache is not None:
+            cache.put(key, reply)
+        return reply
+
+    @staticmethod
+    def _read_stream(response, on_token) -> str:
+        """
+        Read a streamed (server-sent events) reply, passing every piece to on_token. A stream that
+        ends before its [DONE] event is an error, so a cut-off reply is never returned (or cached).
+        """
+        pieces = []
+        done = False
+        response.encoding = "utf-8" # event streams have no charset, requests would decode them as ISO-8859-1
+        try:
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue # keep-alive blank lines and comments
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    done = True
+                    break
+                try:
+                    choice = json.loads(data)["choices"][0]
+                except (ValueError, KeyError, IndexError, TypeError) as e:
+                    raise LLMResponseError(f"Unexpected event from the model: {data[:200]}") from e
+                piece = (choice.get("delta") or {}).get("content")
+                if piece:
+                    pieces.append(piece)
+                    on_token(piece)
+        except requests.RequestException as e:
+            raise LLMHTTPError(f"The connection to the model endpoint broke while streaming: {e}") from e
+        finally:
+            response.close()
+        if not done:
+            raise LLMResponseError("The stream of the model ended before the end of the reply")
+        return "".join(pieces)
+
+    def _post(self, payload, stream=False) -> requests.Response:
+        """POST a payload to the endpoint, retrying the retryable failures with exponential backoff."""
+        if self.url is None or self.auth_key is None:
+            raise LLMConfigError("Please set the url and auth_key in the .env file")
+        headers = {
+            'Authorization': 'Bearer ' + self.auth_key,
+            'User-Agent': 'Apifox/1.0.0 (https://apifox.com)',
+            'Content-Type': 'application/json'
+        }
+        data = json.dumps(payload)
+
+        attempt = 0
+        while True:
+            try:
+                response = self.session.post(self.url, headers=headers, data=data, stream=stream,
+                                             timeout=(self.connect_timeout, self.read_timeout))
+                if response.status_code < 400:
+                    return response
+                error = LLMHTTPError(f"The model endpoint answered {response.status_code}: {response.text[:200]}",
+                                     response.status_code, response.status_code in RETRY_STATUS_CODES)
+                retry_after = response.headers.get("Retry-After")
+            except requests.RequestException as e: # connection errors and timeouts
+                error = LLMHTTPError(f"Could not reach the model endpoint: {e}", retryable=True)
+                retry_after = None
+
+            if not error.retryable or attempt >= self.max_retries:
+                raise error
+            time.sleep(self._delay(attempt, retry_after))
+            attempt += 1
+
+    def _delay(self, attempt, retry_after=None) -> float:
+        """The number of seconds to wait before the next attempt."""
+        if retry_after is not None:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass # an HTTP date: fall back to the exponential backoff
+        return self.backoff * 2 ** attempt + random.uniform(0, self.backoff)
+
+
+def estimate_tokens(text: str, reply_tokens=500) -> int:
+    """
+    Roughly estimate the number of tokens a request uses (about 4 characters per token for the
+    prompt, plus an allowance for the reply), for the tokens-per-minute limit.
+
+    Args:
+        text (str): The text sent to the model.
+        reply_tokens (int): The number of tokens expected in the reply.
+
+    Returns:
+        int: The estimated number of tokens.
+    """
+    return len(text) // 4 + reply_tokens
+
+
+class AsyncRateLimiter:
+    """
+    Token buckets for the requests-per-minute (RPM) and tokens-per-minute (TPM) limits of a
+    provider. A bucket starts full, refills continuously at its per-minute rate, and a request
+    waits until both buckets hold enough for it.
+    """
+
+    def __init__(self, rpm=None, tpm=None):
+        self.capacities = {"requests": rpm, "tokens": tpm}
+        self.levels = {name: capacity for name, capacity in self.capacities.items() if capacity}
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        for name in self.levels:
+            capacity = self.capacities[name]
+            self.levels[name] = min(capacity, self.levels[name] + (now - self.updated) * capacity / 60)
+        self.updated = now
+
+    async def acquire(self, tokens=0):
+        """
+        Wait until a request using the given number of tokens is allowed.
+
+        Args:
+            tokens (int): The (estimated) number of tokens of the request.
+        """
+        needed = {"requests": 1, "tokens": tokens}
+        async with self._lock: # requests are let through one at a time, in order
+            while True:
+                self._refill()
+                # A request bigger than a whole bucket waits for a full bucket instead of forever
+                missing = {name: min(needed[name], self.capacities[name]) - level for name, level in self.levels.items()}
+                wait = max([missing[name] * 60 / self.capacities[name] for name in missing] + [0])
+                if wait <= 0:
+                    for name in self.levels:
+                        self.levels[name] -= min(needed[name], self.capacities[name])
+                    return
+                await asyncio.sleep(wait)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> ChatClient:
+    """
+    Get the chat client shared by all the LLM features of this process.
+
+    Returns:
+        ChatClient: The shared client.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = ChatClient()
+        return _client
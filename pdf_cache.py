@@ -0,0 +1,197 @@
+"""
+PDF Cache
+
+A persistent, content-addressed cache of compiled resumes. The key of a PDF is a hash of the
+rendered LaTeX source, the contents of the template class and the version of the LaTeX engine,
+so a document that was compiled before is never compiled again: the stored PDF is hardlinked
+(or copied) to the output instead.
+
+The cache lives in .cache/pdf. Its size is bounded: when it grows over the limit, the least
+recently used PDFs are evicted. Hits and misses are counted for monitoring.
+
+Command line usage: python pdf_cache.py (stats|clear)
+"""
+
+import hashlib
+import os
+import shutil
+import sqlite3
+import sys
+import time
+from contextlib import contextmanager
+
+import latex_format
+
+CACHE_DIR = os.path.join(".cache", "pdf")
+DEFAULT_MAX_BYTES = 200 * 1024 * 1024 # 200 MB
+
+
+class PdfCache:
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with self._connect() as connection:
+            connection.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, size INTEGER NOT NULL, "
+                               "last_used REAL NOT NULL)")
+            connection.execute("CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)")
+            connection.execute("CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+
+    @contextmanager
+    def _connect(self):
+        # The batch mode uses the cache from several processes at once: wait for the lock
+        connection = sqlite3.connect(os.path.join(self.cache_dir, "index.sqlite"), timeout=30)
+        try:
+            with connection: # commit (or roll back) the transaction
+                yield connection
+        finally:
+            connection.close()
+
+    def _path(self, key) -> str:
+        return os.path.join(self.cache_dir, key + ".pdf")
+
+    @staticmethod
+    def make_key(tex_source, engine="xelatex") -> str:
+        """
+        Compute the cache key of a LaTeX document.
+
+        Args:
+            tex_source (str): The LaTeX source of the document.
+            engine (str): The LaTeX engine that compiles the document.
+
+        Returns:
+            str: The hex digest identifying the compiled PDF.
+        """
+        digest = hashlib.sha256()
+        digest.update(tex_source.encode("utf-8"))
+        digest.update(b"\0")
+        document_class = latex_format.find_document_class(tex_source)
+        if document_class is not None:
+            class_path = document_class[0] if document_class[0].endswith(".cls") else document_class[0] + ".cls"
+            if os.path.isfile(class_path):
+                with open(class_path, 'rb') as file:
+                    digest.update(file.read())
+        digest.update(b"\0")
+        digest.update(latex_format.engine_fingerprint(engine).encode("utf-8"))
+        return digest.hexdigest()
+
+    def fetch(self, key, destination) -> bool:
+        """
+        Place the cached PDF of a key at the destination path.
+
+        Args:
+            key (str): The cache key.
+            destination (str): Path of the PDF to create.
+
+        Returns:
+            bool: True on a cache hit, False on a miss.
+        """
+        path = self._path(key)
+        with self._connect() as connection:
+            found = connection.execute("SELECT 1 FROM entries WHERE key = ?", (key,)).fetchone() is not None
+            if found and os.path.exists(path):
+                connection.execute("UPDATE entries SET last_used = ? WHERE key = ?", (time.time(), key))
+            else:
+                found = False
+            self._count(connection, "hits" if found else "misses")
+        if not found:
+            return False
+
+        if os.path.exists(destination):
+            os.remove(destination)
+        try:
+            os.link(path, destination)
+        except OSError: # e.g. different file systems or no hardlink support
+            shutil.copyfile(path, destination)
+        return True
+
+    def store(self, key, pdf_path):
+        """
+        Add a compiled PDF to the cache and evict the least recently used PDFs if needed.
+
+        Args:
+            key (str): The cache key.
+            pdf_path (str): Path of the compiled PDF.
+        """
+        path = self._path(key)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        shutil.copyfile(pdf_path, temp_path)
+        os.replace(temp_path, path)
+        with self._connect() as connection:
+            connection.execute("INSERT OR REPLACE INTO entries (key, size, last_used) VALUES (?, ?, ?)",
+                               (key, os.path.getsize(path), time.time()))
+            self._evict(connection)
+
+    def _evict(self, connection):
+        total = connection.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in connection.execute("SELECT key, size FROM entries ORDER BY last_used").fetchall():
+            if total <= self.max_bytes:
+                break
+            connection.execute("DELETE FROM entries WHERE key = ?", (key,))
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+            total -= size
+            self._count(connection, "evictions")
+
+    @staticmethod
+    def _count(connection, name):
+        connection.execute("INSERT INTO stats (name, value) VALUES (?, 1) "
+                           "ON CONFLICT(name) DO UPDATE SET value = value + 1", (name,))
+
+    def stats(self) -> dict:
+        """
+        Get the statistics of the cache.
+
+        Returns:
+            dict: The number of hits, misses and evictions, and the number and total size of the entries.
+        """
+        with self._connect() as connection:
+            stats = {"hits": 0, "misses": 0, "evictions": 0}
+            stats.update(dict(connection.execute("SELECT name, value FROM stats").fetchall()))
+            stats["entries"], stats["bytes"] = connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        return stats
+
+    def clear(self):
+        """Remove all the cached PDFs and reset the statistics."""
+        with self._connect() as connection:
+            for (key,) in connection.execute("SELECT key FROM entries").fetchall():
+                try:
+                    os.remove(self._path(key))
+                except FileNotFoundError:
+                    pass
+            connection.execute("DELETE FROM entries")
+            connection.execute("DELETE FROM stats")
+
+
+_pdf_cache = None
+
+
+def get_pdf_cache() -> PdfCache:
+    """
+    Get the shared PDF cache of this process.
+
+    Returns:
+        PdfCache: The PDF cache in .cache/pdf.
+    """
+    global _pdf_cache
+    if _pdf_cache is None:
+        _pdf_cache = PdfCache()
+    return _pdf_cache
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2 or sys.argv[1] not in ("stats", "clear"):
+        print("Usage: python pdf_cache.py (stats|clear)")
+        sys.exit(1)
+
+    if sys.argv[1] == "stats":
+        for name, value in get_pdf_cache().stats().items():
+            print(f"{name}: {value}")
+    else:
+        get_pdf_cache().clear()
+        print("PDF cache cleared!")
@@ -0,0 +1,322 @@
+"""
+Resume Builder - Batch Mode
+
+Builds many resumes at once. Every candidate is compiled in its own worker process with its
+own scratch directory, so the throughput scales with the number of CPU cores.
+
+A data source can be:
+- a directory containing the five csv files (personal_info.csv, education.csv, experience.csv,
+  certifications.csv and skills.csv),
+- a .json file in the format of ResumeBuilder.get_resume_builder_json(),
+- a .resume file (see resume_store.py) or an older .pkl file,
+- the csv export of many candidates (see csv_ingest.py): a directory with the five csv files
+  with a "candidate id" column, or a single .csv file with a "candidate id" and a "section" column.
+
+The output PDF of each candidate is named after its data source (e.g. candidates/alice/ gives
+alice.pdf), or after its candidate id for an export, so reruns always produce the same file names.
+
+The candidates of an export are read one at a time while the resumes are built, and only a few
+resumes per worker wait in the queue, so an export of any size is built with constant memory.
+
+With --template, the resumes follow a LaTeX example file instead of the template class: the model
+turns the example into a fill-in skeleton once (see template_skeleton.py), and every resume is
+then filled in locally, so a batch costs at most one model call.
+
+Command line usage: python resume_builder.py batch <data source> [<data source> ...]
+                        [--output-dir DIR] [--workers N] [--preserve-latex] [--latex-only] [--encoding ENCODING]
+                        [--template FILE]
+"""
+
+import argparse
+import itertools
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+import csv_ingest
+import latex_format
+from latex_compiler import ENGINE
+from pdf_cache import get_pdf_cache
+from resume_builder import DOCUMENT_CLASS, DOCUMENT_CLASS_OPTIONS, ResumeBuilder
+
+PENDING_JOBS_PER_WORKER = 2 # jobs submitted ahead of the results, so the workers never wait for the reading
+
+
+@dataclass
+class BatchJob:
+    """A single resume to build: the output name and the loaded candidate data."""
+    name: str
+    builder: ResumeBuilder
+
+
+@dataclass
+class BatchResult:
+    """The outcome of a single batch job."""
+    name: str
+    success: bool
+    pdf_path: str = None
+    error: str = None
+    elapsed: float = 0.0
+
+
+def load_builder(source) -> ResumeBuilder:
+    """
+    Load the data of one candidate from a data source.
+
+    Args:
+        source (str): A directory of csv files, a .json file, a .resume file or a .pkl file.
+
+    Returns:
+        ResumeBuilder: The resume builder holding the candidate data.
+    """
+    builder = ResumeBuilder()
+    if os.path.isdir(source):
+        builder.load_csv_directory(source)
+    elif source.endswith(".json"):
+        with open(source, 'r', encoding="utf-8") as file:
+            if not builder.load_resume_builder_json(file.read()):
+                raise ValueError(f"Invalid resume builder JSON file: {source}")
+    elif source.endswith((".resume", ".pkl")):
+        builder.load_resume_builder(source)
+    else:
+        raise ValueError(f"Unsupported data source: {source}")
+    return builder
+
+
+def iter_jobs(sources, encoding=None, on_error=None):
+    """
+    Create the batch jobs for a list of data sources, one at a time: the candidates of an export
+    are read while the jobs are used.
+
+    Each job is named after its data source, or after its candidate id for an export. When two
+    sources (or candidates of two exports) share the same name, the later ones get the position of
+    their source in the list appended (e.g. resume_3), so the names stay unique and deterministic.
+
+    Args:
+        sources (list[str]): The data sources.
+        encoding (str, optional): The encoding of the csv exports without a byte order mark. Defaults to UTF-8.
+        on_error (callable, optional): Function called as on_error(candidate_id, error) for a candidate of
+            an export with invalid rows, which is then skipped. Defaults to raising the error.
+
+    Yields:
+        BatchJob: One job per data source or candidate, in the same order.
+    """
+    names = set()
+    for index, source in enumerate(sources):
+        if os.path.isfile(source) and source.endswith(".csv"):
+            candidates = csv_ingest.iter_combined(source, encoding, on_error=on_error)
+        elif os.path.isdir(source) and csv_ingest.is_multi_candidate(source, encoding):
+            candidates = csv_ingest.iter_directory(source, encoding, on_error=on_error)
+        else:
+            name = os.path.splitext(os.path.basename(os.path.normpath(source)))[0]
+            yield BatchJob(_unique_name(name, index, names), load_builder(source))
+            continue
+        for candidate_id, builder in candidates:
+            yield BatchJob(_unique_name(csv_ingest.candidate_filename(candidate_id), index, names), builder)
+
+
+def _unique_name(name, index, names) -> str:
+    """Make a job name unique by appending the position of its source (and a number if that is taken too)."""
+    unique, number = name, 1
+    if unique in names:
+        unique = f"{name}_{index}"
+    while unique in names:
+        number += 1
+        unique = f"{name}_{index}_{number}"
+    names.add(unique)
+    return unique
+
+
+def jobs_from_sources(sources, encoding=None) -> list:
+    """
+    Create the batch jobs for a list of data sources (see iter_jobs).
+
+    Args:
+        sources (list[str]): The data sources.
+        encoding (str, optional): The encoding of the csv exports without a byte order mark.
+
+    Returns:
+        list[BatchJob]: One job per data source or candidate, in the same order.
+    """
+    return list(iter_jobs(sources, encoding))
+
+
+def _run_job(job, output_dir, preserve_latex, template) -> BatchResult:
+    """Build a single resume. This runs inside a worker process."""
+    start = time.perf_counter()
+    try:
+        success = job.builder.generate_resume(job.name, preserve_latex=preserve_latex, output_dir=output_dir,
+                                              save_state=False, quiet=True, template=template)
+        pdf_path = os.path.join(output_dir, f"{job.name}.pdf")
+        error = None if success else job.builder.compile_result.error_message()
+        return BatchResult(job.name, success, pdf_path if success else None, error, time.perf_counter() - start)
+    except Exception as e:
+        return BatchResult(job.name, False, None, f"{type(e).__name__}: {e}", time.perf_counter() - start)
+
+
+def iter_batch(jobs, output_dir="output/batch", max_workers=None, preserve_latex=False, template=None):
+    """
+    Build many resumes in parallel, taking the jobs one at a time: only a few jobs per worker wait
+    in the queue, so the jobs can come from an export of any size.
+
+    Args:
+        jobs (Iterable[BatchJob]): The resumes to build.
+        output_dir (str): Directory that receives the generated PDFs.
+        max_workers (int, optional): Number of worker processes. Defaults to the number of CPU cores.
+        preserve_latex (bool): Flag to preserve the LaTeX files next to the PDFs.
+        template (TemplateSkeleton, optional): The skeleton of a LaTeX example file to fill instead of the template class.
+
+    Yields:
+        BatchResult: The result of every job, in the same order as the jobs.
+    """
+    jobs = iter(jobs)
+    first = next(jobs, None)
+    if first is None:
+        return
+    os.makedirs(output_dir, exist_ok=True)
+    max_workers = max_workers or os.cpu_count() or 1
+
+    # Build the precompiled format once up front instead of in every worker at the same time
+    document_class = (DOCUMENT_CLASS, DOCUMENT_CLASS_OPTIONS) if template is None else latex_format.find_format_class(template.text)
+    if document_class is not None:
+        latex_format.get_format(*document_class, ENGINE)
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        pending = deque() # (job name, future) of the submitted jobs, in order
+        count = 0
+        for job in itertools.chain([first], jobs):
+            pending.append((job.name, executor.submit(_run_job, job, output_dir, preserve_latex, template)))
+            if len(pending) >= max_workers * PENDING_JOBS_PER_WORKER:
+                count += 1
+                yield _wait_result(*pending.popleft(), count)
+        while pending:
+            count += 1
+            yield _wait_result(*pending.popleft(), count)
+
+
+def _wait_result(name, future, count) -> BatchResult:
+    """Wait for the result of a submitted job and print it."""
+    try:
+        result = future.result()
+    except Exception as e: # the worker process itself died
+        result = BatchResult(name, False, error=f"{type(e).__name__}: {e}")
+    status = "ok" if result.success else f"FAILED ({result.error})"
+    print(f"[{count}] {result.name}: {status} in {result.elapsed:.2f}s")
+    return result
+
+
+def build_batch(jobs, output_dir="output/batch", max_workers=None, preserve_latex=False, template=None) -> list:
+    """
+    Build many resumes in parallel (see iter_batch).
+
+    Args:
+        jobs (Iterable[BatchJob]): The resumes to build.
+        output_dir (str): Directory that receives the generated PDFs.
+        max_workers (int, optional): Number of worker processes. Defaults to the number of CPU cores.
+        preserve_latex (bool): Flag to preserve the LaTeX files next to the PDFs.
+        template (TemplateSkeleton, optional): The skeleton of a LaTeX example file to fill instead of the template class.
+
+    Returns:
+        list[BatchResult]: The result of every job, in the same order as the jobs.
+    """
+    return list(iter_batch(jobs, output_dir, max_workers, preserve_latex, template))
+
+
+def iter_render(jobs, output_dir="output/batch", template=None):
+    """
+    Write the LaTeX source of many resumes without compiling them, e.g. for diffing.
+    Rendering happens in memory, so this is fast enough to run in a single process.
+
+    Args:
+        jobs (Iterable[BatchJob]): The resumes to render.
+        output_dir (str): Directory that receives the generated .tex files.
+        template (TemplateSkeleton, optional): The skeleton of a LaTeX example file to fill instead of the template class.
+
+    Yields:
+        str: The path of every .tex file, in the same order as the jobs.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    for job in jobs:
+        path = os.path.join(output_dir, f"{job.name}.tex")
+        with open(path, 'w', encoding="utf-8") as file:
+            file.write(job.builder.render_latex(template=template))
+        yield path
+
+
+def render_batch(jobs, output_dir="output/batch", template=None) -> list:
+    """
+    Write the LaTeX source of many resumes without compiling them (see iter_render).
+
+    Args:
+        jobs (Iterable[BatchJob]): The resumes to render.
+        output_dir (str): Directory that receives the generated .tex files.
+        template (TemplateSkeleton, optional): The skeleton of a LaTeX example file to fill instead of the template class.
+
+    Returns:
+        list[str]: The paths of the .tex files, in the same order as the jobs.
+    """
+    return list(iter_render(jobs, output_dir, template))
+
+
+def main(argv) -> int:
+    """
+    Command line entry point of the batch mode.
+
+    Args:
+        argv (list[str]): The command line arguments after the 'batch' subcommand.
+
+    Returns:
+        int: 0 if every resume was built successfully, 1 otherwise.
+    """
+    parser = argparse.ArgumentParser(prog="resume_builder.py batch", description="Build many resumes in parallel.")
+    parser.add_argument("sources", nargs="+", help="directories of csv files, .json files, .resume files, .pkl files "
+                                                   "or csv exports of many candidates")
+    parser.add_argument("--output-dir", default="output/batch", help="directory for the generated PDFs")
+    parser.add_argument("--workers", type=int, default=None, help="number of worker processes (default: CPU count)")
+    parser.add_argument("--preserve-latex", action="store_true", help="keep the generated .tex files")
+    parser.add_argument("--latex-only", action="store_true", help="only write the .tex files, do not compile them")
+    parser.add_argument("--encoding", default=None, help="encoding of the csv exports without a byte order mark "
+                                                         "(default: UTF-8)")
+    parser.add_argument("--template", default=None, help="LaTeX example file to follow instead of the template class "
+                                                         "(asks the model once to learn its skeleton)")
+    args = parser.parse_args(argv)
+
+    template = None
+    if args.template is not None:
+        from llm_client import LLMError
+        from resume_latex_generator import ResumeLatexGenerator, TemplateSkeletonError
+        with open(args.template, 'r', encoding="utf-8") as file:
+            template_text = file.read()
+        try:
+            template = ResumeLatexGenerator().get_skeleton(template_text)
+        except (LLMError, TemplateSkeletonError) as e:
+            print(f"Could not learn the skeleton of {args.template}: {e}")
+            return 1
+
+    # Only the failures are kept, the other results are counted as they come
+    skipped, failed = [], []
+
+    def skip_candidate(candidate_id, error):
+        print(f"Skipped candidate {candidate_id}: {error}")
+        skipped.append(BatchResult(csv_ingest.candidate_filename(candidate_id), False, error=str(error)))
+
+    jobs = iter_jobs(args.sources, args.encoding, skip_candidate)
+    start = time.perf_counter()
+    if args.latex_only:
+        count = sum(1 for path in iter_render(jobs, args.output_dir, template))
+        print(f"Rendered {count} LaTeX files in {time.perf_counter() - start:.3f}s")
+    else:
+        count = 0
+        for result in iter_batch(jobs, args.output_dir, args.workers, args.preserve_latex, template):
+            count += 1
+            if not result.success:
+                failed.append(result)
+        print(f"\nBuilt {count - len(failed)}/{count + len(skipped)} resumes in {time.perf_counter() - start:.2f}s")
+    for result in skipped + failed:
+        print(f"Failed: {result.name}: {result.error}")
+    if not args.latex_only:
+        stats = get_pdf_cache().stats()
+        print(f"PDF cache: {stats['hits']} hits, {stats['misses']} misses, {stats['entries']} entries ({stats['bytes']} bytes)")
+    return 1 if skipped or failed else 0
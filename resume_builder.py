@@ -17,17 +17,36 @@ Files required:
     - skills.csv
 
 Command line usage: python resume_builder.py (<output_filename>) (<preserve LaTeX file=False>)
+Batch usage: python resume_builder.py batch <data source> [<data source> ...] [--output-dir DIR] [--workers N]
+    (a data source is a directory with the five csv files, a .json file or a saved .resume or .pkl file)
 
 Note: The user needs to provide the required information in the csv files before running the script.
-        Currently, up to 5 experience explanations are supported.
+        The experience explanations go in the columns explanation1, explanation2, ... (any number of them).
+        The csv files are checked when they are loaded: a missing column is reported with its file and line.
+        The csv files are read as UTF-8 (or UTF-16 when they start with its byte order mark).
 """
 
 import json
 import os
 import csv
-import pickle
-import time
+import shutil
 import sys
+import tempfile
+
+import resume_store
+from csv_ingest import open_csv
+from latex_compiler import compile_latex
+from latex_renderer import get_render_plan
+from resume_model import Certification, Education, Experience, PersonalInfo, ResumeDataError, Skill, load_section
+
+# The template class used by the generated resumes
+DOCUMENT_CLASS = "templates/resume_config"
+DOCUMENT_CLASS_OPTIONS = "letterpaper"
+
+# The labels of the plain text format (see get_resume_content) and their csv headers
+TEXT_LABELS = {"Job Title": "job title", "Company": "company name", "Employment Period": "beginning and end of employment",
+               "School": "school name", "Credential": "credential name", "Graduation Date": "date of graduation",
+               "Completion Date": "date of completion", "Skill": "name"}
 
 class ResumeBuilder:
     def __init__(self):
@@ -35,152 +54,141 @@ class ResumeBuilder:
         if not os.path.exists('output'):
             os.makedirs('output')
 
-        self.personal_info = {}
+        # The resume data, as records (see resume_model.py)
+        self.personal_info = PersonalInfo()
         self.education = []
         self.experience = []
         self.certifications = []
         self.skills = []
 
         self.is_loaded = False # Flag to check if a resume has been loaded/generated
+        self.compile_result = None # The CompileResult of the last generate_resume, with its diagnostics
 
     def load_personal_info(self, file_path):
-        with open(file_path, 'r') as file:
+        with open_csv(file_path) as file:
             reader = csv.DictReader(file)
-            self.personal_info = next(reader)
+            row = next(reader, None)
+            if row is None:
+                raise ResumeDataError(f"{file_path}: no personal information")
+            self.personal_info = PersonalInfo.from_row(row, f"{file_path} line {reader.line_num}")
         return self.personal_info
 
     def load_experience(self, file_path):
-        with open(file_path, 'r') as file:
-            reader = csv.DictReader(file)
-            self.experience = [row for row in reader]
+        self.experience = self._load_records(file_path, Experience)
         return self.experience
 
     def load_education(self, file_path):
-        with open(file_path, 'r') as file:
-            reader = csv.DictReader(file)
-            self.education = [row for row in reader]
+        self.education = self._load_records(file_path, Education)
         return self.education
 
     def load_certifications(self, file_path):
-        with open(file_path, 'r') as file:
-            reader = csv.DictReader(file)
-            self.certifications = [row for row in reader]
+        self.certifications = self._load_records(file_path, Certification)
         return self.certifications
     
     def load_skills(self, file_path):
-        with open(file_path, 'r') as file:
-            reader = csv.DictReader(file)
-            self.skills = [row for row in reader]
+        self.skills = self._load_records(file_path, Skill)
         return self.skills
 
-    def generate_resume(self, filename="new_resume", preserve_latex=False):
+    def _load_records(self, file_path, record_class):
+        """Read the rows of a csv file into records, checking every row (see resume_model.py)."""
+        with open_csv(file_path) as file:
+            reader = csv.DictReader(file)
+            return [record_class.from_row(row, f"{file_path} line {reader.line_num}") for row in reader]
+
+    def render_latex(self, document_class=DOCUMENT_CLASS, class_options=DOCUMENT_CLASS_OPTIONS, template=None) -> str:
+        """
+        Render the resume data into a LaTeX document in memory, without touching the disk.
+
+        Args:
+            document_class (str): The template class of the document.
+            class_options (str): The options of the template class.
+            template (TemplateSkeleton, optional): The skeleton of a LaTeX example file (see
+                template_skeleton.py), used instead of the template class.
+
+        Returns:
+            str: The LaTeX source of the resume.
+        """
+        renderer = template if template is not None else get_render_plan(document_class, class_options)
+        return renderer.render(self.personal_info, self.experience, self.education, self.certifications, self.skills)
+
+    def generate_resume(self, filename="new_resume", preserve_latex=False, output_dir="output", save_state=True, quiet=False, on_job=None,
+                        template=None) -> bool:
         """
         Generate resume using the provided data.
 
+        The LaTeX file is written and compiled inside a private scratch directory, so several
+        resumes can be generated at the same time without clobbering each other's files.
+
         Args:
             filename (str): Name of the output file.
             preserve_latex (bool): Flag to preserve the LaTeX file after generating the PDF.
+            output_dir (str): Directory that receives the generated PDF (and LaTeX file).
+            save_state (bool): Flag to save the resume builder data to the resume database (see save_resume_builder).
+            quiet (bool): Flag to hide the output of the LaTeX engine.
+            on_job (callable, optional): Function called with the compile job, e.g. to cancel it.
+            template (TemplateSkeleton, optional): The skeleton of a LaTeX example file to fill
+                instead of the template class (see render_latex).
+
+        Returns:
+            bool: True if the resume PDF was generated successfully (see compile_result for the
+                diagnostics of the compile).
         """
+        os.makedirs(output_dir, exist_ok=True)
+        build_dir = tempfile.mkdtemp(prefix="resume_build_")
+        tex_path = os.path.join(build_dir, f"{filename}.tex")
+
         # Generate and compile the LaTeX resume
-        with open("temp_resume.tex", 'w') as file:
-            # Start of the LaTeX document
-            file.write("\documentclass[letterpaper]{templates/resume_config}\n\n")
-            file.write(r"\begin{document}")
-            file.write("\n\n")
-            
-            # Personal information
-            file.write("\Header\n    {" + self.personal_info['name'] + "}\n    {"
-                       + self.personal_info['city'] + ", " + self.personal_info['province'] + "}\n    {"
-                       + self.personal_info['phone number'] + "}\n    {"
-                       + self.personal_info['email'] + "}\n    {"
-                       + self.personal_info['linkedin link (https://linkedin.com/in/_______)'] + "}")
-            file.write("\n\n")
-
-            # Experience
-            file.write("\section{Experience}\n\n")
-            
-            for exp in self.experience: 
-                exp_string = "\WorkExperience\n    {" + exp['job title'] + "}\n    {"\
-                + exp['company name'] + "}\n    {"\
-                + exp['beginning and end of employment'] + "}\n    {"\
-                + exp['city'] + ", " + exp['country of employment'] + "}\n    {\n"
-                for i in range(1, 6): # Support up to 5 experience explanations
-                    if 'explanation' + str(i) not in exp or not exp['explanation' + str(i)]:
-                        # No more experience entries
-                        break
-                    exp_string += "        \item " + exp['explanation' + str(i)] + "\n"
-                exp_string += "}"
-                file.write(exp_string)
-                file.write("\n\n")
-            file.write("\n\n")
-
-            # Education
-            file.write("\section{Education}\n\n")
-
-            for edu in self.education:
-                edu_string = "\EducationExperience\n    {" + edu['school name'] + "}\n    {"\
-                + edu['credential name'] + "}\n    {"\
-                + edu['date of graduation'] + "}\n    {"\
-                + edu['city'] + ", " + edu['country of school'] + "}\n"
-                file.write(edu_string)
-                file.write("\n\n")
-            file.write("\n\n")
-
-            # Certifications
-            file.write("\section{Certifications}\n\n")
-            for cert in self.certifications:
-                cert_string = "\Certification\n    {" + cert['credential name'] + "}\n    {"\
-                + cert['school name'] + "}\n    {"\
-                + cert['date of completion'] + "}\n"
-                file.write(cert_string)
-                file.write("\n\n")
-            file.write("\n\n")
-
-            # Skills
-            file.write("\section{Skills}\n\n")
-            file.write(r"\begin{SkillsList}")
-            for skill in self.skills:
-                file.write("\n    \item " + skill['name'])
-            file.write("\n\end{SkillsList}")
-            file.write("\n\n")
-
-            # End of the LaTeX document
-            file.write("\end{document}")
-        
+        with open(tex_path, 'w', encoding="utf-8") as file:
+            file.write(self.render_latex(template=template))
+
         try:
             # Compile the LaTeX file to generate the PDF
             print("Outputing resume pdf...")
-            os.system("xelatex temp_resume.tex -output-directory=output -interaction=nonstopmode")
-
-            # Check if the PDF file was generated successfully and rename it
-            if os.path.exists("output/temp_resume.pdf"):
-                os.rename("output/temp_resume.pdf", f"output/{filename}.pdf")
+            result = compile_latex(tex_path, build_dir, quiet=quiet, on_job=on_job)
+
+            self.compile_result = result
+
+            # Check if the PDF file was generated successfully and move it to the output directory
+            if result.success:
+                os.replace(result.pdf_path, os.path.join(output_dir, f"{filename}.pdf"))
+                print(f"\nResume generated successfully in {result.elapsed:.2f}s!")
+                for diagnostic in result.diagnostics: # e.g. overfull boxes
+                    print(diagnostic)
+            elif result.cancelled:
+                print(f"\n{result.error_message()}")
+            else:
+                print(f"\nError: {result.error_message()}")
+                if result.log_excerpt and not result.errors: # the first error is in the message
+                    print(result.log_excerpt)
 
             self.is_loaded = True
-            print("\nResume generated successfully!")
 
             # Save the resume builder data to a file
-            self.save_resume_builder_pkl(filename)
+            if save_state:
+                self.save_resume_builder(filename)
+
+            return result.success
 
         finally:
-            # Clean up temporary files
-            time.sleep(1)
-            if os.path.exists("output/temp_resume.pdf"):
-                os.remove("output/temp_resume.pdf")
-            if not preserve_latex:
-                os.remove("temp_resume.tex")
-                #os.remove("temp_resume.fdb_latexmk")
-                #os.remove("temp_resume.fls")
-            else:
-                os.rename("temp_resume.tex", f"output/{filename}.tex")
-
-            # Remove auxiliary files
-            try:
-                os.remove("output/temp_resume.aux")
-                os.remove("output/temp_resume.log")
-                os.remove("output/temp_resume.out")
-            except:
-                pass
+            # Keep the LaTeX file if requested, then remove the scratch directory with all the
+            # auxiliary files
+            if preserve_latex and os.path.exists(tex_path):
+                os.replace(tex_path, os.path.join(output_dir, f"{filename}.tex"))
+            shutil.rmtree(build_dir, ignore_errors=True)
+
+    def load_csv_directory(self, data_dir="data"):
+        """
+        Load all the resume data from the csv files of a data directory.
+
+        Args:
+            data_dir (str): Directory containing personal_info.csv, education.csv, experience.csv,
+                certifications.csv and skills.csv.
+        """
+        self.load_personal_info(os.path.join(data_dir, 'personal_info.csv'))
+        self.load_education(os.path.join(data_dir, 'education.csv'))
+        self.load_experience(os.path.join(data_dir, 'experience.csv'))
+        self.load_certifications(os.path.join(data_dir, 'certifications.csv'))
+        self.load_skills(os.path.join(data_dir, 'skills.csv'))
     
     def get_resume_builder_json(self) -> str:
         """
@@ -190,36 +198,60 @@ class ResumeBuilder:
             str: The resume builder data in JSON format.
         """
         resume_builder = {
-            "personal_info": self.personal_info,
-            "experience": self.experience,
-            "education": self.education,
-            "certifications": self.certifications,
-            "skills": self.skills
+            "personal_info": self.personal_info.to_row(),
+            "experience": [exp.to_row() for exp in self.experience],
+            "education": [edu.to_row() for edu in self.education],
+            "certifications": [cert.to_row() for cert in self.certifications],
+            "skills": [skill.to_row() for skill in self.skills]
         }
         return json.dumps(resume_builder)
     
-    def save_resume_builder_pkl(self, filename="new_resume") -> bool:
+    def save_resume_builder(self, filename="new_resume") -> bool:
         """
-        Save the resume builder data to a file using pickling (serialization).
-        All the saved .pkl files are stored in the 'saved' directory.
+        Save the resume builder data to the resume database (saved/resumes.sqlite, see
+        resume_database.py), replacing the data saved under the same name.
 
         Args:
-            filename (str): Name of the output file.
+            filename (str): Name to save the data under.
 
         Returns:
             bool: True if the resume builder data was saved successfully.
         """
+        from resume_database import get_resume_database # loads the database (and NumPy) on the first save only
+
         try:
-            if not os.path.exists("saved"):
-                os.makedirs("saved")
-            with open(f"saved/{filename}.pkl", 'wb') as file:
-                pickle.dump(self, file)
+            get_resume_database().save(filename, self)
             print("Resume builder data saved successfully!")
             return True
         except Exception as e:
             print(f"Error: {e}")
             return False
 
+    def load_saved_resume(self, name) -> bool:
+        """
+        Load the resume builder data saved in the resume database.
+
+        Args:
+            name (str): Name the data was saved under.
+
+        Returns:
+            bool: True if the resume builder data was loaded successfully.
+
+        Raises:
+            ResumeDataError: If the saved data is damaged.
+        """
+        from resume_database import get_resume_database
+
+        sections = get_resume_database().load(name)
+        if sections is None:
+            print(f"Error: no resume builder data is saved as {name}")
+            return False
+        for section, records in sections.items():
+            setattr(self, section, records)
+        self.is_loaded = True
+        print("Resume builder data loaded successfully!")
+        return True
+
     def load_resume_builder_json(self, json_str) -> bool:
         """
         Load the resume builder data from a JSON string.
@@ -232,11 +264,8 @@ class ResumeBuilder:
         """
         try:
             resume_builder = json.loads(json_str)
-            self.personal_info = resume_builder["personal_info"]
-            self.experience = resume_builder["experience"]
-            self.education = resume_builder["education"]
-            self.certifications = resume_builder["certifications"]
-            self.skills = resume_builder["skills"]
+            self._set_records(resume_builder["personal_info"], resume_builder["experience"], resume_builder["education"],
+                              resume_builder["certifications"], resume_builder["skills"], "JSON")
             self.is_loaded = True
             print("Resume builder data loaded successfully!")
             return True
@@ -244,27 +273,59 @@ class ResumeBuilder:
             print(f"Error: {e}")
             return False
 
+    def load_resume_builder(self, filepath) -> bool:
+        """
+        Load the resume builder data from a saved file: a .resume file, or an older .pkl file
+        (the data saved in the resume database is loaded with load_saved_resume).
+
+        Args:
+            filepath (str): Path of the input file.
+
+        Returns:
+            bool: True if the resume builder data was loaded successfully.
+
+        Raises:
+            ResumeDataError: If the file is damaged or is not a saved resume builder.
+        """
+        if filepath.endswith(".pkl"):
+            return self.load_resume_builder_pkl(filepath)
+        # The records are checked while they are decoded
+        for section, records in resume_store.load(filepath).items():
+            setattr(self, section, records)
+        self.is_loaded = True
+        print("Resume builder data loaded successfully!")
+        return True
+
     def load_resume_builder_pkl(self, filepath) -> bool:
         """
-        Load the resume builder data from a file using pickling (deserialization).
+        Load the resume builder data from an older .pkl file (a pickled ResumeBuilder). Only the
+        resume builder and the record classes are unpickled, see resume_store.load_pickle.
 
         Args:
             filepath (str): Path of the input file.
 
         Returns:
             bool: True if the resume builder data was loaded successfully.
+
+        Raises:
+            ResumeDataError: If the file is not a pickled resume builder.
         """
-        with open(filepath, 'rb') as file:
-            resume_builder = pickle.load(file)
-        self.personal_info = resume_builder.personal_info
-        self.experience = resume_builder.experience
-        self.education = resume_builder.education
-        self.certifications = resume_builder.certifications
-        self.skills = resume_builder.skills
+        resume_builder = resume_store.load_pickle(filepath)
+        # Older .pkl files hold the rows as dicts: they are turned into records here
+        self._set_records(resume_builder.personal_info, resume_builder.experience, resume_builder.education,
+                          resume_builder.certifications, resume_builder.skills, filepath)
         self.is_loaded = True
         print("Resume builder data loaded successfully!")
         return True
 
+    def _set_records(self, personal_info, experience, education, certifications, skills, source, strict=True):
+        """Validate the data of all the sections (rows or records) and keep them as records."""
+        self.personal_info = PersonalInfo.from_row(personal_info, f"{source}: personal_info", strict)
+        self.experience = load_section(Experience, experience, f"{source}: experience", strict)
+        self.education = load_section(Education, education, f"{source}: education", strict)
+        self.certifications = load_section(Certification, certifications, f"{source}: certifications", strict)
+        self.skills = load_section(Skill, skills, f"{source}: skills", strict)
+
     def get_resume_content(self) -> str:
         """
         Get the content of the resume in plain text format (not LaTeX). This is used for the resume improver.
@@ -274,39 +335,36 @@ class ResumeBuilder:
         """
         content = ""
         content += "Personal Information:\n"
-        for key, value in self.personal_info.items():
+        for key, value in self.personal_info.to_row().items():
             content += f"{key}: {value}\n"
         content += "\n"
         
         content += "Experience:\n"
         for exp in self.experience:
-            content += f"Job Title: {exp['job title']}\n"
-            content += f"Company: {exp['company name']}\n"
-            content += f"Employment Period: {exp['beginning and end of employment']}\n"
-            for i in range(1, 6): # Support up to 5 experience explanations
-                if 'explanation' + str(i) not in exp or not exp['explanation' + str(i)]:
-                    # No more experience entries
-                    break
-                content += f"Explanation {i}: {exp['explanation' + str(i)]}\n"
+            content += f"Job Title: {exp.title}\n"
+            content += f"Company: {exp.company}\n"
+            content += f"Employment Period: {exp.period}\n"
+            for i, bullet in enumerate(exp.bullets, 1):
+                content += f"Explanation {i}: {bullet}\n"
             content += "\n"
 
         content += "Education:\n"
         for edu in self.education:
-            content += f"School: {edu['school name']}\n"
-            content += f"Credential: {edu['credential name']}\n"
-            content += f"Graduation Date: {edu['date of graduation']}\n"
+            content += f"School: {edu.school}\n"
+            content += f"Credential: {edu.credential}\n"
+            content += f"Graduation Date: {edu.graduation}\n"
             content += "\n"
 
         content += "Certifications:\n"
         for cert in self.certifications:
-            content += f"Credential: {cert['credential name']}\n"
-            content += f"School: {cert['school name']}\n"
-            content += f"Completion Date: {cert['date of completion']}\n"
+            content += f"Credential: {cert.credential}\n"
+            content += f"School: {cert.school}\n"
+            content += f"Completion Date: {cert.completion}\n"
             content += "\n"
 
         content += "Skills:\n"
         for skill in self.skills:
-            content += f"Skill: {skill['name']}\n"
+            content += f"Skill: {skill.name}\n"
 
         return content
     
@@ -317,69 +375,44 @@ class ResumeBuilder:
         Args:
             text (str): The content of the resume in plain text format.
         """
-        lines = text.split("\n")
-        section = ""
+        section_headers = {"Personal Information:": "personal_info", "Experience:": "experience",
+                           "Education:": "education", "Certifications:": "certifications", "Skills:": "skills"}
         personal_info = {}
-        experience = []
-        education = []
-        certifications = []
-        skills = []
-        for line in lines:
-            print(line)
-            if line == "Personal Information:":
-                section = "personal_info"
-                continue
-            elif line == "Experience:":
-                section = "experience"
-                continue
-            elif line == "Education:":
-                section = "education"
-                continue
-            elif line == "Certifications:":
-                section = "certifications"
-                continue
-            elif line == "Skills:":
-                section = "skills"
-                continue
-            elif section == "personal_info":
-                key, value = line.split(": ")
-                personal_info[key] = value
-            elif section == "experience":
-                if line == "":
-                    experience.append({})
-                else:
-                    key, value = line.split(": ")
-                    experience[-1][key] = value
-            elif section == "education":
-                if line == "":
-                    education.append({})
-                else:
-                    key, value = line.split(": ")
-                    education[-1][key] = value
-            elif section == "certifications":
-                if line == "":
-                    certifications.append({})
-                else:
-                    key, value = line.split(": ")
-                    certifications[-1][key] = value
-            elif section == "skills":
-                if line == "":
-                    skills.append({})
-                else:
-                    key, value = line.split(": ")
-                    skills[-1][key] = value
-
-        self.personal_info = personal_info
-        self.experience = experience
-        self.education = education
-        self.certifications = certifications
-        self.skills = skills
+        sections = {"experience": [], "education": [], "certifications": [], "skills": []}
+        section = ""
+        entry = None
+        for line in text.split("\n"):
+            if line in section_headers:
+                section = section_headers[line]
+                entry = None
+            elif line == "": # the end of an entry
+                entry = None
+            elif section and ": " in line:
+                label, value = line.split(": ", 1)
+                key = label if section == "personal_info" else TEXT_LABELS.get(label, label.lower().replace(" ", ""))
+                if section == "personal_info":
+                    personal_info[key] = value
+                    continue
+                if entry is None or key in entry: # e.g. the skills are not separated by blank lines
+                    entry = {}
+                    sections[section].append(entry)
+                entry[key] = value
+
+        # The columns that are not in the text (e.g. the city of a job) are left empty
+        self._set_records(personal_info, sections["experience"], sections["education"], sections["certifications"],
+                          sections["skills"], "text", strict=False)
         self.is_loaded = True
 
 if __name__ == '__main__':
+    # Batch mode: build many resumes in parallel (see resume_batch.py)
+    if len(sys.argv) > 1 and sys.argv[1] == "batch":
+        from resume_batch import main as batch_main
+        sys.exit(batch_main(sys.argv[2:]))
+
     # Read the arguments
     if len(sys.argv) == 1: # Default output filename
         output_filename = "new_resume"
+        preserve_latex = False
     elif len(sys.argv) == 2: # Custom output filename or preserve LaTeX file flag
         if sys.argv[1].lower() == "true":
             preserve_latex = True
@@ -395,6 +428,7 @@ if __name__ == '__main__':
         preserve_latex = sys.argv[2].lower() == "true"
     else:
         print("Usage: python resume_builder.py (<output_filename>) (<preserve LaTeX file=False>)")
+        print("       python resume_builder.py batch <data source> [<data source> ...] [--output-dir DIR] [--workers N]")
         sys.exit(1)
     
 
@@ -402,10 +436,6 @@ if __name__ == '__main__':
     builder = ResumeBuilder()
 
     # Load data from csv files
-    builder.load_personal_info('data/personal_info.csv')
-    builder.load_education('data/education.csv')
-    builder.load_experience('data/experience.csv')
-    builder.load_certifications('data/certifications.csv')
-    builder.load_skills('data/skills.csv')
+    builder.load_csv_directory('data')
 
     builder.generate_resume(output_filename, preserve_latex=preserve_latex)
@@ -0,0 +1,562 @@
+"""
+Resume Database
+
+The store of the saved resume builders: a SQLite database in saved/resumes.sqlite instead of one
+file per save. Every saved resume keeps its data in the save format of resume_store.py, next to
+the columns used to find it: the name it was saved under, the name and email of the candidate and
+the time it was saved, each with an index, and the companies and schools of the candidate in
+their own indexed tables. The skills, job titles, companies, credentials, schools and bullets
+of every resume are kept in an inverted index (see resume_index.py, updated in the same
+transaction as every save or delete), so candidates can be found by their words and ranked by
+BM25, with a weight per field (a skill counts more than a word of a bullet).
+
+Listing goes page by page from the most recent save. A page starts after the last row of the
+previous one (keyset pagination), so every page costs the same however deep it is, and filtering
+by the start of a name, email, company or school uses the indexes: lookups stay in the
+milliseconds with 100,000 saved resumes. So does a ranked query (e.g. python "machine learning"
+phd), even when its words are in every resume.
+
+Command line usage: python resume_database.py list [<field> <prefix>] | search <words> | rank <query>
+                        | delete <save name> | import [<directory>] | reindex | stats | bench [<count>]
+"""
+
+import itertools
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+import resume_store
+
+DATABASE_PATH = os.path.join("saved", "resumes.sqlite")
+PAGE_SIZE = 50
+
+# The fields a listing can be filtered on, and the SQL condition matching the start of their value
+FILTERS = {
+    "save": "resumes.name >= :low AND resumes.name < :high",
+    "name": "resumes.candidate >= :low AND resumes.candidate < :high",
+    "email": "resumes.email >= :low AND resumes.email < :high",
+    "company": "resumes.id IN (SELECT resume_id FROM companies WHERE company >= :low AND company < :high)",
+    "school": "resumes.id IN (SELECT resume_id FROM schools WHERE school >= :low AND school < :high)",
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS resumes (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE COLLATE NOCASE,
+    candidate TEXT NOT NULL COLLATE NOCASE, email TEXT NOT NULL COLLATE NOCASE, saved REAL NOT NULL, data BLOB NOT NULL);
+CREATE INDEX IF NOT EXISTS resumes_candidate ON resumes (candidate);
+CREATE INDEX IF NOT EXISTS resumes_email ON resumes (email);
+CREATE INDEX IF NOT EXISTS resumes_saved ON resumes (saved, id);
+CREATE TABLE IF NOT EXISTS companies (resume_id INTEGER NOT NULL, company TEXT NOT NULL COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS companies_company ON companies (company, resume_id);
+CREATE INDEX IF NOT EXISTS companies_resume ON companies (resume_id);
+CREATE TABLE IF NOT EXISTS schools (resume_id INTEGER NOT NULL, school TEXT NOT NULL COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS schools_school ON schools (school, resume_id);
+CREATE INDEX IF NOT EXISTS schools_resume ON schools (resume_id);
+"""
+SCHEMA_VERSION = 1 # 1: the inverted index of resume_index.py replaced the FTS5 index of the bullets
+
+
+@dataclass
+class SavedResume:
+    """A saved resume builder, as listed by the database (without its data)."""
+    id: int
+    name: str # the name it was saved under
+    candidate: str
+    email: str
+    saved: float # when it was saved (a timestamp)
+
+
+class ResumeDatabase:
+    # resume_index (and NumPy) are imported when the database is used, not when this module is
+    # imported: the GUI and the resume builder import it at startup
+    def __init__(self, path=DATABASE_PATH):
+        import resume_index
+
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as connection:
+            connection.executescript(_SCHEMA + resume_index.SCHEMA)
+            version = connection.execute("PRAGMA user_version").fetchone()[0]
+        if version < SCHEMA_VERSION:
+            self.reindex()
+            with self._connect() as connection:
+                connection.execute("DROP TABLE IF EXISTS bullets") # the FTS5 index of the first version
+                connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    @contextmanager
+    def _connect(self):
+        # The GUI and the batch mode may use the database at the same time: wait for the lock
+        connection = sqlite3.connect(self.path, timeout=30)
+        try:
+            with connection: # commit (or roll back) the transaction
+                yield connection
+        finally:
+            connection.close()
+
+    def save(self, name, builder) -> int:
+        """
+        Save a resume builder, replacing the one saved under the same name.
+
+        Args:
+            name (str): The name to save it under.
+            builder (ResumeBuilder): The resume builder.
+
+        Returns:
+            int: The id of the saved resume.
+        """
+        return self.save_many([(name, builder)])[0]
+
+    def save_many(self, items) -> list:
+        """
+        Save many resume builders in a single transaction, e.g. for an import: much faster than
+        saving them one at a time.
+
+        Args:
+            items (Iterable[tuple[str, ResumeBuilder]]): The name to save each resume builder under, and
+                the builder. When a name is given twice, the last builder is saved.
+
+        Returns:
+            list[int]: The ids of the saved resumes, in the order of the items.
+        """
+        import resume_index
+
+        items = list(items)
+        latest = {name.lower(): number for number, (name, builder) in enumerate(items)}
+        ids, documents = {}, []
+        with self._connect() as connection:
+            for number, (name, builder) in enumerate(items):
+                if latest[name.lower()] == number:
+                    ids[name.lower()] = self._insert(connection, name, builder)
+                    documents.append((ids[name.lower()], resume_index.document_fields(
+                        builder.experience, builder.education, builder.certifications, builder.skills)))
+            resume_index.add(connection, documents)
+        return [ids[name.lower()] for name, builder in items]
+
+    def _insert(self, connection, name, builder) -> int:
+        """Insert the row of a resume and of its companies and schools (the caller indexes it)."""
+        import resume_index
+
+        data = resume_store.encode(builder, name)
+        companies = {exp.company for exp in builder.experience if exp.company}
+        schools = {edu.school for edu in builder.education if edu.school} \
+            | {cert.school for cert in builder.certifications if cert.school}
+
+        row = connection.execute("SELECT id FROM resumes WHERE name = ?", (name,)).fetchone()
+        if row is not None:
+            self._delete(connection, [row[0]])
+        resume_id = resume_index.next_id(connection, connection.execute("SELECT MAX(id) FROM resumes").fetchone()[0])
+        connection.execute("INSERT INTO resumes (id, name, candidate, email, saved, data) VALUES (?, ?, ?, ?, ?, ?)",
+                           (resume_id, name, builder.personal_info.name, builder.personal_info.email, time.time(), data))
+        connection.executemany("INSERT INTO companies (resume_id, company) VALUES (?, ?)",
+                               [(resume_id, company) for company in companies])
+        connection.executemany("INSERT INTO schools (resume_id, school) VALUES (?, ?)",
+                               [(resume_id, school) for school in schools])
+        return resume_id
+
+    def load(self, name):
+        """
+        Load a saved resume builder.
+
+        Args:
+            name (str): The name it was saved under.
+
+        Returns:
+            dict: The records of each section (see resume_store.decode), or None if there is no
+                resume saved under that name.
+
+        Raises:
+            ResumeDataError: If the saved data is damaged.
+        """
+        with self._connect() as connection:
+            row = connection.execute("SELECT data FROM resumes WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            return None
+        return resume_store.decode(row[0], f"{self.path}: {name}")
+
+    def list_page(self, field=None, prefix="", after=None, limit=PAGE_SIZE) -> list:
+        """
+        List a page of the saved resumes, from the most recent.
+
+        Args:
+            field (str, optional): The field to filter on (save, name, email, company or school).
+            prefix (str): The start of the value of the field (case insensitive). Empty for no filter.
+            after (SavedResume, optional): The last resume of the previous page. Defaults to the first page.
+            limit (int): The number of resumes of the page.
+
+        Returns:
+            list[SavedResume]: The resumes of the page.
+
+        Raises:
+            ValueError: If the field is unknown or the limit is less than 1.
+        """
+        if limit < 1:
+            raise ValueError(f"The limit must be at least 1, not {limit}")
+        conditions, parameters = [], {"limit": limit}
+        if field is not None and prefix:
+            if field not in FILTERS:
+                raise ValueError(f"Unknown field: {field} (expected one of {', '.join(FILTERS)})")
+            conditions.append(FILTERS[field])
+            parameters.update(low=prefix, high=prefix + "\U0010ffff")
+        if after is not None:
+            conditions.append("(resumes.saved, resumes.id) < (:saved, :id)")
+            parameters.update(saved=after.saved, id=after.id)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self._connect() as connection:
+            rows = connection.execute(f"SELECT id, name, candidate, email, saved FROM resumes {where} "
+                                      f"ORDER BY saved DESC, id DESC LIMIT :limit", parameters).fetchall()
+        return [SavedResume(*row) for row in rows]
+
+    def get(self, name):
+        """
+        Find a saved resume by the name it was saved under (case insensitive).
+
+        Args:
+            name (str): The name it was saved under.
+
+        Returns:
+            SavedResume: The saved resume, or None if there is none under that name.
+        """
+        with self._connect() as connection:
+            row = connection.execute("SELECT id, name, candidate, email, saved FROM resumes WHERE name = ?", (name,)).fetchone()
+        return SavedResume(*row) if row is not None else None
+
+    def search(self, words, after=None, limit=PAGE_SIZE) -> list:
+        """
+        Search the bullets of the work experience of the saved resumes, from the most recent save.
+        (The matches are not ranked, so the pages can go on from the last resume shown: see rank
+        for the best matches.)
+
+        Args:
+            words (str): The words to find (all of them, the last one may be the start of a word).
+            after (SavedResume, optional): The last resume of the previous page. Defaults to the first page.
+            limit (int): The number of resumes of the page.
+
+        Returns:
+            list[SavedResume]: The matching resumes.
+
+        Raises:
+            ValueError: If the limit is less than 1.
+        """
+        import resume_index
+
+        if limit < 1:
+            raise ValueError(f"The limit must be at least 1, not {limit}")
+
+        # The words are taken literally, without the query syntax of rank
+        terms = [resume_index.QueryTerm([word], "bullets") for word in resume_index.tokenize(words)]
+        if not terms:
+            return []
+        terms[-1].prefix = True
+        # A resume saved again gets a new id, so the ids follow the save times
+        after_id = after.id if after is not None else sys.maxsize
+        with self._connect() as connection:
+            ids, scores = resume_index.match(connection, terms, ranked=False)
+            ids = ids[ids < after_id][::-1][:limit]
+            return self._fetch(connection, ids.tolist())
+
+    def rank(self, query, limit=PAGE_SIZE) -> list:
+        """
+        Find the saved resumes having all the words of a query, the best matches first (BM25,
+        with the weights of resume_index.FIELDS).
+
+        Args:
+            query (str): The words to find, e.g. python "machine learning" phd. A word can be
+                limited to a field (skills:python, titles:engineer, companies:, credentials:,
+                schools: or bullets:), and can end with * to match the words starting with it.
+                The words of a "phrase" must be in the same field.
+            limit (int): The number of resumes.
+
+        Returns:
+            list[tuple[SavedResume, float]]: The resumes and their scores (higher is better).
+
+        Raises:
+            ValueError: If a word is limited to an unknown field or the limit is less than 1.
+        """
+        import numpy as np
+
+        import resume_index
+
+        if limit < 1:
+            raise ValueError(f"The limit must be at least 1, not {limit}")
+
+        terms = resume_index.parse_query(query)
+        if not terms:
+            return []
+        with self._connect() as connection:
+            ids, scores = resume_index.match(connection, terms)
+            if len(ids) > limit:
+                best = np.argpartition(-scores, limit - 1)[:limit]
+                ids, scores = ids[best], scores[best]
+            order = np.lexsort((ids, -scores)) # ties: the oldest save first
+            resumes = self._fetch(connection, ids[order].tolist())
+        return list(zip(resumes, scores[order].tolist()))
+
+    @staticmethod
+    def _fetch(connection, ids) -> list:
+        """Get the saved resumes of some ids, in the same order."""
+        rows = connection.execute(f"SELECT id, name, candidate, email, saved FROM resumes WHERE id IN ({', '.join('?' * len(ids))})",
+                                  ids).fetchall()
+        resumes = {row[0]: SavedResume(*row) for row in rows}
+        return [resumes[resume_id] for resume_id in ids if resume_id in resumes]
+
+    def delete(self, ids) -> int:
+        """
+        Delete saved resumes.
+
+        Args:
+            ids (Iterable[int]): The ids of the resumes (see SavedResume).
+
+        Returns:
+            int: The number of deleted resumes.
+        """
+        with self._connect() as connection:
+            return self._delete(connection, list(ids))
+
+    @staticmethod
+    def _delete(connection, ids) -> int:
+        import resume_index
+
+        parameters = [(resume_id,) for resume_id in ids]
+        connection.executemany("DELETE FROM companies WHERE resume_id = ?", parameters)
+        connection.executemany("DELETE FROM schools WHERE resume_id = ?", parameters)
+        resume_index.remove(connection, ids)
+        before = connection.total_changes
+        connection.executemany("DELETE FROM resumes WHERE id = ?", parameters)
+        return connection.total_changes - before
+
+    def count(self) -> int:
+        """
+        Get the number of saved resumes.
+
+        Returns:
+            int: The number of saved resumes.
+        """
+        with self._connect() as connection:
+            return connection.execute("SELECT COUNT(*) FROM resumes").fetchone()[0]
+
+    def clear(self):
+        """Delete all the saved resumes."""
+        import resume_index
+
+        with self._connect() as connection:
+            for table in ("companies", "schools", "resumes"):
+                connection.execute(f"DELETE FROM {table}")
+            resume_index.clear(connection)
+
+    def reindex(self) -> int:
+        """
+        Build the inverted index again from the saved data, e.g. after the indexed fields changed.
+        This also drops the postings of the deleted resumes and merges the segments of every term.
+
+        Returns:
+            int: The number of indexed resumes.
+        """
+        import resume_index
+
+        count = 0
+        with self._connect() as connection:
+            resume_index.clear(connection)
+            rows = connection.execute("SELECT id, name, data FROM resumes ORDER BY id")
+            while batch := rows.fetchmany(1000):
+                resume_index.add(connection, [(resume_id, resume_index.document_fields(**resume_store.decode(data, f"{self.path}: {name}")))
+                                              for resume_id, name, data in batch])
+                count += len(batch)
+        return count
+
+    def stats(self) -> dict:
+        """
+        Get the size of the database and of its inverted index.
+
+        Returns:
+            dict: The number of saved resumes, the size of the database file and of the index (in bytes,
+                None if this SQLite cannot measure it).
+        """
+        import resume_index
+
+        with self._connect() as connection:
+            try:
+                index_bytes = connection.execute(f"SELECT COALESCE(SUM(pgsize), 0) FROM dbstat WHERE name IN "
+                                                 f"({', '.join('?' * len(resume_index.TABLES))})", resume_index.TABLES).fetchone()[0]
+            except sqlite3.OperationalError: # SQLite built without the dbstat table
+                index_bytes = None
+            return {"resumes": connection.execute("SELECT COUNT(*) FROM resumes").fetchone()[0],
+                    "database_bytes": os.path.getsize(self.path), "index_bytes": index_bytes}
+
+    def import_files(self, directory="saved") -> list:
+        """
+        Add the saved files of a directory (.resume files and older .pkl files) to the database,
+        under their file names, in a single transaction. The files are kept, and names already in
+        the database are skipped.
+
+        Args:
+            directory (str): The directory of the saved files.
+
+        Returns:
+            list[tuple[str, str]]: The (file, error message or None) of every file.
+        """
+        from resume_builder import ResumeBuilder
+
+        results, loaded = [], []
+        with self._connect() as connection:
+            existing = {name.lower() for (name,) in connection.execute("SELECT name FROM resumes")}
+        for file in sorted(os.listdir(directory)):
+            name, extension = os.path.splitext(file)
+            if extension not in (resume_store.EXTENSION, ".pkl"):
+                continue
+            path = os.path.join(directory, file)
+            if name.lower() in existing:
+                results.append((path, f"a resume is already saved as {name}"))
+                continue
+            try:
+                builder = ResumeBuilder()
+                builder.load_resume_builder(path)
+                loaded.append((name, builder))
+                existing.add(name.lower())
+                results.append((path, None))
+            except (resume_store.ResumeDataError, OSError) as e:
+                results.append((path, str(e)))
+        self.save_many(loaded)
+        return results
+
+
+_resume_database = None
+
+
+def get_resume_database() -> ResumeDatabase:
+    """
+    Get the shared resume database of this process.
+
+    Returns:
+        ResumeDatabase: The resume database in saved/resumes.sqlite.
+    """
+    global _resume_database
+    if _resume_database is None:
+        _resume_database = ResumeDatabase()
+    return _resume_database
+
+
+def benchmark(builder, count=100000, path=None) -> dict:
+    """
+    Measure the build throughput, the size and the query times of the inverted index on a
+    database of resumes made from variations of a resume builder (its skills, jobs, schools and
+    bullets mixed with generated words, the common ones much more often than the rare ones).
+
+    Args:
+        builder (ResumeBuilder): The resume builder the resumes are made from.
+        count (int): The number of resumes.
+        path (str, optional): The database file to create. Defaults to a temporary file, removed afterwards.
+
+    Returns:
+        dict: The resumes saved per second (in bulk and one at a time), the sizes in bytes, and
+            the median time of every query in milliseconds with its number of results.
+    """
+    from resume_model import Certification, Education, Experience, Skill
+
+    generator = random.Random(0)
+    words = sorted({word for exp in builder.experience for bullet in exp.bullets for word in bullet.split() if word.isalpha()})
+    skills = [skill.name for skill in builder.skills] + [f"skill{number}" for number in range(2000)]
+    titles = [exp.title for exp in builder.experience] + [f"title{number}" for number in range(300)]
+    companies = [exp.company for exp in builder.experience] + [f"company{number}" for number in range(5000)]
+    credentials = [edu.credential for edu in builder.education] + ["PhD in Computer Science"] + [f"credential{number}" for number in range(200)]
+    schools = [edu.school for edu in builder.education] + [f"school{number}" for number in range(1000)]
+    vocabulary = words + [f"word{number}" for number in range(5000)]
+
+    # The entries of a pool are picked with Zipf's law (the n-th entry n times less often than the first)
+    pools = {id(pool): list(itertools.accumulate(1 / rank for rank in range(1, len(pool) + 1)))
+             for pool in (skills, titles, companies, credentials, schools, vocabulary)}
+
+    def pick(pool):
+        return generator.choices(pool, cum_weights=pools[id(pool)])[0]
+
+    def variation(number):
+        variant = type(builder).__new__(type(builder)) # only the records are needed, not the output directory
+        variant.personal_info = builder.personal_info
+        variant.skills = [Skill(name) for name in {pick(skills) for _ in range(10)}]
+        variant.experience = [Experience(pick(titles), pick(companies), "2019-2021", "", "",
+                                         [" ".join(pick(vocabulary) for _ in range(12)) for _ in range(4)]) for _ in range(3)]
+        variant.education = [Education(pick(schools), pick(credentials), "2019", "", "") for _ in range(2)]
+        variant.certifications = [Certification(pick(credentials), pick(schools), "2020")]
+        return f"bench{number}", variant
+
+    database_path = path or os.path.join(tempfile.mkdtemp(prefix="resume_bench_"), "resumes.sqlite")
+    database = ResumeDatabase(database_path)
+    try:
+        start = time.perf_counter()
+        for first in range(0, count, 1000):
+            database.save_many(variation(number) for number in range(first, min(first + 1000, count)))
+        bulk_rate = count / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for number in range(100): # saving again replaces the resume and its index entries
+            database.save(*variation(number))
+        single_rate = 100 / (time.perf_counter() - start)
+
+        skill, title, credential = builder.skills[0].name, builder.experience[0].title.split()[0], "phd"
+        queries = [skill, f"{skill} {title}", f'skills:{skill} "computer science" {credential}',
+                   f"{words[0] if words else skill} {words[1] if len(words) > 1 else title}", "skill1999", "word12*"]
+        timings = {}
+        for query in queries:
+            times = []
+            for _ in range(5):
+                start = time.perf_counter()
+                results = database.rank(query, limit=20)
+                times.append((time.perf_counter() - start) * 1000)
+            timings[query] = (sorted(times)[2], len(results))
+        return {"bulk_per_second": bulk_rate, "single_per_second": single_rate, **database.stats(), "queries": timings}
+    finally:
+        if path is None:
+            os.remove(database_path)
+            os.rmdir(os.path.dirname(database_path))
+
+
+def _print_resumes(resumes):
+    for resume in resumes:
+        saved = time.strftime("%Y-%m-%d %H:%M", time.localtime(resume.saved))
+        print(f"{resume.name}\t{resume.candidate}\t{resume.email}\t{saved}")
+
+
+if __name__ == '__main__':
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+    if command == "list" and len(sys.argv) in (2, 4):
+        _print_resumes(get_resume_database().list_page(*sys.argv[2:4]))
+    elif command == "search" and len(sys.argv) > 2:
+        _print_resumes(get_resume_database().search(" ".join(sys.argv[2:])))
+    elif command == "delete" and len(sys.argv) == 3:
+        resume = get_resume_database().get(sys.argv[2])
+        if resume is None:
+            print(f"No resume is saved as {sys.argv[2]}")
+            sys.exit(1)
+        get_resume_database().delete([resume.id])
+        print(f"Deleted {resume.name}")
+    elif command == "import" and len(sys.argv) in (2, 3):
+        for path, error in get_resume_database().import_files(sys.argv[2] if len(sys.argv) == 3 else "saved"):
+            print(f"{path}: {'imported' if error is None else 'skipped, ' + error}")
+    elif command == "rank" and len(sys.argv) > 2:
+        for resume, score in get_resume_database().rank(" ".join(sys.argv[2:])):
+            print(f"{score:6.2f}", end="\t")
+            _print_resumes([resume])
+    elif command == "reindex" and len(sys.argv) == 2:
+        print(f"Indexed {get_resume_database().reindex()} saved resumes")
+    elif command == "stats" and len(sys.argv) == 2:
+        stats = get_resume_database().stats()
+        index_size = "unknown" if stats["index_bytes"] is None else f"{stats['index_bytes']} bytes"
+        print(f"saved resumes: {stats['resumes']}\ndatabase: {stats['database_bytes']} bytes\ninverted index: {index_size}")
+    elif command == "bench" and len(sys.argv) in (2, 3):
+        from resume_builder import ResumeBuilder
+        resume_builder = ResumeBuilder()
+        resume_builder.load_csv_directory("data")
+        results = benchmark(resume_builder, int(sys.argv[2]) if len(sys.argv) == 3 else 100000)
+        print(f"{results['resumes']} resumes: {results['bulk_per_second']:.0f} saved per second in bulk, "
+              f"{results['single_per_second']:.0f} per second one at a time")
+        index_size = "unknown" if results["index_bytes"] is None else f"{results['index_bytes'] / 1e6:.1f} MB"
+        print(f"database: {results['database_bytes'] / 1e6:.1f} MB, inverted index: {index_size}")
+        for query, (milliseconds, found) in results["queries"].items():
+            print(f"rank {query!r}: {milliseconds:.1f} ms ({found} results)")
+    else:
+        print("Usage: python resume_database.py list [<field> <prefix>] | search <words> | rank <query> | delete <save name> "
+              "| import [<directory>] | reindex | stats | bench [<count>]")
+        sys.exit(1)
@@ -1,52 +1,300 @@
-import requests
+import hashlib
 import json
 import os
-from dotenv import load_dotenv
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 
-load_dotenv()
+from llm_client import LLMError, LLMResponseError, get_client
+
+IMPROVEMENTS_PATH = os.path.join(".cache", "improvements.json")
+MAX_STORED_IMPROVEMENTS = 2000
+
+ENTRY_PROMPT = "You are a resume writing tutor. Your job is to improve the quality of one entry of the user's resume (the {section} section) and make the expression as professional and human-like as possible, while not distorting the truth. Please provide the improved version of the entry following the original JSON format. DO NOT change ANY of the keys. Reply with the JSON only."
+
+# The sections of the resume builder JSON that are lists of independent entries
+ENTRY_SECTIONS = ("experience", "education", "certifications")
+
+
+@dataclass
+class ImprovementReport:
+	"""Which entries of the resume were sent to the model, reused from earlier runs, or kept as they were."""
+	improved: list = field(default_factory=list)
+	reused: list = field(default_factory=list)
+	failed: list = field(default_factory=list) # (entry label, error message)
+
+	def summary(self) -> str:
+		return f"{len(self.improved)} entries improved, {len(self.reused)} unchanged entries reused, {len(self.failed)} failed"
+
+
+def split_entries(resume_data: dict) -> list:
+	"""
+	Split the resume builder data into independent entries: the personal information, each job,
+	each degree, each certification, and the skills as a whole.
+
+	Args:
+		resume_data (dict): The resume builder data (see ResumeBuilder.get_resume_builder_json).
+
+	Returns:
+		list[tuple[str, int, object]]: The (section, index, entry) of every entry. The index is None
+			for the sections that are a single entry.
+	"""
+	entries = [("personal_info", None, resume_data["personal_info"])]
+	for section in ENTRY_SECTIONS:
+		entries += [(section, index, entry) for index, entry in enumerate(resume_data[section])]
+	entries.append(("skills", None, resume_data["skills"]))
+	return entries
+
+
+def entry_label(section, index) -> str:
+	"""A readable name for an entry, e.g. experience 2."""
+	return section if index is None else f"{section} {index + 1}"
+
+
+def entry_hash(section, entry, prompt) -> str:
+	"""The content hash of an entry: it changes whenever the entry (or the prompt) changes."""
+	digest = hashlib.sha256()
+	for part in (section, prompt, json.dumps(entry, sort_keys=True)):
+		digest.update(part.encode("utf-8"))
+		digest.update(b"\0")
+	return digest.hexdigest()
+
+
+def parse_entry(reply, original):
+	"""
+	Parse the improved version of an entry from a reply of the model.
+
+	Args:
+		reply (str): The reply of the model.
+		original (dict | list): The entry that was sent to the model.
+
+	Returns:
+		dict | list: The improved entry.
+
+	Raises:
+		LLMResponseError: If the reply is not JSON, does not have the same structure and keys as the
+			original, or has a value that is not a string (e.g. null).
+	"""
+	text = reply.strip()
+	if text.startswith("```"): # a fenced code block, e.g. ```json ... ```
+		text = text.split("\n", 1)[-1].rsplit("```", 1)[0]
+	try:
+		improved = json.loads(text)
+	except ValueError as e:
+		raise LLMResponseError(f"The model did not reply with JSON: {reply[:200]}") from e
+
+	if isinstance(original, dict):
+		if not isinstance(improved, dict) or set(improved) != set(original):
+			raise LLMResponseError("The model changed the keys of the entry")
+		return {key: _text(improved[key], key) for key in original} # keep the original key order
+	if not isinstance(improved, list) or len(improved) != len(original) \
+			or any(not isinstance(new, dict) or set(new) != set(old) for new, old in zip(improved, original)):
+		raise LLMResponseError("The model changed the structure of the entries")
+	return [{key: _text(new[key], key) for key in old} for new, old in zip(improved, original)]
+
+
+def _text(value, key):
+	"""A value of an improved entry, which must be a string (str() would turn a null into "None")."""
+	if not isinstance(value, str):
+		raise LLMResponseError(f"The model replied with {json.dumps(value)} instead of a text for {key}")
+	return value
+
+
+def merge_entry(resume_data, section, index, entry):
+	"""Put an (improved) entry back at its place in the resume builder data."""
+	if index is None:
+		resume_data[section] = entry
+	else:
+		resume_data[section][index] = entry
+
+
+def check_same_keys(original, merged, path="resume"):
+	"""
+	Check that a merged resume has exactly the structure of the original: no key was dropped,
+	added or renamed, and no entry was dropped or added.
+
+	Args:
+		original (dict | list | str): The original resume builder data.
+		merged (dict | list | str): The merged resume builder data.
+		path (str): Where in the resume the check is (for the error message).
+
+	Raises:
+		LLMResponseError: If the structures differ.
+	"""
+	if isinstance(original, dict):
+		if not isinstance(merged, dict) or set(merged) != set(original):
+			missing = sorted(set(original) - set(merged or {})) if isinstance(merged, dict) else "all"
+			raise LLMResponseError(f"The improved resume lost or renamed keys in {path}: {missing}")
+		for key in original:
+			check_same_keys(original[key], merged[key], f"{path}.{key}")
+	elif isinstance(original, list):
+		if not isinstance(merged, list) or len(merged) != len(original):
+			raise LLMResponseError(f"The improved resume lost or added entries in {path}")
+		for index, (old, new) in enumerate(zip(original, merged)):
+			check_same_keys(old, new, f"{path}[{index}]")
+
+
+def _stream_to(pieces, label, stop):
+	"""An on_token function that queues the pieces of one entry, tagged with the entry label."""
+	def on_token(text):
+		if stop.is_set(): # the caller gave up on the improvement: end the stream
+			raise LLMError("The improvement was stopped")
+		pieces.put((label, text))
+	return on_token
+
+
+def _relay_pieces(futures, pieces, on_token):
+	"""Pass the queued pieces to on_token until all the entries are done."""
+	while True:
+		done = all(future.done() for future in futures)
+		try:
+			while True:
+				on_token(*pieces.get(timeout=0.05))
+		except queue.Empty:
+			if done:
+				return
 
-url = os.getenv('url')
-auth_key = os.getenv("auth_key")
 
 class ResumeImprover:
-	def __init__(self):
-		pass
+	def __init__(self, improvements_path=IMPROVEMENTS_PATH):
+		self.improvements_path = improvements_path
+		self.improvements = None # content hash -> improved entry, loaded on first use
+
+	def get_advice(self, content: str, prompt=None, use_cache=True, on_token=None) -> str:
+		"""
+		Improve the content of a resume.
+
+		Args:
+			content (str): The content of the resume.
+			prompt (str, optional): The prompt for the model. Defaults to None.
+			use_cache (bool): Flag to reuse the reply of an identical earlier request.
+			on_token (callable, optional): Function called with every piece of the reply as it streams in.
 
-	def get_advice(self, content: str, prompt=None) -> str:
+		Returns:
+			str: The improved resume.
+
+		Raises:
+			LLMError: If the model could not be reached or did not answer properly.
+		"""
 		if prompt is None:
 			prompt = "You are a resume writing tutor. Your job is to improve the quality of the user's resume and make the expression as professional and human-like as possible, while not distorting the truth."
-		if url is None or auth_key is None:
-			return Exception("Please set the url and auth_key in the .env file")
-		
+		return get_client().complete(prompt, content, use_cache=use_cache, on_token=on_token)
+
+	def improve_entries(self, resume_data: dict, prompt=ENTRY_PROMPT, use_cache=True, max_workers=8, on_token=None):
+		"""
+		Improve a resume entry by entry. Every entry gets a content hash, and only the entries that
+		are new or changed since an earlier run are sent to the model: the improved versions of the
+		unchanged entries are reused. An entry that the model fails to improve is kept as it was.
+
+		The entries that need the model are improved concurrently (up to max_workers requests in
+		flight), so a long resume takes about as long as its largest entry. The improved entries are
+		merged back in their original order, and the merge is checked for dropped or renamed keys.
+
+		Args:
+			resume_data (dict): The resume builder data (see ResumeBuilder.get_resume_builder_json).
+			prompt (str): The prompt for the model. "{section}" is replaced by the section of the entry.
+			use_cache (bool): Flag to reuse the earlier improvements (and cached replies).
+			max_workers (int): Maximum number of entries improved at the same time (1 to improve them one by one).
+			on_token (callable, optional): Function called as on_token(entry label, text) with every piece of
+				the replies as they stream in. It is always called on the calling thread. If it raises, the
+				improvement stops and the exception is passed on.
+
+		Returns:
+			tuple[dict, ImprovementReport]: The improved resume builder data, with exactly the same
+				keys, and which entries were improved, reused or kept.
+
+		Raises:
+			LLMResponseError: If the merged resume does not have the same keys as the original.
+		"""
+		self._load_improvements()
+		improved_data = json.loads(json.dumps(resume_data)) # a deep copy
+		report = ImprovementReport()
+
+		pending = [] # (section, index, content hash, entry) of the entries to send to the model
+		new_improvements = {} # content hash -> improved entry, stored once the merge is checked
+		for section, index, entry in split_entries(resume_data):
+			key = entry_hash(section, entry, prompt)
+			improved = self.improvements.get(key) if use_cache else None
+			if improved is None:
+				pending.append((section, index, key, entry))
+			else:
+				report.reused.append(entry_label(section, index))
+				merge_entry(improved_data, section, index, improved)
+
+		if pending:
+			with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(pending)))) as executor:
+				pieces = queue.Queue() # streamed pieces of all the entries, relayed on this thread
+				stop = threading.Event()
+				futures = [executor.submit(self.improve_entry, section, entry, prompt, use_cache,
+										   _stream_to(pieces, entry_label(section, index), stop) if on_token else None)
+						   for section, index, key, entry in pending]
+				if on_token is not None:
+					try:
+						_relay_pieces(futures, pieces, on_token)
+					except BaseException:
+						# on_token gave up (e.g. the task was cancelled): end the streams in flight
+						# and drop the entries that did not start
+						stop.set()
+						executor.shutdown(cancel_futures=True)
+						raise
+				# Collect in submission order, so the merge does not depend on which reply came first
+				for (section, index, key, entry), future in zip(pending, futures):
+					try:
+						improved = future.result()
+					except LLMError as e:
+						report.failed.append((entry_label(section, index), str(e)))
+						continue
+					new_improvements[key] = improved
+					report.improved.append(entry_label(section, index))
+					merge_entry(improved_data, section, index, improved)
+
+		# Only the improvements of a merge that kept the structure of the resume are stored
+		check_same_keys(resume_data, improved_data)
+		if new_improvements:
+			self.improvements.update(new_improvements)
+			self._save_improvements()
+		return improved_data, report
+
+	def improve_entry(self, section, entry, prompt=ENTRY_PROMPT, use_cache=True, on_token=None):
+		"""
+		Improve a single entry of a resume.
+
+		Args:
+			section (str): The section of the entry, e.g. experience.
+			entry (dict | list): The entry.
+			prompt (str): The prompt for the model. "{section}" is replaced by the section of the entry.
+			use_cache (bool): Flag to reuse the reply of an identical earlier request.
+			on_token (callable, optional): Function called with every piece of the reply as it streams in.
+
+		Returns:
+			dict | list: The improved entry, with the same keys.
+
+		Raises:
+			LLMError: If the model could not be reached or did not reply with a valid entry.
+		"""
+		reply = self.get_advice(json.dumps(entry), prompt=prompt.replace("{section}", section), use_cache=use_cache,
+								on_token=on_token)
+		return parse_entry(reply, entry)
+
+	def _load_improvements(self):
+		if self.improvements is not None:
+			return
 		try:
-			payload = json.dumps({
-			"model": "gpt-3.5-turbo",
-			"messages": [
-				{
-					"role": "system",
-					"content": prompt
-				},
-				{
-					"role": "user",
-					"content": content
-				}
-			]
-			})
-			headers = {
-			'Authorization': 'Bearer ' + auth_key,
-			'User-Agent': 'Apifox/1.0.0 (https://apifox.com)',
-			'Content-Type': 'application/json'
-			}
-		
-			response = json.loads(requests.request("POST", url, headers=headers, data=payload).text)
-			
-			#print(response)
-			reply_text = response["choices"][0]["message"]["content"]
-			
-			return reply_text
-		
-		except Exception as e:
-			return e
+			with open(self.improvements_path, 'r', encoding="utf-8") as file:
+				self.improvements = json.load(file)
+		except (OSError, ValueError): # no improvements yet (or an unreadable file)
+			self.improvements = {}
+
+	def _save_improvements(self):
+		# Keep only the most recent improvements (dicts keep the insertion order)
+		while len(self.improvements) > MAX_STORED_IMPROVEMENTS:
+			del self.improvements[next(iter(self.improvements))]
+		os.makedirs(os.path.dirname(self.improvements_path), exist_ok=True)
+		temp_path = self.improvements_path + ".tmp"
+		with open(temp_path, 'w', encoding="utf-8") as file:
+			json.dump(self.improvements, file)
+		os.replace(temp_path, self.improvements_path)
 	
 
 if __name__ == '__main__':
@@ -0,0 +1,316 @@
+"""
+Resume Index
+
+The inverted index of the saved resumes, to find candidates by the words of their skills, job
+titles, companies, credentials, schools and bullets, and rank them by BM25. It is kept in tables
+of the resume database (see resume_database.py) and updated in the same transaction as every save
+or delete.
+
+For every term (a word in lower case, without accents; c++ and c# are words), the index keeps
+the postings of the resumes having it: the resume id, the weight of the term in the resume and
+the fields it is in. The weight is the count of the term in each field times the weight of the
+field (a skill counts more than a word of a bullet), divided by the length normalization of BM25
+(with the average length when the resume was indexed), so a query only applies the saturation
+and the IDF. The postings are NumPy arrays, so a word found in all of 100,000 resumes is ranked
+in a few milliseconds, instead of scoring the resumes one at a time.
+
+The postings of a term are stored in segments. Every save adds a small segment to the terms of
+the resume, and when a term has MERGE_FACTOR segments of the same level they are merged into one
+of the next level (as in a log-structured merge tree): a save writes a few kilobytes, and a query
+reads a few segments per term. The ids of the deleted resumes are kept and filtered out of the
+postings (and dropped when segments are merged) until the index is rebuilt.
+"""
+
+import re
+import unicodedata
+from collections import defaultdict
+from dataclasses import dataclass
+
+import numpy as np
+
+# The fields of the index and their weights in the ranking
+FIELDS = {"skills": 4.0, "titles": 3.0, "companies": 1.5, "credentials": 3.0, "schools": 1.5, "bullets": 1.0}
+K1 = 1.2 # the term frequency saturation of BM25
+B = 0.75 # the length normalization of BM25
+MERGE_FACTOR = 8 # number of segments of a level merged into one of the next level
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS index_segments (term TEXT NOT NULL, level INTEGER NOT NULL, first_id INTEGER NOT NULL,
+    postings BLOB NOT NULL);
+CREATE UNIQUE INDEX IF NOT EXISTS index_segments_term ON index_segments (term, level, first_id);
+CREATE TABLE IF NOT EXISTS index_documents (resume_id INTEGER PRIMARY KEY, length REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS index_deleted (resume_id INTEGER PRIMARY KEY);
+CREATE TABLE IF NOT EXISTS index_stats (id INTEGER PRIMARY KEY CHECK (id = 0), documents INTEGER NOT NULL, length REAL NOT NULL);
+"""
+TABLES = ("index_segments", "index_documents", "index_deleted", "index_stats")
+
+_POSTING = np.dtype([("id", "<i8"), ("weight", "<f4"), ("fields", "u1")])
+_FIELD_BITS = {field: 1 << number for number, field in enumerate(FIELDS)}
+_TOKEN = re.compile(r"(?:[^\W_]|[+#])+")
+_QUERY_TERM = re.compile(r'(?:(\w+):)?("[^"]*"?|\S+)') # [field:]word, [field:]word* or [field:]"words of a phrase"
+
+
+def tokenize(text) -> list:
+    """
+    Get the terms of a text: its words in lower case, without accents.
+
+    Args:
+        text (str): The text.
+
+    Returns:
+        list[str]: The terms, with repetitions.
+    """
+    text = text.lower()
+    if not text.isascii():
+        text = "".join(char for char in unicodedata.normalize("NFKD", text) if not unicodedata.combining(char))
+    return _TOKEN.findall(text)
+
+
+def document_fields(experience, education, certifications, skills, **other_sections) -> dict:
+    """
+    Get the text of every field of the index for the records of a resume.
+
+    Args:
+        experience (list[Experience]): The work experience.
+        education (list[Education]): The education.
+        certifications (list[Certification]): The certifications.
+        skills (list[Skill]): The skills.
+        **other_sections: The other sections (e.g. the personal information), which are not indexed.
+
+    Returns:
+        dict: The text of every field of FIELDS.
+    """
+    return {"skills": "\n".join(skill.name for skill in skills),
+            "titles": "\n".join(exp.title for exp in experience),
+            "companies": "\n".join(exp.company for exp in experience),
+            "credentials": "\n".join([edu.credential for edu in education] + [cert.credential for cert in certifications]),
+            "schools": "\n".join([edu.school for edu in education] + [cert.school for cert in certifications]),
+            "bullets": "\n".join(bullet for exp in experience for bullet in exp.bullets)}
+
+
+@dataclass
+class QueryTerm:
+    """A word or a phrase of a query, all of whose words must be in the same field of a resume."""
+    words: list
+    field: str = None # the field the words must be in, None for any field
+    prefix: bool = False # the last word matches the words starting with it
+
+
+def parse_query(query) -> list:
+    """
+    Parse a query: words and "phrases", each optionally limited to a field (e.g. skills:python)
+    and ending with * to match the words starting with it.
+
+    Args:
+        query (str): The query.
+
+    Returns:
+        list[QueryTerm]: The terms of the query.
+
+    Raises:
+        ValueError: If a word is limited to an unknown field.
+    """
+    terms = []
+    for field, text in _QUERY_TERM.findall(query):
+        if field and field.lower() not in FIELDS:
+            raise ValueError(f"Unknown field: {field} (expected one of {', '.join(FIELDS)})")
+        words = tokenize(text)
+        if words:
+            terms.append(QueryTerm(words, field.lower() or None, text.endswith("*") and not text.startswith('"')))
+    return terms
+
+
+def add(connection, documents):
+    """
+    Add resumes to the index.
+
+    Args:
+        connection (sqlite3.Connection): The connection to the resume database, in a transaction.
+        documents (list[tuple[int, dict]]): The id of every resume and the text of its fields (see
+            document_fields). The ids must be larger than the ids already in the index.
+    """
+    if not documents:
+        return
+    parsed = []
+    for resume_id, fields in sorted(documents, key=lambda document: document[0]):
+        counts, length = {}, 0.0 # term -> [weighted count, field bits]
+        for field, text in fields.items():
+            weight, bit = FIELDS[field], _FIELD_BITS[field]
+            terms = tokenize(text)
+            length += weight * len(terms)
+            for term in terms:
+                entry = counts.get(term)
+                if entry is None:
+                    counts[term] = [weight, bit]
+                else:
+                    entry[0] += weight
+                    entry[1] |= bit
+        parsed.append((resume_id, length, counts))
+
+    count, total_length = _stats(connection)
+    count += len(parsed)
+    total_length += sum(length for resume_id, length, counts in parsed)
+    average_length = total_length / count or 1.0
+    connection.execute("INSERT OR REPLACE INTO index_stats (id, documents, length) VALUES (0, ?, ?)", (count, total_length))
+    connection.executemany("INSERT INTO index_documents (resume_id, length) VALUES (?, ?)",
+                           [(resume_id, length) for resume_id, length, counts in parsed])
+
+    postings = defaultdict(list)
+    for resume_id, length, counts in parsed:
+        normalization = 1 - B + B * length / average_length
+        for term, (weight, bits) in counts.items():
+            postings[term].append((resume_id, weight / normalization, bits))
+    connection.executemany("INSERT INTO index_segments (term, level, first_id, postings) VALUES (?, 0, ?, ?)",
+                           [(term, entries[0][0], np.array(entries, dtype=_POSTING).tobytes()) for term, entries in postings.items()])
+    for term in postings:
+        _merge(connection, term)
+
+
+def remove(connection, ids):
+    """
+    Remove resumes from the index.
+
+    Args:
+        connection (sqlite3.Connection): The connection to the resume database, in a transaction.
+        ids (list[int]): The ids of the resumes.
+    """
+    removed, removed_length = 0, 0.0
+    for resume_id in ids:
+        row = connection.execute("SELECT length FROM index_documents WHERE resume_id = ?", (resume_id,)).fetchone()
+        if row is None:
+            continue
+        removed += 1
+        removed_length += row[0]
+        connection.execute("DELETE FROM index_documents WHERE resume_id = ?", (resume_id,))
+        connection.execute("INSERT OR IGNORE INTO index_deleted (resume_id) VALUES (?)", (resume_id,))
+    if removed:
+        count, total_length = _stats(connection)
+        connection.execute("UPDATE index_stats SET documents = ?, length = ? WHERE id = 0",
+                           (count - removed, max(total_length - removed_length, 0.0)))
+
+
+def clear(connection):
+    """
+    Remove all the resumes from the index.
+
+    Args:
+        connection (sqlite3.Connection): The connection to the resume database, in a transaction.
+    """
+    for table in TABLES:
+        connection.execute(f"DELETE FROM {table}")
+
+
+def next_id(connection, largest_id) -> int:
+    """
+    Get the id of the next resume: larger than the ids of the saved resumes and of the deleted
+    resumes still in the postings, so the postings stay in the order of the ids.
+
+    Args:
+        connection (sqlite3.Connection): The connection to the resume database.
+        largest_id (int): The largest id of the saved resumes (None if there are none).
+
+    Returns:
+        int: The id.
+    """
+    deleted = connection.execute("SELECT MAX(resume_id) FROM index_deleted").fetchone()[0]
+    return max(largest_id or 0, deleted or 0) + 1
+
+
+def match(connection, terms, ranked=True):
+    """
+    Find the resumes having all the terms of a query.
+
+    Args:
+        connection (sqlite3.Connection): The connection to the resume database.
+        terms (list[QueryTerm]): The terms (see parse_query).
+        ranked (bool): Flag to compute the BM25 scores. Otherwise the scores are zeros.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: The ids of the resumes (in increasing order) and their scores.
+    """
+    documents = _stats(connection)[0]
+    deleted = np.fromiter((row[0] for row in connection.execute("SELECT resume_id FROM index_deleted")), dtype=np.int64)
+    ids, scores = None, None
+    for term in terms:
+        # The words of a phrase must be in the same field (their order is not checked)
+        term_ids, term_scores, term_fields = None, None, None
+        for number, word in enumerate(term.words):
+            postings = _postings(connection, word, term.prefix and number == len(term.words) - 1, deleted)
+            if term.field is not None:
+                postings = postings[(postings["fields"] & _FIELD_BITS[term.field]) != 0]
+            word_scores = np.zeros(len(postings))
+            if ranked:
+                idf = np.log(1 + (documents - len(postings) + 0.5) / (len(postings) + 0.5))
+                weights = postings["weight"].astype(np.float64)
+                word_scores = idf * weights * (K1 + 1) / (weights + K1)
+            if term_ids is None:
+                term_ids, term_scores, term_fields = postings["id"], word_scores, postings["fields"]
+                continue
+            left, right = _intersect(term_ids, postings["id"])
+            common = (term_fields[left] & postings["fields"][right]) != 0
+            left, right = left[common], right[common]
+            term_ids, term_scores = term_ids[left], term_scores[left] + word_scores[right]
+            term_fields = term_fields[left] & postings["fields"][right]
+        if ids is None:
+            ids, scores = term_ids, term_scores
+        else:
+            left, right = _intersect(ids, term_ids)
+            ids, scores = ids[left], scores[left] + term_scores[right]
+    if ids is None:
+        return np.zeros(0, dtype=np.int64), np.zeros(0)
+    return ids, scores
+
+
+def _stats(connection) -> tuple:
+    row = connection.execute("SELECT documents, length FROM index_stats WHERE id = 0").fetchone()
+    return row if row is not None else (0, 0.0)
+
+
+def _postings(connection, term, prefix, deleted) -> np.ndarray:
+    """The postings of a term (or of the terms starting with it), in the order of the ids."""
+    if prefix:
+        rows = connection.execute("SELECT postings FROM index_segments WHERE term >= ? AND term < ? ORDER BY term, first_id",
+                                  (term, term + "\U0010ffff")).fetchall()
+    else:
+        rows = connection.execute("SELECT postings FROM index_segments WHERE term = ? ORDER BY first_id", (term,)).fetchall()
+    postings = np.concatenate([np.frombuffer(row[0], dtype=_POSTING) for row in rows]) if rows else np.zeros(0, dtype=_POSTING)
+    if prefix and len(rows) > 1:
+        # A resume having several of the terms gets one posting with their weights added up
+        postings = postings[np.argsort(postings["id"], kind="stable")]
+        starts = np.flatnonzero(np.r_[True, postings["id"][1:] != postings["id"][:-1]])
+        merged = np.zeros(len(starts), dtype=_POSTING)
+        merged["id"] = postings["id"][starts]
+        merged["weight"] = np.add.reduceat(postings["weight"], starts)
+        merged["fields"] = np.bitwise_or.reduceat(postings["fields"], starts)
+        postings = merged
+    if len(deleted):
+        postings = postings[~np.isin(postings["id"], deleted)]
+    return postings
+
+
+def _intersect(left_ids, right_ids) -> tuple:
+    """The positions of the ids found in both sorted arrays, in each of them."""
+    if len(left_ids) == 0 or len(right_ids) == 0:
+        return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp)
+    positions = np.minimum(np.searchsorted(right_ids, left_ids), len(right_ids) - 1)
+    found = right_ids[positions] == left_ids
+    return np.flatnonzero(found), positions[found]
+
+
+def _merge(connection, term):
+    """Merge the segments of a term, level by level, while a level has MERGE_FACTOR segments."""
+    level = 0
+    while connection.execute("SELECT COUNT(*) FROM index_segments WHERE term = ? AND level = ?", (term, level)).fetchone()[0] >= MERGE_FACTOR:
+        rows = connection.execute("SELECT first_id, postings FROM index_segments WHERE term = ? AND level = ? ORDER BY first_id",
+                                  (term, level)).fetchall()
+        postings = np.concatenate([np.frombuffer(row[1], dtype=_POSTING) for row in rows])
+        deleted = np.fromiter((row[0] for row in connection.execute(
+            "SELECT resume_id FROM index_deleted WHERE resume_id BETWEEN ? AND ?", (int(postings["id"][0]), int(postings["id"][-1])))),
+            dtype=np.int64)
+        if len(deleted):
+            postings = postings[~np.isin(postings["id"], deleted)]
+        connection.execute("DELETE FROM index_segments WHERE term = ? AND level = ?", (term, level))
+        if len(postings):
+            connection.execute("INSERT INTO index_segments (term, level, first_id, postings) VALUES (?, ?, ?, ?)",
+                               (term, level + 1, rows[0][0], postings.tobytes()))
+        level += 1
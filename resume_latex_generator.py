@@ -1,66 +1,120 @@
-import requests
-import json
-import os
-from dotenv import load_dotenv
-from tkinter import filedialog
+"""
+Resume LaTeX Generator
 
-load_dotenv()
+Generates the LaTeX source of a resume from a LaTeX example file. get_latex sends the example and
+the data of the candidate to the model on every call. render_resume asks the model only once per
+example file, to turn it into a fill-in skeleton (see template_skeleton.py), and then renders
+every resume locally from the skeleton: generating the resumes of many candidates from the same
+template costs a single model call.
+"""
+
+import re
+
+from llm_client import get_client
+from template_skeleton import TemplateSkeleton, TemplateSkeletonError, get_skeleton_store
+
+SKELETON_PROMPT = (
+    r"You are a LaTeX expert. You will be given a LaTeX resume example file. Rewrite it into a fill-in skeleton: keep the "
+    r"preamble, the layout and the commands of the example, but replace each value of the example person by a placeholder, "
+    r"and each list of entries by a block written once and repeated for every entry. The placeholders are: "
+    r"<<name>>, <<city>>, <<province>>, <<phone>>, <<email>>, <<linkedin>> (the personal information, anywhere); "
+    r"in the block <<#experience>> ... <</experience>> (one job): <<title>>, <<company>>, <<period>>, <<city>>, <<country>>, "
+    r"and the block <<#bullets>> ... <<bullet>> ... <</bullets>> (one explanation of the job); "
+    r"in the block <<#education>> ... <</education>> (one school): <<school>>, <<credential>>, <<graduation>>, <<city>>, <<country>>; "
+    r"in the block <<#certifications>> ... <</certifications>> (one certification): <<credential>>, <<school>>, <<completion>>; "
+    r"in the block <<#skills>> ... <</skills>> (one skill): <<name>>. "
+    r"Inside a block, <<#between>> ... <</between>> is written between two entries only (e.g. the comma of a list of skills). "
+    r"Remove the parts of the example that none of the placeholders can fill. Use no other placeholder or block. "
+    r"Reply with the skeleton only, in .tex format. DO NOT forget the \begin{document} and the \end{document}"
+)
+
+_CODE_FENCE = re.compile(r"^```[a-z]*\n(.*?)\n?```$", re.DOTALL)
 
-url = os.getenv('url')
-auth_key = os.getenv("auth_key")
 
 class ResumeLatexGenerator:
     def __init__(self):
         pass
 
-    def get_latex(self, data: str, template: str, prompt=None) -> str:
+    def get_latex(self, data: str, template: str, prompt=None, use_cache=True) -> str:
         """Generates a LaTeX template for the user's resume.
 
         Args:
             data (str): The user's information.
             template (str): The LaTeX example file.
             prompt (str, optional): The prompt for the model. Defaults to None.
+            use_cache (bool): Flag to reuse the reply of an identical earlier request.
 
         Returns:
             str: The generated LaTeX file for the user's resume.
+
+        Raises:
+            LLMError: If the model could not be reached or did not answer properly.
         """
         if prompt is None:
             prompt = r"You are a resume writing tutor. Your job is to generate a LaTeX template for the user's resume. You will be given some information about the user and a LaTeX example file, and you should apply the user's information to replace the information in the example file. If the needed information is missing, you can remove that part. The response should be in .tex format. Always make sure that the returned LaTeX file is VALID. Always follow the original template format. DO NOT forget the \begin{document}"
-        if url is None or auth_key is None:
-            return Exception("Please set the url and auth_key in the .env file")
-        
-        try:
-            payload = json.dumps({
-            "model": "gpt-3.5-turbo",
-            "messages": [
-                {
-                    "role": "system",
-                    "content": prompt
-                },
-                {
-                    "role": "user",
-                    "content": "User information: " + data + "\n\nLaTeX example file: " + template
-                }
-            ]
-            })
-            headers = {
-            'Authorization': 'Bearer ' + auth_key,
-            'User-Agent': 'Apifox/1.0.0 (https://apifox.com)',
-            'Content-Type': 'application/json'
-            }
-        
-            response = json.loads(requests.request("POST", url, headers=headers, data=payload).text)
-            
-            #print(response)
-            reply_text = response["choices"][0]["message"]["content"]
-            
-            return reply_text
-        
-        except Exception as e:
-            return e
+        return get_client().complete(prompt, "User information: " + data + "\n\nLaTeX example file: " + template,
+                                     use_cache=use_cache)
+
+    def get_skeleton(self, template: str, use_cache=True) -> TemplateSkeleton:
+        """Gets the fill-in skeleton of a LaTeX example file, asking the model only the first
+        time the example is used (the skeleton is then stored under the hash of the example).
+
+        Args:
+            template (str): The LaTeX example file.
+            use_cache (bool): Flag to reuse the stored skeleton. Otherwise the model is asked again.
+
+        Returns:
+            TemplateSkeleton: The skeleton of the example.
+
+        Raises:
+            LLMError: If the model could not be reached or did not answer properly.
+            TemplateSkeletonError: If the model did not give a valid skeleton, even when told what was wrong with it.
+        """
+        store = get_skeleton_store()
+        skeleton = store.get(template) if use_cache else None
+        if skeleton is not None:
+            return skeleton
+
+        print("Learning the skeleton of the template...")
+        message = template
+        for attempt in range(2):
+            reply = get_client().complete(SKELETON_PROMPT, message, use_cache=use_cache and attempt == 0).strip()
+            fenced = _CODE_FENCE.match(reply)
+            try:
+                skeleton = TemplateSkeleton(fenced.group(1) if fenced else reply)
+                break
+            except TemplateSkeletonError as e:
+                error = e
+                message = f"{template}\n\nYour previous skeleton was rejected ({e}), send it again without this mistake:\n\n{reply}"
+        else:
+            raise TemplateSkeletonError(f"the model did not give a valid skeleton of the template: {error}")
+        store.put(template, skeleton)
+        print(f"Template skeleton stored in {store.path(template)}")
+        return skeleton
+
+    def render_resume(self, builder, template: str, use_cache=True) -> str:
+        """Generates the LaTeX file of a resume from a LaTeX example file, filling the skeleton
+        of the example (see get_skeleton) locally with the data of the resume builder.
+
+        Args:
+            builder (ResumeBuilder): The resume builder holding the data.
+            template (str): The LaTeX example file.
+            use_cache (bool): Flag to reuse the stored skeleton of the example.
+
+        Returns:
+            str: The generated LaTeX file for the user's resume.
+
+        Raises:
+            LLMError: If the skeleton had to be learned and the model could not be reached.
+            TemplateSkeletonError: If the model did not give a valid skeleton.
+        """
+        return self.get_skeleton(template, use_cache).render(
+            builder.personal_info, builder.experience, builder.education, builder.certifications, builder.skills)
     
 
 if __name__ == '__main__':
+    from tkinter import filedialog
+
     resume_latex_generator = ResumeLatexGenerator()
 
     data = "" # please provide the user's information
@@ -0,0 +1,187 @@
+"""
+Resume Data Model
+
+The records holding the data of a resume: the personal information, the work experience, the
+education, the certifications and the skills. Each record is a slotted class with one attribute
+per csv column (and a variable-length tuple of bullets for the work experience), so it takes a
+fraction of the memory of the dict read from the csv file, and the renderers read attributes
+instead of probing long header strings.
+
+The records are validated once, when they are created from a csv row or from a JSON/pickle dict:
+a missing column raises a ResumeDataError naming the file and the line, instead of failing later
+while rendering. to_row() turns a record back into a dict keyed by the original csv headers,
+which is the format of the JSON files and of the resume improver.
+"""
+
+MIN_EXPLANATION_COLUMNS = 5 # the csv template has the columns explanation1 to explanation5
+
+
+class ResumeDataError(ValueError):
+    """Resume data that is missing a column or does not have the expected shape."""
+
+
+class Record:
+    """
+    A row of a resume section, with one attribute per column. Every record class takes the values
+    of its columns as the arguments of its constructor, in the order of COLUMNS (the constructors
+    are written out, as they run for every row loaded).
+    """
+    __slots__ = ()
+    COLUMNS = () # (csv header, attribute) of every column, in the order used by the template
+
+    @classmethod
+    def attributes(cls) -> tuple:
+        """The attribute names of the columns, in the order used by the template."""
+        return tuple(attribute for header, attribute in cls.COLUMNS)
+
+    @classmethod
+    def from_row(cls, row, source="row", strict=True):
+        """
+        Create a record from a csv row or a dict keyed by the csv headers.
+
+        Args:
+            row (dict): The row. A record of the same type is returned as it is.
+            source (str): Where the row comes from (e.g. data/experience.csv line 3), for the error messages.
+            strict (bool): Flag to reject rows with missing columns. Otherwise they are left empty.
+
+        Returns:
+            Record: The record.
+
+        Raises:
+            ResumeDataError: If the row is not a dict or a column is missing (empty values are allowed,
+                e.g. a resume without a LinkedIn link).
+        """
+        if isinstance(row, cls):
+            return row
+        if not isinstance(row, dict):
+            raise ResumeDataError(f"{source}: expected a row of columns, got {type(row).__name__}")
+        values = []
+        for header, attribute in cls.COLUMNS:
+            value = row.get(header)
+            if value is None:
+                if strict:
+                    raise ResumeDataError(f"{source}: the '{header}' column is missing") # an empty cell is an empty value
+                value = ""
+            values.append(value if isinstance(value, str) else str(value))
+        return cls(*values)
+
+    def to_row(self) -> dict:
+        """
+        Get the record as a dict keyed by the csv headers.
+
+        Returns:
+            dict: The row.
+        """
+        return {header: getattr(self, attribute) for header, attribute in self.COLUMNS}
+
+    def __eq__(self, other):
+        return type(self) is type(other) and all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    # The records are compared by value but can be changed (e.g. the improved bullets), so they are
+    # deliberately not hashable: a hash computed from the values would go stale in a set or a dict
+    __hash__ = None
+
+    def __repr__(self):
+        values = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({values})"
+
+
+class PersonalInfo(Record):
+    __slots__ = ("name", "city", "province", "phone", "email", "linkedin")
+    COLUMNS = (("name", "name"), ("city", "city"), ("province", "province"), ("phone number", "phone"),
+               ("email", "email"), ("linkedin link (https://linkedin.com/in/_______)", "linkedin"))
+
+    def __init__(self, name="", city="", province="", phone="", email="", linkedin=""):
+        self.name = name
+        self.city = city
+        self.province = province
+        self.phone = phone
+        self.email = email
+        self.linkedin = linkedin
+
+
+class Experience(Record):
+    __slots__ = ("title", "company", "period", "city", "country", "bullets")
+    COLUMNS = (("job title", "title"), ("company name", "company"), ("beginning and end of employment", "period"),
+               ("city", "city"), ("country of employment", "country"))
+
+    def __init__(self, title="", company="", period="", city="", country="", bullets=()):
+        self.title = title
+        self.company = company
+        self.period = period
+        self.city = city
+        self.country = country
+        self.bullets = tuple(bullets)
+
+    @classmethod
+    def from_row(cls, row, source="row", strict=True):
+        """
+        Create a work experience record from a csv row. The bullets are read from the columns
+        explanation1, explanation2, ... up to the first empty one, so any number is supported.
+        """
+        record = super().from_row(row, source, strict)
+        if record is row:
+            return record
+        bullets = []
+        while row.get(f"explanation{len(bullets) + 1}"):
+            bullets.append(str(row[f"explanation{len(bullets) + 1}"]))
+        record.bullets = tuple(bullets)
+        return record
+
+    def to_row(self) -> dict:
+        row = super().to_row()
+        for number in range(1, max(len(self.bullets), MIN_EXPLANATION_COLUMNS) + 1):
+            row[f"explanation{number}"] = self.bullets[number - 1] if number <= len(self.bullets) else ""
+        return row
+
+
+class Education(Record):
+    __slots__ = ("school", "credential", "graduation", "city", "country")
+    COLUMNS = (("school name", "school"), ("credential name", "credential"), ("date of graduation", "graduation"),
+               ("city", "city"), ("country of school", "country"))
+
+    def __init__(self, school="", credential="", graduation="", city="", country=""):
+        self.school = school
+        self.credential = credential
+        self.graduation = graduation
+        self.city = city
+        self.country = country
+
+
+class Certification(Record):
+    __slots__ = ("credential", "school", "completion")
+    COLUMNS = (("credential name", "credential"), ("school name", "school"), ("date of completion", "completion"))
+
+    def __init__(self, credential="", school="", completion=""):
+        self.credential = credential
+        self.school = school
+        self.completion = completion
+
+
+class Skill(Record):
+    __slots__ = ("name",)
+    COLUMNS = (("name", "name"),)
+
+    def __init__(self, name=""):
+        self.name = name
+
+
+def load_section(record_class, rows, source, strict=True) -> list:
+    """
+    Create the records of a resume section from a list of rows.
+
+    Args:
+        record_class (type): The record class of the section, e.g. Experience.
+        rows (list[dict]): The rows (or records) of the section.
+        source (str): Where the rows come from, for the error messages.
+        strict (bool): Flag to reject rows with missing columns.
+
+    Returns:
+        list[Record]: The records.
+
+    Raises:
+        ResumeDataError: If the section is not a list or one of its rows is invalid.
+    """
+    if not isinstance(rows, list):
+        raise ResumeDataError(f"{source}: expected a list of entries, got {type(rows).__name__}")
+    return [record_class.from_row(row, f"{source} entry {index}", strict) for index, row in enumerate(rows, 1)]
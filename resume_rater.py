@@ -3,54 +3,129 @@ Note: this rater utlizes gpt-3.5, so it cannot take files as input. Therefore, o
 """
 
 
-import requests
-import json
+import asyncio
 import datetime
-import os
-from dotenv import load_dotenv
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 
-load_dotenv()
+from llm_client import AsyncRateLimiter, LLMError, estimate_tokens, get_client
+
+
+@dataclass
+class RatingResult:
+	"""The rating of one (theme, content) pair of a batch."""
+	index: int # position of the pair in the batch
+	theme: str
+	reply: str = None
+	error: LLMError = None
+	elapsed: float = 0.0
 
-url = os.getenv('url')
-auth_key = os.getenv("auth_key")
 
 class ResumeRater:
 	def __init__(self):
 		pass
 
-	def get_advice(self, theme: str, content: str) -> str:
-		if url is None or auth_key is None:
-			return Exception("Please set the url and auth_key in the .env file")
+	def get_advice(self, theme: str, content: str, use_cache=True, on_token=None) -> str:
+		"""
+		Rate a resume and give feedback on how to improve it.
+
+		Args:
+			theme (str): What the resume is for, e.g. a job description.
+			content (str): The content of the resume.
+			use_cache (bool): Flag to reuse the reply of an identical earlier request.
+			on_token (callable, optional): Function called with every piece of the reply as it streams in.
+
+		Returns:
+			str: The rating and the feedback.
+
+		Raises:
+			LLMError: If the model could not be reached or did not answer properly.
+		"""
+		prompt = "You are a resume writing tutor. Your job is to pretend that you are a professional human resource manager who hires new employees. You need to read the resume and then provide a rating (at the scale of 0-100) and some feedback on how to improve the resume. You can also provide feedback on having the user remove unrelated experience and/or includes most recent activities. The user is writing a resume for " + str(theme) + "Current date: " + str(datetime.date.today())
+		return get_client().complete(prompt, content, use_cache=use_cache, on_token=on_token)
+	
+
+	async def rate_batch(self, pairs, concurrency=8, rpm=None, tpm=None):
+		"""
+		Rate many resumes concurrently. The ratings are yielded as soon as each one completes, so
+		they usually come back in a different order than the pairs (see RatingResult.index).
+
+		Args:
+			pairs (list[tuple[str, str]]): The (theme, content) pairs to rate.
+			concurrency (int): Maximum number of requests in flight at the same time.
+			rpm (int, optional): Requests-per-minute limit of the provider. Defaults to no limit.
+			tpm (int, optional): Tokens-per-minute limit of the provider. Defaults to no limit.
+
+		Yields:
+			RatingResult: The rating (or the error) of each pair.
+		"""
+		loop = asyncio.get_running_loop()
+		limiter = AsyncRateLimiter(rpm, tpm)
+		semaphore = asyncio.Semaphore(concurrency)
 
+		async def rate(executor, index, theme, content):
+			async with semaphore:
+				await limiter.acquire(estimate_tokens(str(theme) + content))
+				start = loop.time()
+				try:
+					reply = await loop.run_in_executor(executor, self.get_advice, theme, content)
+					return RatingResult(index, theme, reply, elapsed=loop.time() - start)
+				except LLMError as e:
+					return RatingResult(index, theme, error=e, elapsed=loop.time() - start)
+
+		# The HTTP calls are blocking, so they run on a thread pool sized to the concurrency cap
+		executor = ThreadPoolExecutor(max_workers=concurrency)
+		tasks = [asyncio.ensure_future(rate(executor, index, theme, content))
+				 for index, (theme, content) in enumerate(pairs)]
 		try:
-			payload = json.dumps({
-			"model": "gpt-3.5-turbo",
-			"messages": [
-				{
-					"role": "system",
-					"content": "You are a resume writing tutor. Your job is to pretend that you are a professional human resource manager who hires new employees. You need to read the resume and then provide a rating (at the scale of 0-100) and some feedback on how to improve the resume. You can also provide feedback on having the user remove unrelated experience and/or includes most recent activities. The user is writing a resume for " + str(theme) + "Current date: " + str(datetime.date.today())
-				},
-				{
-					"role": "user",
-					"content": content
-				}
-			]
-			})
-			headers = {
-			'Authorization': 'Bearer ' + auth_key,
-			'User-Agent': 'Apifox/1.0.0 (https://apifox.com)',
-			'Content-Type': 'application/json'
-			}
-		
-			response = json.loads(requests.request("POST", url, headers=headers, data=payload).text)
-			
-			#print(response)
-			reply_text = response["choices"][0]["message"]["content"]
-			
-			return reply_text
-		
-		except Exception as e:
-			return e
+			for task in asyncio.as_completed(tasks):
+				yield await task
+		finally:
+			for task in tasks: # the caller stopped early
+				task.cancel()
+			# Not waiting for the calls in flight: that would block the event loop until they finish
+			executor.shutdown(wait=False, cancel_futures=True)
+
+	def rate_many(self, pairs, concurrency=8, rpm=None, tpm=None) -> list:
+		"""
+		Rate many resumes concurrently and wait for all of them (see rate_batch).
+
+		Args:
+			pairs (list[tuple[str, str]]): The (theme, content) pairs to rate.
+			concurrency (int): Maximum number of requests in flight at the same time.
+			rpm (int, optional): Requests-per-minute limit of the provider. Defaults to no limit.
+			tpm (int, optional): Tokens-per-minute limit of the provider. Defaults to no limit.
+
+		Returns:
+			list[RatingResult]: The rating of every pair, in the same order as the pairs.
+		"""
+		async def collect():
+			return [result async for result in self.rate_batch(pairs, concurrency, rpm, tpm)]
+		return sorted(asyncio.run(collect()), key=lambda result: result.index)
+
+	def rate_shortlist(self, theme, contents, count=5, concurrency=8, rpm=None, tpm=None) -> list:
+		"""
+		Pre-screen many resumes for a job offline (see resume_scorer.py), then rate only the best
+		ones with the model.
+
+		Args:
+			theme (str): What the resumes are for, e.g. a job description.
+			contents (list[str]): The contents of the resumes.
+			count (int): The number of resumes rated by the model.
+			concurrency (int): Maximum number of requests in flight at the same time.
+			rpm (int, optional): Requests-per-minute limit of the provider. Defaults to no limit.
+			tpm (int, optional): Tokens-per-minute limit of the provider. Defaults to no limit.
+
+		Returns:
+			list[tuple[int, ScoreResult, RatingResult]]: The position of the resume in contents, its
+				pre-screen score and its rating, for the shortlisted resumes from the best score.
+		"""
+		from resume_scorer import ResumeScorer
+
+		matrix = ResumeScorer().score_matrix(contents, [theme])
+		shortlist = matrix.shortlist(0, count)
+		ratings = self.rate_many([(theme, contents[index]) for index in shortlist], concurrency, rpm, tpm)
+		return [(index, matrix.result(index, 0), rating) for index, rating in zip(shortlist, ratings)]
 	
 
 if __name__ == '__main__':
@@ -0,0 +1,355 @@
+"""
+Resume Scorer
+
+A local pre-screen of resumes against job descriptions, without the network: it gives a score
+from 0 to 100 and the most important keywords of the job that the resume is missing, in about a
+millisecond. It is meant for triage (e.g. ranking many candidates for a job), so the resume rater
+is only asked about the shortlist.
+
+The resumes (in the text format of ResumeBuilder.get_resume_content()) and the job descriptions
+are turned into term vectors of words and pairs of adjacent words (e.g. "machine learning"),
+without stop words. The score combines three signals, computed with NumPy for a whole matrix of
+resumes and jobs at once:
+- coverage: the share of the job terms (weighted by TF-IDF) found in the resume;
+- similarity: the cosine similarity of the TF-IDF vectors of the resume and the job;
+- recency: how recent the resume entries holding the matched terms are (the jobs and degrees
+  of the last few years count fully, older ones less and less). It counts in proportion to the
+  coverage, so a resume matching few terms does not score high for their recency.
+
+Command line usage: python resume_scorer.py --job <job description file> [--job FILE ...]
+                        <data source> [<data source> ...] [--top N]
+    (the data sources are the ones of the batch mode, see resume_batch.py)
+"""
+
+import argparse
+import datetime
+import re
+import sys
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+
+import numpy as np
+
+# The weights of the signals in the score (they add up to 1)
+COVERAGE_WEIGHT = 0.55
+SIMILARITY_WEIGHT = 0.30
+RECENCY_WEIGHT = 0.15
+
+RECENCY_HALF_LIFE = 4 # years after which the terms of a job or a degree count half as recent
+UNDATED_RECENCY = 0.5 # recency of the terms only found in undated entries, e.g. the skills
+MISSING_KEYWORDS = 10 # number of missing keywords reported
+
+STOP_WORDS = frozenset("""
+a about above after again against all also am an and any are as at be because been before being below between both
+but by can could did do does doing down during each etc few for from further had has have having he her here hers
+him his how i if in into is it its itself just me more most my no nor not now of off on once only or other our ours
+out over own per same she should so some such than that the their theirs them then there these they this those
+through to too under until up us very was we were what when where which while who whom why will with would you your
+yours ability able across apply candidate candidates company including job looking must new plus preferred required
+requirements responsibilities role strong team the using well work working year years experience skills hiring
+join seeking position opportunity responsible knowledge familiarity proficiency proficient excellent good
+""".split())
+
+_TOKEN = re.compile(r"[a-z0-9][a-z0-9+#]*(?:\.[a-z0-9+#]+)*") # keeps c++, c#, node.js
+_LETTERS = frozenset("cr") # the one-letter words kept as terms (the languages), e.g. not the b of a/b
+_YEAR = re.compile(r"\b(?:19|20)\d{2}\b")
+_ONGOING = re.compile(r"\b(?:present|current|now|ongoing)\b", re.IGNORECASE)
+_SECTIONS = {"Personal Information:": None, "Experience:": "Employment Period", "Education:": "Graduation Date",
+             "Certifications:": "Completion Date", "Skills:": None} # the date field of every section
+_SKIPPED_SECTIONS = ("Personal Information:",) # the name and contact details are not matched
+
+
+def tokenize(text) -> list:
+    """
+    Get the terms of a text: its words and the pairs of adjacent words, without stop words.
+
+    Args:
+        text (str): The text.
+
+    Returns:
+        list[str]: The terms, with repetitions.
+    """
+    terms = []
+    for phrase in re.split(r"[,;:()\n]|\.\s", text.lower()):
+        previous = None
+        for word in _TOKEN.findall(phrase):
+            if word in STOP_WORDS or word.isdigit() or (len(word) == 1 and word not in _LETTERS):
+                previous = None
+                continue
+            terms.append(word)
+            if previous is not None:
+                terms.append(f"{previous} {word}")
+            previous = word
+    return terms
+
+
+def _entry_recency(dates, today) -> float:
+    """The recency weight of an entry from its date field, None if it has no date."""
+    years = [int(year) for year in _YEAR.findall(dates)]
+    if _ONGOING.search(dates):
+        years.append(today.year)
+    if not years:
+        return None
+    return 0.5 ** (max(0, today.year - max(years)) / RECENCY_HALF_LIFE)
+
+
+def resume_terms(content, today=None):
+    """
+    Get the terms of a resume and the recency of each term.
+
+    Args:
+        content (str): The resume, in the format of ResumeBuilder.get_resume_content() (other
+            text is read as a single undated entry).
+        today (datetime.date, optional): The date the recency is measured from. Defaults to today.
+
+    Returns:
+        tuple[Counter, dict]: The count of every term, and the recency of every term (from 0 to 1,
+            the largest among the entries holding it).
+    """
+    today = today or datetime.date.today()
+    counts, recency = Counter(), {}
+
+    def add_entry(lines, date_field):
+        values = []
+        weight = None
+        for line in lines:
+            label, separator, value = line.partition(": ")
+            if not separator:
+                label, value = "", line
+            if label == date_field:
+                weight = _entry_recency(value, today)
+            else:
+                values.append(value)
+        terms = tokenize("\n".join(values))
+        counts.update(terms)
+        weight = UNDATED_RECENCY if weight is None else weight
+        for term in terms:
+            if weight > recency.get(term, -1.0):
+                recency[term] = weight
+
+    section, entry = "", []
+    for line in content.split("\n"):
+        if line in _SECTIONS or line == "":
+            if entry and section not in _SKIPPED_SECTIONS:
+                add_entry(entry, _SECTIONS.get(section))
+            entry = []
+            if line:
+                section = line
+        else:
+            entry.append(line)
+    if entry and section not in _SKIPPED_SECTIONS:
+        add_entry(entry, _SECTIONS.get(section))
+    return counts, recency
+
+
+@dataclass
+class ScoreResult:
+    """The pre-screen score of a resume for a job."""
+    score: float # from 0 to 100
+    coverage: float # from 0 to 1
+    similarity: float # from 0 to 1
+    recency: float # from 0 to 1
+    missing: list = field(default_factory=list) # the most important job keywords missing from the resume
+
+
+@dataclass
+class ScoreMatrix:
+    """The pre-screen scores of many resumes (rows) for many jobs (columns)."""
+    scores: np.ndarray # from 0 to 100
+    coverage: np.ndarray
+    similarity: np.ndarray
+    recency: np.ndarray
+    terms: list # the job terms, i.e. the columns of the matrices below
+    job_weights: np.ndarray # jobs x terms: the weight of every term in every job
+    present: np.ndarray # resumes x terms: 1 if the resume has the term
+
+    def missing(self, resume, job, count=MISSING_KEYWORDS) -> list:
+        """
+        Get the most important keywords of a job that a resume is missing.
+
+        Args:
+            resume (int): The row of the resume.
+            job (int): The column of the job.
+            count (int): The number of keywords.
+
+        Returns:
+            list[str]: The keywords, the most important first. A word is left out when a missing
+                pair of words holding it is already listed.
+        """
+        weights = self.job_weights[job] * (1.0 - self.present[resume])
+        words_only = np.array([" " not in term for term in self.terms], dtype=bool)
+        keywords, words = [], set()
+        for index in np.lexsort((words_only, -weights)): # on a tie, the pairs of words come first
+            if weights[index] <= 0 or len(keywords) == count:
+                break
+            term = self.terms[index]
+            if " " not in term and term in words:
+                continue
+            keywords.append(term)
+            words.update(term.split(" "))
+        return keywords
+
+    def result(self, resume, job, count=MISSING_KEYWORDS) -> ScoreResult:
+        """
+        Get the score of one resume for one job.
+
+        Args:
+            resume (int): The row of the resume.
+            job (int): The column of the job.
+            count (int): The number of missing keywords.
+
+        Returns:
+            ScoreResult: The score, its signals and the missing keywords.
+        """
+        return ScoreResult(float(self.scores[resume, job]), float(self.coverage[resume, job]),
+                           float(self.similarity[resume, job]), float(self.recency[resume, job]),
+                           self.missing(resume, job, count))
+
+    def shortlist(self, job, count) -> list:
+        """
+        Get the best resumes for a job.
+
+        Args:
+            job (int): The column of the job.
+            count (int): The number of resumes.
+
+        Returns:
+            list[int]: The rows of the resumes, the best first.
+        """
+        return [int(index) for index in np.argsort(-self.scores[:, job], kind="stable")[:count]]
+
+
+def _flatten(documents, vocabulary):
+    """
+    Turn the term counts of many documents into flat arrays, adding the new terms to the vocabulary.
+
+    Args:
+        documents (list[tuple[Counter, dict]]): The term counts and the term recency (or None) of every document.
+        vocabulary (dict): The index of every term.
+
+    Returns:
+        tuple[np.ndarray, ...]: The document, the term index, the count and the recency of every term of every document.
+    """
+    rows, ids, counts, recency = [], [], [], []
+    for row, (term_counts, term_recency) in enumerate(documents):
+        rows.extend([row] * len(term_counts))
+        ids.extend([vocabulary.setdefault(term, len(vocabulary)) for term in term_counts])
+        counts.extend(term_counts.values())
+        if term_recency is not None:
+            recency.extend(map(term_recency.__getitem__, term_counts))
+    return (np.array(rows, dtype=np.intp), np.array(ids, dtype=np.intp), np.array(counts, dtype=np.float64),
+            np.array(recency, dtype=np.float64))
+
+
+class ResumeScorer:
+    """The local pre-screen of resumes for jobs (see the module docstring)."""
+
+    def __init__(self, today=None):
+        self.today = today # the date the recency is measured from, defaults to the day of the scoring
+
+    def score(self, content, theme, count=MISSING_KEYWORDS) -> ScoreResult:
+        """
+        Score a resume for a job.
+
+        Args:
+            content (str): The content of the resume (see ResumeBuilder.get_resume_content).
+            theme (str): What the resume is for, e.g. a job description.
+            count (int): The number of missing keywords.
+
+        Returns:
+            ScoreResult: The score, its signals and the missing keywords.
+        """
+        return self.score_matrix([content], [theme]).result(0, 0, count)
+
+    def score_matrix(self, contents, themes) -> ScoreMatrix:
+        """
+        Score many resumes for many jobs at once.
+
+        Args:
+            contents (list[str]): The contents of the resumes.
+            themes (list[str]): The job descriptions.
+
+        Returns:
+            ScoreMatrix: The scores, with a row per resume and a column per job.
+        """
+        today = self.today or datetime.date.today()
+        resumes = [resume_terms(content, today) for content in contents]
+        jobs = [Counter(tokenize(theme)) for theme in themes]
+
+        # Every term gets an index, the terms of the jobs first: they are the columns of the
+        # matrices, the other terms of a resume only count in its norm
+        vocabulary = {}
+        job_rows, job_ids, job_counts, _ = _flatten([(counts, None) for counts in jobs], vocabulary)
+        terms = list(vocabulary)
+        rows, ids, counts, recency = _flatten(resumes, vocabulary)
+
+        # The TF-IDF weights, with a sublinear term frequency (a document counts once per term)
+        document_frequency = np.bincount(ids, minlength=len(vocabulary)) + np.bincount(job_ids, minlength=len(vocabulary))
+        idf = np.log((1 + len(resumes) + len(jobs)) / (1 + document_frequency)) + 1
+        weights = (1 + np.log(counts)) * idf[ids]
+        resume_norms = np.sqrt(np.bincount(rows, weights=weights ** 2, minlength=len(resumes)))
+
+        job_weights = np.zeros((len(jobs), len(terms)))
+        job_weights[job_rows, job_ids] = (1 + np.log(job_counts)) * idf[job_ids]
+        job_norms = np.linalg.norm(job_weights, axis=1)
+
+        shared = ids < len(terms)
+        resume_weights = np.zeros((len(resumes), len(terms)))
+        resume_weights[rows[shared], ids[shared]] = weights[shared]
+        resume_recency = np.zeros((len(resumes), len(terms)))
+        resume_recency[rows[shared], ids[shared]] = recency[shared]
+        present = (resume_weights > 0).astype(np.float64)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            matched = present @ job_weights.T
+            coverage = np.nan_to_num(matched / job_weights.sum(axis=1))
+            similarity = np.nan_to_num((resume_weights @ job_weights.T) / np.outer(resume_norms, job_norms))
+            recency_score = np.nan_to_num((resume_recency @ job_weights.T) / matched)
+
+        # The recency only counts for the terms found, so it weighs in proportion to the coverage
+        scores = 100 * (COVERAGE_WEIGHT * coverage + SIMILARITY_WEIGHT * similarity + RECENCY_WEIGHT * recency_score * coverage)
+        return ScoreMatrix(np.clip(scores, 0, 100), coverage, similarity, recency_score, terms, job_weights, present)
+
+
+def main(argv) -> int:
+    """
+    Command line entry point of the scorer.
+
+    Args:
+        argv (list[str]): The command line arguments.
+
+    Returns:
+        int: 0 once the resumes were scored.
+    """
+    from resume_batch import iter_jobs
+
+    parser = argparse.ArgumentParser(prog="resume_scorer.py", description="Pre-screen resumes against job descriptions offline.")
+    parser.add_argument("sources", nargs="+", help="data sources of the resumes (see the batch mode)")
+    parser.add_argument("--job", action="append", required=True, help="text file of a job description (repeatable)")
+    parser.add_argument("--top", type=int, default=10, help="number of resumes listed per job")
+    args = parser.parse_args(argv)
+
+    names, contents = [], []
+    for job in iter_jobs(args.sources, on_error=lambda candidate_id, error: print(f"Skipped candidate {candidate_id}: {error}")):
+        names.append(job.name)
+        contents.append(job.builder.get_resume_content())
+    themes = []
+    for path in args.job:
+        with open(path, 'r', encoding="utf-8") as file:
+            themes.append(file.read())
+
+    start = time.perf_counter()
+    matrix = ResumeScorer().score_matrix(contents, themes)
+    print(f"Scored {len(contents)} resumes for {len(themes)} jobs in {(time.perf_counter() - start) * 1000:.1f} ms")
+    for column, path in enumerate(args.job):
+        print(f"\n{path}:")
+        for row in matrix.shortlist(column, args.top):
+            result = matrix.result(row, column, count=5)
+            print(f"  {result.score:5.1f}  {names[row]}  (coverage {result.coverage:.0%}, similarity {result.similarity:.2f}, "
+                  f"recency {result.recency:.2f})  missing: {', '.join(result.missing) or '-'}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
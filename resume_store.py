@@ -0,0 +1,395 @@
+"""
+Resume Save Format
+
+The format of the saved resume builders, used for the data kept in the resume database (see
+resume_database.py) and for the .resume files. It replaces the pickles of whole ResumeBuilder
+objects (.pkl files), which were tied to the layout of the class, could run arbitrary code when
+loaded, and had to be decoded completely to learn anything about them.
+
+Layout of a .resume file:
+- a fixed prefix of 22 bytes: the magic bytes RSUM, the format version (2 bytes), the CRC-32 of
+  the columns, the lengths of the metadata and of the body and the CRC-32 of the body (4 bytes
+  each), little-endian;
+- the metadata, in JSON: the name, the time it was saved, the number of entries of each section
+  and the columns of each section (the schema of the body). It can be read without the body;
+- the body, in compact JSON: the values of the records of each section as arrays of columns, in
+  the order of the columns of the metadata. Files written with other columns (an older or newer
+  schema) are mapped by name, the others are decoded without reading the metadata.
+
+Older .pkl files can still be loaded (with an unpickler that only accepts the resume builder and
+the record classes) and converted with the migrate command.
+
+Command line usage: python resume_store.py info <file> | migrate [<directory>] | bench
+"""
+
+import io
+import json
+import os
+import pickle
+import struct
+import sys
+import time
+import zlib
+from itertools import chain
+from operator import attrgetter
+
+from resume_model import Certification, Education, Experience, PersonalInfo, ResumeDataError, Skill
+
+MAGIC = b"RSUM"
+FORMAT_VERSION = 1
+EXTENSION = ".resume"
+BULLETS_COLUMN = "explanations" # the bullets of a work experience entry, stored as one array
+
+_PREFIX = struct.Struct("<4sHIIII") # magic, version, schema CRC-32, metadata length, body length, body CRC-32
+
+# The record class of every section, in the order of the body
+SECTIONS = (("personal_info", PersonalInfo), ("experience", Experience), ("education", Education),
+            ("certifications", Certification), ("skills", Skill))
+
+
+def _columns(record_class) -> list:
+    columns = [header for header, attribute in record_class.COLUMNS]
+    return columns + [BULLETS_COLUMN] if record_class is Experience else columns
+
+
+def _column_encoder(record_class):
+    """Get the function that turns the records of a section into the columns of the body."""
+    getters = [attrgetter(attribute) for attribute in record_class.attributes()]
+    if record_class is Experience:
+        getters.append(attrgetter("bullets"))
+    return lambda records: [list(map(getter, records)) for getter in getters]
+
+
+# The schema of the body is the same for every file written by this version: it is encoded once,
+# and a file whose schema CRC matches it is decoded without looking at its columns
+SCHEMA = {section: _columns(record_class) for section, record_class in SECTIONS}
+_SCHEMA_JSON = json.dumps(SCHEMA, ensure_ascii=False, separators=(",", ":"))
+_SCHEMA_CRC = zlib.crc32(_SCHEMA_JSON.encode("utf-8"))
+_ENCODERS = [(section, _column_encoder(record_class)) for section, record_class in SECTIONS]
+_SECTION_NAMES = {record_class: section for section, record_class in SECTIONS}
+_SECTION_WIDTHS = [len(SCHEMA[section]) for section, record_class in SECTIONS]
+# Indexes in the columns of all the sections: the first column of the section of every column, and the bullets
+_FIRST_COLUMNS = [sum(_SECTION_WIDTHS[:index]) for index, width in enumerate(_SECTION_WIDTHS) for column in range(width)]
+_BULLETS_INDEX = _SECTION_WIDTHS[0] + SCHEMA["experience"].index(BULLETS_COLUMN)
+
+
+def encode(builder, name="") -> bytes:
+    """
+    Encode the data of a resume builder in the save format.
+
+    Args:
+        builder (ResumeBuilder): The resume builder.
+        name (str): The name stored in the metadata, e.g. the file name.
+
+    Returns:
+        bytes: The encoded resume builder.
+    """
+    body = [encoder([builder.personal_info] if section == "personal_info" else getattr(builder, section))
+            for section, encoder in _ENCODERS]
+    metadata = {
+        "name": name,
+        "saved": time.time(),
+        "counts": {section: len(getattr(builder, section)) for section, record_class in SECTIONS[1:]},
+    }
+    metadata_json = json.dumps(metadata, ensure_ascii=False, separators=(",", ":"))
+    metadata_bytes = f'{metadata_json[:-1]},"columns":{_SCHEMA_JSON}}}'.encode("utf-8")
+    body_bytes = json.dumps(body, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return _PREFIX.pack(MAGIC, FORMAT_VERSION, _SCHEMA_CRC, len(metadata_bytes), len(body_bytes), zlib.crc32(body_bytes)) \
+        + metadata_bytes + body_bytes
+
+
+def _read_prefix(data, source):
+    if len(data) < _PREFIX.size:
+        raise ResumeDataError(f"{source}: not a saved resume (the file is too short)")
+    magic, version, schema_crc, metadata_length, body_length, crc = _PREFIX.unpack_from(data)
+    if magic != MAGIC:
+        raise ResumeDataError(f"{source}: not a saved resume")
+    if version > FORMAT_VERSION:
+        raise ResumeDataError(f"{source}: saved with a newer version of the format ({version}), please update")
+    return version, schema_crc, metadata_length, body_length, crc
+
+
+def decode_metadata(data, source="data") -> dict:
+    """
+    Decode the metadata of an encoded resume builder, without decoding the body.
+
+    Args:
+        data (bytes): The encoded resume builder (the prefix and the metadata are enough).
+        source (str): Where the data comes from, for the error messages.
+
+    Returns:
+        dict: The metadata: version, name, saved (a timestamp), counts (entries per section) and columns.
+
+    Raises:
+        ResumeDataError: If the data is not in the save format.
+    """
+    version, schema_crc, metadata_length, body_length, crc = _read_prefix(data, source)
+    try:
+        metadata = json.loads(data[_PREFIX.size:_PREFIX.size + metadata_length].decode("utf-8"))
+    except ValueError as e:
+        raise ResumeDataError(f"{source}: the metadata is damaged ({e})") from e
+    metadata["version"] = version
+    return metadata
+
+
+def decode(data, source="data") -> dict:
+    """
+    Decode an encoded resume builder.
+
+    Args:
+        data (bytes): The encoded resume builder.
+        source (str): Where the data comes from, for the error messages.
+
+    Returns:
+        dict: The records of each section (personal_info is a single record).
+
+    Raises:
+        ResumeDataError: If the data is damaged or does not match its schema.
+    """
+    version, schema_crc, metadata_length, body_length, crc = _read_prefix(data, source)
+    start = _PREFIX.size + metadata_length
+    body_bytes = data[start:start + body_length]
+    if len(body_bytes) != body_length or zlib.crc32(body_bytes) != crc:
+        raise ResumeDataError(f"{source}: the file is damaged (checksum mismatch)")
+    try:
+        body = json.loads(body_bytes.decode("utf-8"))
+    except ValueError as e:
+        raise ResumeDataError(f"{source}: the file is damaged ({e})") from e
+    if not isinstance(body, list) or len(body) != len(SECTIONS):
+        raise ResumeDataError(f"{source}: unexpected layout of the body")
+
+    if schema_crc == _SCHEMA_CRC and _is_valid_body(body):
+        sections = {section: list(map(record_class, *columns)) for (section, record_class), columns in zip(SECTIONS, body)}
+    else: # another schema (mapped with the columns of the metadata), or a faulty body (found and reported)
+        stored_columns = decode_metadata(data, source).get("columns", {}) if schema_crc != _SCHEMA_CRC else {}
+        sections = {section: _decode_columns(record_class, columns, stored_columns.get(section), f"{source}: {section}")
+                    for (section, record_class), columns in zip(SECTIONS, body)}
+    if len(sections["personal_info"]) != 1:
+        raise ResumeDataError(f"{source}: personal_info: expected one entry")
+    sections["personal_info"] = sections["personal_info"][0]
+    return sections
+
+
+def _is_valid_body(body) -> bool:
+    """
+    Check a body with the columns of this version all at once: the sections have all their
+    columns, the columns of a section have the same length, the values are texts and the bullets
+    of the work experience are lists of texts.
+    """
+    if set(map(type, body)) != {list} or list(map(len, body)) != _SECTION_WIDTHS:
+        return False
+    columns = list(chain.from_iterable(body))
+    if set(map(type, columns)) != {list}:
+        return False
+    lengths = list(map(len, columns))
+    if list(map(lengths.__getitem__, _FIRST_COLUMNS)) != lengths: # the length of the first column of each section
+        return False
+    bullets = columns.pop(_BULLETS_INDEX)
+    if set(map(type, bullets)) - {list}:
+        return False
+    try: # joining the texts is the quickest check that they are all strings
+        "".join(map("".join, columns))
+        "".join(map("".join, bullets))
+    except TypeError:
+        return False
+    return True
+
+
+def _decode_columns(record_class, columns, stored_names, source) -> list:
+    """
+    Turn the columns of a section of the body into records, mapping the columns a file was saved
+    with onto the columns of this version. It also finds the faulty column of a body that failed
+    the check of _is_valid_body.
+    """
+    names = SCHEMA[_SECTION_NAMES[record_class]]
+    if not isinstance(columns, list) or set(map(type, columns)) - {list}:
+        raise ResumeDataError(f"{source}: expected a list of columns")
+    if stored_names is not None and stored_names != names: # pick the columns by name, the missing ones stay empty
+        count = len(columns[0]) if columns else 0
+        positions = {name: position for position, name in enumerate(stored_names[:len(columns)])}
+        columns = [columns[positions[name]] if name in positions else [[] if name == BULLETS_COLUMN else ""] * count
+                   for name in names]
+    if len(columns) != len(names) or len(set(map(len, columns))) > 1:
+        raise ResumeDataError(f"{source}: expected {len(names)} columns of the same length: {', '.join(names)}")
+
+    bullets = columns[-1] if record_class is Experience else []
+    texts = columns[:-1] if record_class is Experience else columns
+    if set(map(type, chain.from_iterable(texts))) - {str} or set(map(type, bullets)) - {list} \
+            or set(map(type, chain.from_iterable(bullets))) - {str}:
+        faulty = next(name for name, column in zip(names, columns)
+                      if set(map(type, column)) - ({list} if name == BULLETS_COLUMN else {str}))
+        raise ResumeDataError(f"{source}: the '{faulty}' column holds values of the wrong type")
+    return list(map(record_class, *columns))
+
+
+def save(builder, path, name=None):
+    """
+    Save a resume builder to a file. The file is written next to its final path and then moved
+    into place, so an interrupted save never leaves a truncated file behind.
+
+    Args:
+        builder (ResumeBuilder): The resume builder.
+        path (str): Path of the .resume file.
+        name (str, optional): The name stored in the metadata. Defaults to the file name.
+    """
+    data = encode(builder, name if name is not None else os.path.splitext(os.path.basename(path))[0])
+    temporary_path = path + ".tmp"
+    with open(temporary_path, 'wb') as file:
+        file.write(data)
+    os.replace(temporary_path, path)
+
+
+def load(path):
+    """
+    Load a saved resume builder.
+
+    Args:
+        path (str): Path of the .resume file.
+
+    Returns:
+        dict: The records of each section (see decode).
+    """
+    with open(path, 'rb') as file:
+        return decode(file.read(), path)
+
+
+def read_metadata(path) -> dict:
+    """
+    Read the metadata of a saved resume builder without reading its body.
+
+    Args:
+        path (str): Path of the .resume file.
+
+    Returns:
+        dict: The metadata (see decode_metadata).
+    """
+    with open(path, 'rb') as file:
+        prefix = file.read(_PREFIX.size)
+        version, schema_crc, metadata_length, body_length, crc = _read_prefix(prefix, path)
+        return decode_metadata(prefix + file.read(metadata_length), path)
+
+
+class _ResumeUnpickler(pickle.Unpickler):
+    """An unpickler that only creates resume builders and resume records."""
+
+    def find_class(self, module, name):
+        import resume_builder
+        import resume_model
+        if name == "ResumeBuilder" and module in ("resume_builder", "__main__"): # saved from the command line
+            return resume_builder.ResumeBuilder
+        if module == "resume_model" and name in ("PersonalInfo", "Experience", "Education", "Certification", "Skill"):
+            return getattr(resume_model, name)
+        raise ResumeDataError(f"The saved file refers to {module}.{name}, which is not part of a resume")
+
+
+def load_pickle(path):
+    """
+    Load an older .pkl file saved by pickling a whole ResumeBuilder.
+
+    Args:
+        path (str): Path of the .pkl file.
+
+    Returns:
+        ResumeBuilder: The unpickled resume builder (its sections may still hold dicts).
+
+    Raises:
+        ResumeDataError: If the file holds anything else than a resume builder.
+    """
+    with open(path, 'rb') as file:
+        try:
+            return _ResumeUnpickler(file).load()
+        except (pickle.UnpicklingError, EOFError, AttributeError, ImportError) as e:
+            raise ResumeDataError(f"{path}: not a saved resume builder ({e})") from e
+
+
+def migrate(directory="saved") -> list:
+    """
+    Convert the .pkl files of a directory into .resume files. The .pkl files are kept.
+
+    Args:
+        directory (str): The directory of the saved resume builders.
+
+    Returns:
+        list[tuple[str, str]]: The (.pkl file, error message or None) of every file.
+    """
+    from resume_builder import ResumeBuilder
+
+    results = []
+    for file in sorted(os.listdir(directory)):
+        if not file.endswith(".pkl"):
+            continue
+        path = os.path.join(directory, file)
+        target = os.path.splitext(path)[0] + EXTENSION
+        if os.path.exists(target):
+            results.append((path, f"{target} already exists"))
+            continue
+        try:
+            builder = ResumeBuilder()
+            builder.load_resume_builder_pkl(path)
+            save(builder, target)
+            results.append((path, None))
+        except (ResumeDataError, OSError) as e:
+            results.append((path, str(e)))
+    return results
+
+
+def benchmark(builder, rounds=2000) -> dict:
+    """
+    Compare the save format with pickling the whole resume builder.
+
+    Args:
+        builder (ResumeBuilder): The resume builder to save and load.
+        rounds (int): Number of saves and loads to time (the best of five runs is kept).
+
+    Returns:
+        dict: The size in bytes and the save and load times in microseconds of each format. The
+            checked pickle load is what loading a .pkl file costs (unpickling and checking the records).
+    """
+    from resume_builder import ResumeBuilder
+
+    def timed(function):
+        best = float("inf")
+        for _ in range(5):
+            start = time.perf_counter()
+            for _ in range(rounds):
+                function()
+            best = min(best, time.perf_counter() - start)
+        return best / rounds * 1e6
+
+    def load_checked_pickle(data):
+        unpickled = _ResumeUnpickler(io.BytesIO(data)).load()
+        ResumeBuilder._set_records(unpickled, unpickled.personal_info, unpickled.experience, unpickled.education,
+                                   unpickled.certifications, unpickled.skills, "pickle")
+
+    pickled = pickle.dumps(builder)
+    encoded = encode(builder)
+    return {
+        "pickle": {"bytes": len(pickled), "save_us": timed(lambda: pickle.dumps(builder)),
+                   "load_us": timed(lambda: pickle.loads(pickled)),
+                   "checked_load_us": timed(lambda: load_checked_pickle(pickled))},
+        "resume": {"bytes": len(encoded), "save_us": timed(lambda: encode(builder)),
+                   "load_us": timed(lambda: decode(encoded))},
+        "metadata_us": timed(lambda: decode_metadata(encoded)),
+    }
+
+
+if __name__ == '__main__':
+    if len(sys.argv) == 3 and sys.argv[1] == "info":
+        for key, value in read_metadata(sys.argv[2]).items():
+            print(f"{key}: {value}")
+    elif len(sys.argv) in (2, 3) and sys.argv[1] == "migrate":
+        for path, error in migrate(sys.argv[2] if len(sys.argv) == 3 else "saved"):
+            print(f"{path}: {'converted' if error is None else 'skipped, ' + error}")
+    elif len(sys.argv) == 2 and sys.argv[1] == "bench":
+        from resume_builder import ResumeBuilder
+        resume_builder = ResumeBuilder()
+        resume_builder.load_csv_directory("data")
+        results = benchmark(resume_builder)
+        for name in ("pickle", "resume"):
+            print(f"{name}: {results[name]['bytes']} bytes, save {results[name]['save_us']:.1f} us, "
+                  f"load {results[name]['load_us']:.1f} us")
+        print(f"pickle load with the record checks: {results['pickle']['checked_load_us']:.1f} us")
+        print(f"resume metadata only: {results['metadata_us']:.1f} us")
+    else:
+        print("Usage: python resume_store.py info <file> | migrate [<directory>] | bench")
+        sys.exit(1)
@@ -0,0 +1,310 @@
+"""
+Template Skeleton
+
+A fill-in skeleton of a LaTeX example file, so a resume is generated from a template with one
+model call per template instead of one per resume (see ResumeLatexGenerator.get_skeleton). The
+model rewrites the example once into a skeleton: its values are replaced by placeholders such as
+<<name>>, and its entries by blocks repeated for every entry, such as <<#experience>> ...
+<</experience>>. The skeleton is checked (every placeholder and block must be known, every
+block closed, and the document must have its \\begin{document} and \\end{document}), stored in
+.cache/skeletons under the hash of the template, and every resume is then rendered locally from
+its records (with the values escaped, see latex_preflight.escape_latex), without a network call.
+
+The placeholders are the attributes of the records (see resume_model.py):
+- outside the blocks: name, city, province, phone, email, linkedin (the personal information);
+- in <<#experience>>: title, company, period, city, country, and the block <<#bullets>> with <<bullet>>;
+- in <<#education>>: school, credential, graduation, city, country;
+- in <<#certifications>>: credential, school, completion;
+- in <<#skills>>: name.
+In a block, a placeholder is a field of the entry, or else of the enclosing blocks (<<email>> in
+<<#experience>> is the email of the candidate). The block <<#between>> ... <</between>>, in a
+repeated block, is written between two entries only, e.g. for the commas of a list of skills.
+
+The skeleton files can be edited by hand: they are checked again when they are loaded.
+
+Command line usage: python template_skeleton.py show <template .tex file> | forget <template .tex file> | clear
+"""
+
+import hashlib
+import os
+import re
+import sys
+import threading
+
+from latex_preflight import escape_latex
+from resume_model import Certification, Education, Experience, PersonalInfo, Skill
+
+SKELETON_DIR = os.path.join(".cache", "skeletons")
+SKELETON_VERSION = 1 # the version of the placeholder syntax, part of the key of the stored skeletons
+
+# The fields of every scope (the document, and each block) and the blocks it can hold
+FIELDS = {"": PersonalInfo.attributes(), "experience": Experience.attributes(), "bullets": ("bullet",),
+          "education": Education.attributes(), "certifications": Certification.attributes(), "skills": Skill.attributes()}
+BLOCKS = {"": ("experience", "education", "certifications", "skills"), "experience": ("bullets",)}
+BETWEEN = "between"
+
+_TAG = re.compile(r"<<([#/]?)\s*(\w+)\s*>>")
+
+
+class TemplateSkeletonError(ValueError):
+    """A skeleton with an unknown placeholder, an unclosed block or no document body."""
+
+
+class TemplateSkeleton:
+    """A fill-in skeleton of a LaTeX template, rendered locally from the records of a resume."""
+
+    def __init__(self, text):
+        """
+        Parse a skeleton.
+
+        Args:
+            text (str): The LaTeX source of the skeleton, with its placeholders and blocks.
+
+        Raises:
+            TemplateSkeletonError: If the skeleton is not valid.
+        """
+        self.text = text
+        for command in ("\\begin{document}", "\\end{document}"):
+            if command not in text:
+                raise TemplateSkeletonError(f"the skeleton has no {command}")
+        self.nodes = self._parse(text)
+
+    @staticmethod
+    def _parse(text) -> list:
+        """Parse a skeleton into nodes: text, (field, name) or (block, name, nodes)."""
+        root = []
+        stack = [("", root)] # the open blocks, from the document
+        position = 0
+        for tag in _TAG.finditer(text):
+            nodes = stack[-1][1]
+            if tag.start() > position:
+                nodes.append(text[position:tag.start()])
+            position = tag.end()
+            kind, name = tag.group(1), tag.group(2).lower()
+            line = text.count("\n", 0, tag.start()) + 1
+            known = set().union(*(FIELDS[scope] for scope, children in stack if scope != BETWEEN))
+            if kind == "#":
+                if name == BETWEEN:
+                    allowed = stack[-1][0] not in ("", BETWEEN)
+                else:
+                    allowed = name in BLOCKS.get(stack[-1][0], ())
+                if not allowed:
+                    raise TemplateSkeletonError(f"line {line}: the block <<#{name}>> cannot be in "
+                                                f"{'the document' if not stack[-1][0] else '<<#' + stack[-1][0] + '>>'}")
+                block = ("block", name, [])
+                nodes.append(block)
+                stack.append((name, block[2]))
+            elif kind == "/":
+                if stack[-1][0] != name:
+                    expected = f"<</{stack[-1][0]}>>" if stack[-1][0] else "no closing tag"
+                    raise TemplateSkeletonError(f"line {line}: <</{name}>> found, expected {expected}")
+                stack.pop()
+            elif name in known:
+                nodes.append(("field", name))
+            else:
+                raise TemplateSkeletonError(f"line {line}: unknown placeholder <<{name}>> (expected one of {', '.join(sorted(known))})")
+        if len(stack) > 1:
+            raise TemplateSkeletonError(f"the block <<#{stack[-1][0]}>> is not closed")
+        if position < len(text):
+            root.append(text[position:])
+        return root
+
+    def render(self, personal_info, experience, education, certifications, skills) -> str:
+        """
+        Render the resume data into a LaTeX document.
+
+        Args:
+            personal_info (PersonalInfo): The personal information.
+            experience (list[Experience]): The work experience entries.
+            education (list[Education]): The education entries.
+            certifications (list[Certification]): The certification entries.
+            skills (list[Skill]): The skills.
+
+        Returns:
+            str: The LaTeX source of the resume.
+        """
+        entries = {"experience": experience, "education": education, "certifications": certifications, "skills": skills}
+        parts = []
+        self._render(self.nodes, [self._scope(personal_info)], entries, parts, False)
+        return "".join(parts)
+
+    def _render(self, nodes, scopes, entries, parts, last):
+        """Render nodes with the fields of the scopes (the innermost last) and the entries of the blocks."""
+        for node in nodes:
+            if isinstance(node, str):
+                parts.append(node)
+            elif node[0] == "field":
+                parts.append(escape_latex(next(scope[node[1]] for scope in reversed(scopes) if node[1] in scope)))
+            elif node[1] == BETWEEN:
+                if not last:
+                    self._render(node[2], scopes, entries, parts, last)
+            else:
+                items = entries[node[1]] if node[1] in entries else [{"bullet": bullet} for bullet in scopes[-1]["bullets"]]
+                for number, item in enumerate(items, 1):
+                    scope = item if isinstance(item, dict) else self._scope(item)
+                    self._render(node[2], scopes + [scope], entries, parts, number == len(items))
+
+    @staticmethod
+    def _scope(record) -> dict:
+        """The fields of a record (and the bullets of a work experience entry)."""
+        scope = {name: getattr(record, name) for name in record.attributes()}
+        if isinstance(record, Experience):
+            scope["bullets"] = record.bullets
+        return scope
+
+
+def template_key(template) -> str:
+    """
+    Get the key of the skeleton of a template: the hash of the template and of the placeholder syntax.
+
+    Args:
+        template (str): The LaTeX example file.
+
+    Returns:
+        str: The hex digest identifying the skeleton.
+    """
+    return hashlib.sha256(f"{SKELETON_VERSION}\0{template}".encode("utf-8")).hexdigest()
+
+
+class SkeletonStore:
+    """The skeletons learned from the templates, stored in a directory under the hash of their template."""
+
+    def __init__(self, skeleton_dir=SKELETON_DIR):
+        self.skeleton_dir = skeleton_dir
+        self.memory = {} # key -> TemplateSkeleton of the skeletons loaded in this process
+        self._lock = threading.Lock()
+
+    def path(self, template) -> str:
+        """
+        Get the path of the skeleton file of a template.
+
+        Args:
+            template (str): The LaTeX example file.
+
+        Returns:
+            str: The path of the skeleton file (which may not exist).
+        """
+        return os.path.join(self.skeleton_dir, template_key(template) + ".tex")
+
+    def get(self, template):
+        """
+        Get the skeleton of a template.
+
+        Args:
+            template (str): The LaTeX example file.
+
+        Returns:
+            TemplateSkeleton: The skeleton, or None if the template was not learned yet.
+
+        Raises:
+            TemplateSkeletonError: If the stored skeleton is not valid (e.g. after an edit).
+        """
+        key = template_key(template)
+        with self._lock:
+            if key in self.memory:
+                return self.memory[key]
+        path = os.path.join(self.skeleton_dir, key + ".tex")
+        try:
+            with open(path, 'r', encoding="utf-8") as file:
+                text = file.read()
+        except FileNotFoundError:
+            return None
+        try:
+            skeleton = TemplateSkeleton(text)
+        except TemplateSkeletonError as e:
+            raise TemplateSkeletonError(f"{path}: {e}") from e
+        with self._lock:
+            self.memory[key] = skeleton
+        return skeleton
+
+    def put(self, template, skeleton):
+        """
+        Store the skeleton of a template.
+
+        Args:
+            template (str): The LaTeX example file.
+            skeleton (TemplateSkeleton): Its skeleton.
+        """
+        key = template_key(template)
+        os.makedirs(self.skeleton_dir, exist_ok=True)
+        path = os.path.join(self.skeleton_dir, key + ".tex")
+        with open(path + ".tmp", 'w', encoding="utf-8") as file:
+            file.write(skeleton.text)
+        os.replace(path + ".tmp", path) # a reader never sees half a file
+        with self._lock:
+            self.memory[key] = skeleton
+
+    def forget(self, template) -> bool:
+        """
+        Remove the skeleton of a template, so it is learned again the next time.
+
+        Args:
+            template (str): The LaTeX example file.
+
+        Returns:
+            bool: True if there was a stored skeleton.
+        """
+        key = template_key(template)
+        with self._lock:
+            self.memory.pop(key, None)
+        try:
+            os.remove(os.path.join(self.skeleton_dir, key + ".tex"))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def clear(self) -> int:
+        """
+        Remove all the stored skeletons.
+
+        Returns:
+            int: The number of removed skeletons.
+        """
+        with self._lock:
+            self.memory.clear()
+        if not os.path.isdir(self.skeleton_dir):
+            return 0
+        count = 0
+        for file in os.listdir(self.skeleton_dir):
+            if file.endswith(".tex"):
+                os.remove(os.path.join(self.skeleton_dir, file))
+                count += 1
+        return count
+
+
+_skeleton_store = None
+_skeleton_store_lock = threading.Lock()
+
+
+def get_skeleton_store() -> SkeletonStore:
+    """
+    Get the shared skeleton store of this process.
+
+    Returns:
+        SkeletonStore: The skeleton store in .cache/skeletons.
+    """
+    global _skeleton_store
+    with _skeleton_store_lock:
+        if _skeleton_store is None:
+            _skeleton_store = SkeletonStore()
+        return _skeleton_store
+
+
+if __name__ == '__main__':
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+    if command in ("show", "forget") and len(sys.argv) == 3:
+        with open(sys.argv[2], 'r', encoding="utf-8") as file:
+            template_text = file.read()
+        store = get_skeleton_store()
+        if command == "show":
+            if store.get(template_text) is None:
+                print(f"{sys.argv[2]} was not learned yet")
+            else:
+                print(f"{store.path(template_text)}:\n\n{store.get(template_text).text}")
+        else:
+            print(f"Forgot the skeleton of {sys.argv[2]}" if store.forget(template_text) else f"{sys.argv[2]} was not learned yet")
+    elif command == "clear" and len(sys.argv) == 2:
+        print(f"Removed {get_skeleton_store().clear()} skeletons")
+    else:
+        print("Usage: python template_skeleton.py show <template .tex file> | forget <template .tex file> | clear")
+        sys.exit(1)
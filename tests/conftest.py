@@ -0,0 +1,29 @@
+"""
+Shared fixtures of the tests. Run them from the root of the project with: python -m pytest
+"""
+
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(ROOT, "data")
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture(autouse=True)
+def work_dir(tmp_path, monkeypatch):
+    """Run every test in its own directory, so the caches (.cache, output, saved) stay out of the project."""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def sample_builder():
+    """The resume builder of the sample data of the data directory."""
+    from resume_builder import ResumeBuilder
+
+    builder = ResumeBuilder()
+    builder.load_csv_directory(DATA_DIR)
+    return builder
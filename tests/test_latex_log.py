@@ -0,0 +1,171 @@
+"""
+Tests of the parsing of the output of the LaTeX engine (latex_log.py), on captured xelatex output.
+"""
+
+from latex_log import (LATEX_ERROR, MISSING_CHARACTER, MISSING_FONT, MISSING_PACKAGE, OVERFULL_BOX, LogParser,
+                       parse_log)
+from latex_preflight import ERROR, WARNING
+
+# xelatex -halt-on-error -file-line-error on a document with an undefined command on line 7
+UNDEFINED_COMMAND = r"""This is XeTeX, Version 3.141592653-2.6-0.999995 (TeX Live 2023) (preloaded format=xelatex)
+ restricted \write18 enabled.
+entering extended mode
+(./resume.tex
+LaTeX2e <2022-11-01> patch level 1
+(/usr/share/texlive/texmf-dist/tex/latex/base/article.cls
+Document Class: article 2022/07/02 v1.4n Standard LaTeX document class
+(/usr/share/texlive/texmf-dist/tex/latex/base/size10.clo))
+No file resume.aux.
+./resume.tex:7: Undefined control sequence.
+l.7 Hello \foo
+               {world}
+./resume.tex:7:  ==> Fatal error occurred, no output PDF file produced!
+Transcript written on resume.log.
+"""
+
+# The same without -file-line-error
+UNDEFINED_COMMAND_PLAIN = r"""(./resume.tex
+! Undefined control sequence.
+l.7 Hello \foo
+               {world}
+!  ==> Fatal error occurred, no output PDF file produced!
+"""
+
+# xelatex -halt-on-error -file-line-error on a document using a package that is not installed
+MISSING_STY = r"""(./resume.tex
+LaTeX2e <2022-11-01> patch level 1
+
+./resume.tex:3: LaTeX Error: File `fancyresume.sty' not found.
+
+Type X to quit or <RETURN> to proceed,
+or enter new name. (Default extension: sty)
+
+Enter file name:
+./resume.tex:3: Emergency stop.
+<read *>
+
+l.3 \usepackage
+               {fancyresume}^^M
+No pages of output.
+Transcript written on resume.log.
+"""
+
+# xelatex -file-line-error (without -halt-on-error) recovering from its errors
+RECOVERED = r"""(./resume.tex
+./resume.tex:5: LaTeX Error: Environment itemise undefined.
+
+See the LaTeX manual or LaTeX Companion for explanation.
+Type  H <return>  for immediate help.
+ ...
+
+l.5 \begin{itemise}
+
+./resume.tex:9: fontspec error: "font-not-found"
+!
+! The font "Comic Neue" cannot be found.
+l.9 \setmainfont{Comic Neue}
+
+Missing character: There is no ^^A (U+0001) in font [lmroman10-regular]:mapping=tex-text;!
+
+Overfull \hbox (15.10403pt too wide) in paragraph at lines 12--13
+[]\TU/lmr/m/n/10 https://linkedin.com/in/a-very-long-profile-name-that-does-not-fit
+ []
+
+Overfull \vbox (2.0pt too high) has occurred while \output is active []
+
+Output written on resume.pdf (1 page).
+"""
+
+
+def test_file_line_error():
+    diagnostics = parse_log(UNDEFINED_COMMAND)
+    assert len(diagnostics) == 1
+    error = diagnostics[0]
+    assert (error.severity, error.kind, error.message) == (ERROR, LATEX_ERROR, "Undefined control sequence.")
+    assert (error.file, error.line, error.context) == ("./resume.tex", 7, "Hello \\foo")
+    assert str(error) == "./resume.tex:7: error: Undefined control sequence. (at: Hello \\foo)"
+
+
+def test_plain_error():
+    diagnostics = parse_log(UNDEFINED_COMMAND_PLAIN)
+    assert len(diagnostics) == 1
+    assert (diagnostics[0].file, diagnostics[0].line, diagnostics[0].context) == (None, 7, "Hello \\foo")
+    assert str(diagnostics[0]) == "line 7: error: Undefined control sequence. (at: Hello \\foo)"
+
+
+def test_missing_package():
+    diagnostics = parse_log(MISSING_STY)
+    assert len(diagnostics) == 1
+    error = diagnostics[0]
+    assert (error.kind, error.message) == (MISSING_PACKAGE, "the package fancyresume is not installed")
+    assert (error.line, error.context) == (3, "\\usepackage")
+
+
+def test_missing_class():
+    diagnostics = parse_log("./resume.tex:1: LaTeX Error: File `altacv.cls' not found.\nl.1 ^^M\n")
+    assert diagnostics[0].message == "the class altacv is not installed"
+
+
+def test_recovered_errors_and_warnings():
+    diagnostics = parse_log(RECOVERED)
+    assert [(diagnostic.severity, diagnostic.kind) for diagnostic in diagnostics] == [
+        (ERROR, LATEX_ERROR), (ERROR, LATEX_ERROR), (ERROR, MISSING_FONT), (WARNING, MISSING_CHARACTER),
+        (WARNING, OVERFULL_BOX), (WARNING, OVERFULL_BOX)]
+    assert (diagnostics[0].line, diagnostics[0].context) == (5, "\\begin{itemise}")
+    assert (diagnostics[1].message, diagnostics[1].context) == ('fontspec error: "font-not-found"', "")
+    assert (diagnostics[2].message, diagnostics[2].line) == ("the font Comic Neue is not installed", 9)
+    assert diagnostics[2].context == "\\setmainfont{Comic Neue}"
+    assert diagnostics[3].message == "there is no ^^A (U+0001) in the font [lmroman10-regular]:mapping=tex-text;"
+    assert (diagnostics[4].message, diagnostics[4].line) == ("hbox 15.10403pt too wide", 12)
+    assert (diagnostics[5].message, diagnostics[5].line) == ("vbox 2.0pt too high", None)
+
+
+def test_stops_at_the_context_line():
+    parser = LogParser()
+    lines = UNDEFINED_COMMAND.splitlines(keepends=True)
+    stopped = [number for number, line in enumerate(lines) if parser.feed(line)]
+    assert stopped == [lines.index("l.7 Hello \\foo\n")]
+    assert parser.fatal
+
+
+def test_consequence_waits_for_the_context_line():
+    parser = LogParser()
+    lines = MISSING_STY.splitlines()
+    stopped = [line for line in lines if parser.feed(line)]
+    assert stopped == ["l.3 \\usepackage"]
+
+
+def test_error_without_context_is_fatal_at_the_end():
+    parser = LogParser()
+    assert not parser.feed("! Emergency stop.") # a consequence without an error is an error itself
+    assert not parser.fatal
+    assert len(parser.close()) == 1
+    assert parser.fatal
+
+
+def test_wrapped_lines():
+    # a log written with the default max_print_line: the lines are wrapped at 79 characters
+    message = "./templates/resume_config/resume.tex:12: LaTeX Error: File `a-package-with-a-very-long-name.sty' not found."
+    overfull = "Overfull \\hbox (1.5pt too wide) in paragraph at lines 40--41 " + "x" * 60
+    text = "\n".join([message[:79], message[79:], "", "l.12 \\usepackage", overfull[:79], overfull[79:], ""])
+    diagnostics = parse_log(text)
+    assert [diagnostic.kind for diagnostic in diagnostics] == [MISSING_PACKAGE, OVERFULL_BOX]
+    assert diagnostics[0].message == "the package a-package-with-a-very-long-name is not installed"
+    assert (diagnostics[0].file, diagnostics[0].line) == ("./templates/resume_config/resume.tex", 12)
+    assert diagnostics[1].line == 40
+
+
+def test_line_as_long_as_a_wrapped_one():
+    line = "(" + "/usr/share/texlive/texmf-dist/tex/latex/" + "a" * 33 + ".sty)"
+    assert len(line) == 79
+    diagnostics = parse_log(f"{line}\n! Undefined control sequence.\nl.3 \\foo\n")
+    assert [(diagnostic.message, diagnostic.line) for diagnostic in diagnostics] == [("Undefined control sequence.", 3)]
+
+
+def test_compiler_width_does_not_join():
+    line = "./resume.tex:4: Undefined control sequence." + " " * 36
+    assert len(line) == 79
+    parser = LogParser(line_width=10000)
+    parser.feed(line)
+    assert parser.feed("l.4 \\foo")
+    assert parser.close()[0].context == "\\foo"
@@ -0,0 +1,133 @@
+"""
+Tests of the checks of the LaTeX documents before they are compiled (latex_preflight.py).
+"""
+
+import pytest
+
+from latex_preflight import ERROR, REPAIRED, WARNING, check_latex, escape_latex, find_definitions
+
+PREAMBLE = ("\\documentclass{article}\n"
+            "\\newcommand{\\foo}[2]{#1#2}\n"
+            "\\newcommand{\\opt}[2][x]{#1#2}\n"
+            "\\NewDocumentCommand{\\entry}{m o m}{#1#3}\n")
+
+
+def _check(body):
+    return check_latex(f"{PREAMBLE}\\begin{{document}}\n{body}\n\\end{{document}}\n")
+
+
+# body, severity of the issue (None: no issue), words of its message (other issues may follow from it)
+CASES = [
+    # braces
+    ("{a} {b {c}}", None, ""),
+    ("{a", ERROR, "this { is not closed"),
+    ("a}", ERROR, "this } has no matching {"),
+    ("\\{ \\} 100\\%", None, ""),
+    ("% an { in a comment", None, ""),
+    ("\\verb|{|", None, ""),
+    ("\\begin{verbatim}\n{ & }\n\\end{verbatim}", None, ""),
+    # environments
+    ("\\begin{itemize}\\item a\\end{itemize}", None, ""),
+    ("\\begin{itemize}\\item a", REPAIRED, "\\begin{itemize} was not closed, \\end{itemize} was added"),
+    ("\\begin{center}\\begin{itemize}\\item a\\end{center}", REPAIRED,
+     "\\begin{itemize} was not closed, \\end{itemize} was added before \\end{center}"),
+    ("\\begin{itemize}\\end{center}", ERROR, "\\end{center} found, expected \\end{itemize}"),
+    ("{\\begin{center}}\\end{center}", ERROR, "this } closes a brace opened before \\begin{center}"),
+    ("\\begin", ERROR, "\\begin without an environment name"),
+    ("\\begin{verbatim} {", ERROR, "\\begin{verbatim} is not closed"),
+    # the & of the text
+    ("R&D", REPAIRED, "& in the text was escaped"),
+    ("\\begin{itemize}\\item R&D\\end{itemize}", REPAIRED, "& in the text was escaped"),
+    ("R\\&D", None, ""),
+    ("\\begin{tabular}{ll}a & b\\end{tabular}", None, ""),
+    ("\\textbf{R&D}", None, ""), # the engine reports it, the argument may be a table cell
+    # the arguments of the defined commands
+    ("\\foo{a}{b}", None, ""),
+    ("{\\foo{a}}", ERROR, "\\foo takes 2 arguments, it was given 1"),
+    ("\\foo\\relax x", None, ""), # single tokens are arguments too
+    ("\\foo x y", None, ""),
+    ("\\foo{a} % a comment\n {b}", None, ""),
+    ("\\foo{a}\n\n{b}", WARNING, "\\foo takes 2 arguments, a blank line comes after 1"),
+    ("\\textbf\\today", None, ""), # not defined in the document: not checked
+    ("\\opt{a}", None, ""),
+    ("\\opt[y]{a}", None, ""),
+    ("{\\opt[y]}", ERROR, "\\opt takes 1 arguments, it was given 0"),
+    ("\\entry{a}[b]{c}", None, ""),
+    ("{\\entry{a}}", ERROR, "\\entry takes 2 arguments, it was given 1"),
+]
+
+
+@pytest.mark.parametrize("body, severity, message", CASES)
+def test_check_latex(body, severity, message):
+    result = _check(body)
+    if severity is None:
+        assert result.issues == []
+        assert result.ok and not result.repaired
+    else:
+        assert [issue.severity for issue in result.issues if message in issue.message] == [severity]
+        severities = {issue.severity for issue in result.issues}
+        assert result.ok == (ERROR not in severities)
+        assert result.repaired == (REPAIRED in severities)
+
+
+@pytest.mark.parametrize("body, repaired", [
+    ("R&D", "R\\&D"),
+    ("\\begin{itemize}\\item a", "\\begin{itemize}\\item a\n\\end{itemize}\n\\end{document}"),
+    ("\\begin{center}\\begin{itemize}\\item a\\end{center}", "\\begin{itemize}\\item a\\end{itemize}\n\\end{center}"),
+])
+def test_repairs(body, repaired):
+    result = _check(body)
+    assert repaired in result.source
+    assert check_latex(result.source).issues == []
+
+
+def test_missing_end_of_document_is_added():
+    result = check_latex("\\documentclass{article}\n\\begin{document}\nHello")
+    assert [issue.severity for issue in result.issues] == [REPAIRED]
+    assert result.source.endswith("Hello\n\\end{document}\n")
+
+
+def test_missing_begin_of_document():
+    result = check_latex("\\documentclass{article}\nHello")
+    assert not result.ok
+    assert result.issues[0].message == "the document has no \\begin{document}"
+
+
+def test_issue_lines():
+    result = _check("a\n\n{b")
+    assert str(result.issues[0]) == "line 8: error: this { is not closed"
+
+
+def test_find_definitions():
+    definitions = find_definitions(PREAMBLE + "\\def\\pair#1#2{#1}\n\\newenvironment{entries}{}{}\n")
+    assert definitions.commands == {"foo": (2, False), "opt": (1, True), "entry": (2, False), "pair": (2, False)}
+    assert definitions.environments == {"entries"}
+
+
+def test_template_class(tmp_path):
+    (tmp_path / "resume.cls").write_text("\\newcommand{\\Workexperience}[1]{#1}\n\\newenvironment{rSection}[1]{}{}\n")
+    result = check_latex("\\documentclass{resume}\n\\begin{document}\n\\workexperience{a}\n"
+                         "\\begin{rsection}{b}\\end{rsection}\n{\\Workexperience}\n\\end{document}\n", str(tmp_path))
+    assert [str(issue) for issue in result.issues] == [
+        "line 3: warning: \\workexperience is not defined by the template class, did you mean \\Workexperience?",
+        "line 4: warning: the environment rsection is not defined by the template class, did you mean rSection?",
+        "line 5: error: \\Workexperience takes 1 arguments, it was given 0",
+    ]
+
+
+@pytest.mark.parametrize("text, escaped", [
+    ("plain text", "plain text"),
+    ("100%", "100\\%"),
+    ("R&D", "R\\&D"),
+    ("$5", "\\$5"),
+    ("C#", "C\\#"),
+    ("snake_case", "snake\\_case"),
+    ("x^2", "x\\textasciicircum{}2"),
+    ("~/bin", "\\textasciitilde{}/bin"),
+    ("C:\\Users", "C:\\textbackslash{}Users"),
+    ("{a}", "\\{a\\}"),
+    ("\\{", "\\textbackslash{}\\{"), # the braces of \textbackslash{} are not escaped again
+    ("two\n\nlines", "two lines"),
+])
+def test_escape_latex(text, escaped):
+    assert escape_latex(text) == escaped
@@ -0,0 +1,139 @@
+"""
+Tests of the resume database (resume_database.py) and of its inverted index (resume_index.py).
+"""
+
+import pytest
+
+import resume_index
+from resume_builder import ResumeBuilder
+from resume_database import ResumeDatabase
+from resume_model import Education, Experience, PersonalInfo, Skill
+
+
+def _builder(candidate, skills=(), title="", bullets=(), credential=""):
+    builder = ResumeBuilder()
+    builder.personal_info = PersonalInfo(candidate, email=f"{candidate.lower()}@example.com")
+    builder.experience = [Experience(title, "Acme", "2020-2022", bullets=bullets)]
+    builder.education = [Education("State University", credential, "2019")] if credential else []
+    builder.skills = [Skill(skill) for skill in skills]
+    return builder
+
+
+@pytest.fixture
+def database(tmp_path):
+    database = ResumeDatabase(str(tmp_path / "resumes.sqlite"))
+    database.save("ann", _builder("Ann", skills=["Python", "SQL"], title="Data Engineer",
+                                  bullets=["Built pipelines in Scala"]))
+    database.save("bob", _builder("Bob", skills=["Java"], title="Developer",
+                                  bullets=["Wrote Python scripts", "Applied machine learning to fraud"]))
+    database.save("cem", _builder("Cem", skills=["Pythonic thinking"], title="Machine operator",
+                                  bullets=["Learning fast"], credential="PhD in Physics"))
+    return database
+
+
+def _names(results):
+    return [resume.name for resume, score in results]
+
+
+def test_tokenize_folds_case_and_accents():
+    assert resume_index.tokenize("Café C++ C# node.js") == ["cafe", "c++", "c#", "node", "js"]
+
+
+def test_parse_query():
+    terms = resume_index.parse_query('skills:Python "machine learning" eng*')
+    assert terms == [resume_index.QueryTerm(["python"], "skills"), resume_index.QueryTerm(["machine", "learning"]),
+                     resume_index.QueryTerm(["eng"], prefix=True)]
+    with pytest.raises(ValueError, match="Unknown field: hobbies"):
+        resume_index.parse_query("hobbies:chess")
+
+
+def test_a_skill_ranks_above_a_bullet(database):
+    results = database.rank("python")
+    assert _names(results) == ["ann", "bob"]
+    assert results[0][1] > results[1][1] > 0
+
+
+def test_all_the_words_must_match(database):
+    assert _names(database.rank("python scala")) == ["ann"]
+    assert database.rank("python cobol") == []
+    assert database.rank("") == []
+
+
+def test_field_query(database):
+    assert _names(database.rank("skills:python")) == ["ann"]
+    assert _names(database.rank("bullets:python")) == ["bob"]
+    assert _names(database.rank("credentials:phd")) == ["cem"]
+
+
+def test_prefix_query(database):
+    assert sorted(_names(database.rank("pyth*"))) == ["ann", "bob", "cem"]
+    assert _names(database.rank("skills:pythonic*")) == ["cem"]
+
+
+def test_phrase_query_stays_in_one_field(database):
+    assert sorted(_names(database.rank("machine learning"))) == ["bob", "cem"]
+    assert _names(database.rank('"machine learning"')) == ["bob"] # cem has the words in two fields
+
+
+def test_rank_limit(database):
+    assert _names(database.rank("pyth*", limit=1)) == _names(database.rank("pyth*"))[:1]
+    for limit in (0, -1):
+        with pytest.raises(ValueError, match="limit must be at least 1"):
+            database.rank("python", limit=limit)
+        with pytest.raises(ValueError, match="limit must be at least 1"):
+            database.search("python", limit=limit)
+        with pytest.raises(ValueError, match="limit must be at least 1"):
+            database.list_page(limit=limit)
+
+
+def test_search_pages_from_the_most_recent(database):
+    first = database.search("l", limit=1) # the last word is a prefix: learning
+    assert [resume.name for resume in first] == ["cem"]
+    assert [resume.name for resume in database.search("l", after=first[0])] == ["bob"]
+
+
+def test_list_page_filters(database):
+    assert [resume.name for resume in database.list_page()] == ["cem", "bob", "ann"]
+    assert [resume.name for resume in database.list_page("email", "BO")] == ["bob"]
+    assert [resume.name for resume in database.list_page("school", "state")] == ["cem"]
+    with pytest.raises(ValueError, match="Unknown field"):
+        database.list_page("phone", "555")
+
+
+def test_save_replaces_the_resume_of_the_same_name(database):
+    old_id = database.get("ann").id
+    new_id = database.save("ANN", _builder("Ann", skills=["Rust"], title="Engineer"))
+    assert new_id > old_id
+    assert database.count() == 3
+    assert database.get("ann").id == new_id
+    assert _names(database.rank("python")) == ["bob"]
+    assert _names(database.rank("rust")) == ["ANN"]
+    assert [skill.name for skill in database.load("ann")["skills"]] == ["Rust"]
+
+
+def test_delete(database):
+    assert database.delete([database.get("bob").id, 12345]) == 1
+    assert database.count() == 2
+    assert database.get("bob") is None
+    assert _names(database.rank("python")) == ["ann"]
+    assert database.search("fraud") == []
+    assert database.list_page("company", "acme")[-1].name == "ann"
+
+
+def test_reindex_matches_the_updated_index(tmp_path):
+    database = ResumeDatabase(str(tmp_path / "resumes.sqlite"))
+    # enough saves one at a time for the segments of the common terms to be merged
+    for number in range(3 * resume_index.MERGE_FACTOR):
+        database.save(f"resume{number}", _builder(f"Candidate{number}", skills=["Python"] + ["Go"] * (number % 3 == 0),
+                                                  bullets=[f"Project {number}"]))
+    database.delete([database.get(f"resume{number}").id for number in range(0, 3 * resume_index.MERGE_FACTOR, 4)])
+    database.save("resume1", _builder("Candidate1", skills=["Haskell"]))
+
+    queries = ("python", "go", "skills:go python", "haskell", "project*")
+    before = {query: sorted(_names(database.rank(query, limit=100))) for query in queries}
+    assert len(before["python"]) == 3 * resume_index.MERGE_FACTOR - 6 - 1
+    assert "resume0" not in before["go"] and "resume3" in before["go"]
+    assert before["haskell"] == ["resume1"]
+
+    assert database.reindex() == database.count()
+    assert {query: sorted(_names(database.rank(query, limit=100))) for query in queries} == before
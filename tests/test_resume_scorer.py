@@ -0,0 +1,87 @@
+"""
+Tests of the local pre-screen of resumes (resume_scorer.py).
+"""
+
+import datetime
+
+import pytest
+
+from resume_scorer import ResumeScorer, resume_terms, tokenize
+
+TODAY = datetime.date(2024, 6, 1)
+JOB = "Python developer with Django and PostgreSQL, machine learning a plus."
+
+
+def _resume(period, *bullets, skills=()):
+    """A resume in the text format of ResumeBuilder.get_resume_content()."""
+    lines = ["Personal Information:", "name: Ann", "email: ann@example.com", "", "Experience:",
+             "Job Title: Developer", "Company: Acme", f"Employment Period: {period}"]
+    lines += [f"Explanation {number}: {bullet}" for number, bullet in enumerate(bullets, 1)]
+    if skills:
+        lines += ["", "Skills:"] + [f"Skill: {skill}" for skill in skills]
+    return "\n".join(lines)
+
+
+def test_tokenize_keeps_languages_and_pairs():
+    assert tokenize("C++ and node.js, R") == ["c++", "node.js", "r"]
+    assert tokenize("Machine learning") == ["machine", "learning", "machine learning"]
+
+
+def test_personal_information_is_not_matched():
+    counts, recency = resume_terms(_resume("2020-2022", "Built things"), TODAY)
+    assert "ann" not in counts and "acme" in counts
+
+
+def test_empty_theme_scores_zero(sample_builder):
+    result = ResumeScorer(TODAY).score(sample_builder.get_resume_content(), "")
+    assert (result.score, result.coverage, result.similarity, result.recency, result.missing) == (0.0, 0.0, 0.0, 0.0, [])
+
+
+def test_empty_resume_scores_zero():
+    result = ResumeScorer(TODAY).score("", JOB)
+    assert result.score == 0.0
+    assert result.missing == ["python developer", "machine learning", "django", "postgresql"]
+
+
+def test_exact_match_beats_partial_match():
+    exact = _resume("2021-present", "Python developer with Django and PostgreSQL", "Machine learning")
+    partial = _resume("2021-present", "Built Python scripts")
+    matrix = ResumeScorer(TODAY).score_matrix([partial, exact], [JOB])
+    assert matrix.shortlist(0, 2) == [1, 0]
+    assert matrix.result(1, 0).coverage == pytest.approx(1.0)
+    assert matrix.result(1, 0).score > matrix.result(0, 0).score > 0
+    assert "django" in matrix.result(0, 0).missing
+
+
+def test_recency_changes_the_order():
+    bullets = ("Built Python services with Django", "Tuned PostgreSQL queries")
+    old = _resume("2008-2010", *bullets)
+    recent = _resume("2022-present", *bullets)
+    matrix = ResumeScorer(TODAY).score_matrix([old, recent], [JOB])
+    assert matrix.coverage[0, 0] == pytest.approx(matrix.coverage[1, 0])
+    assert matrix.recency[1, 0] == pytest.approx(1.0)
+    assert matrix.recency[0, 0] < 0.2
+    assert matrix.shortlist(0, 2) == [1, 0]
+
+
+def test_undated_terms_count_half():
+    matrix = ResumeScorer(TODAY).score_matrix([_resume("", "Wrote Python")], ["Python"])
+    assert matrix.recency[0, 0] == pytest.approx(0.5)
+
+
+def test_matrix_matches_single_scores():
+    contents = [_resume("2019-2021", "Python and Django"), _resume("2023-present", "PostgreSQL")]
+    themes = [JOB, "PostgreSQL administrator"]
+    scorer = ResumeScorer(TODAY)
+    matrix = scorer.score_matrix(contents, themes)
+    assert matrix.scores.shape == (2, 2)
+    assert ((matrix.scores >= 0) & (matrix.scores <= 100)).all()
+    assert matrix.shortlist(1, 1) == [1]
+    # the IDF depends on the whole matrix, so only the order is the same one document at a time
+    single = [[scorer.score(content, theme).score for theme in themes] for content in contents]
+    assert (single[0][0] > single[1][0]) == (matrix.scores[0, 0] > matrix.scores[1, 0])
+
+
+def test_missing_keywords_prefer_pairs():
+    result = ResumeScorer(TODAY).score(_resume("2020-2022", "Python"), "Python machine learning")
+    assert set(result.missing) == {"machine learning", "python machine"} # not the words of the pairs
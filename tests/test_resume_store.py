@@ -0,0 +1,155 @@
+"""
+Tests of the resume save format (resume_store.py).
+"""
+
+import json
+import struct
+import zlib
+
+import pytest
+
+import resume_store
+from resume_model import Experience, ResumeDataError
+from resume_store import FORMAT_VERSION, MAGIC, SCHEMA
+
+
+def _pack(metadata, body, version=FORMAT_VERSION, schema_crc=None):
+    """Encode a metadata and a body the way resume_store.encode does, with any columns."""
+    metadata_bytes = json.dumps(metadata).encode("utf-8")
+    body_bytes = json.dumps(body).encode("utf-8")
+    if schema_crc is None:
+        schema_crc = zlib.crc32(json.dumps(metadata.get("columns")).encode("utf-8"))
+    return resume_store._PREFIX.pack(MAGIC, version, schema_crc, len(metadata_bytes), len(body_bytes),
+                                     zlib.crc32(body_bytes)) + metadata_bytes + body_bytes
+
+
+def _split(data):
+    """The metadata and the body of an encoded resume builder."""
+    magic, version, schema_crc, metadata_length, body_length, crc = resume_store._PREFIX.unpack_from(data)
+    start = resume_store._PREFIX.size
+    return json.loads(data[start:start + metadata_length]), json.loads(data[start + metadata_length:])
+
+
+def test_round_trip(sample_builder):
+    sections = resume_store.decode(resume_store.encode(sample_builder, "sample"))
+    assert sections["personal_info"] == sample_builder.personal_info
+    for section in ("experience", "education", "certifications", "skills"):
+        assert sections[section] == getattr(sample_builder, section)
+    assert all(isinstance(entry.bullets, tuple) for entry in sections["experience"])
+
+
+def test_save_and_load(sample_builder, tmp_path):
+    path = str(tmp_path / "tom.resume")
+    resume_store.save(sample_builder, path)
+    assert resume_store.load(path)["experience"] == sample_builder.experience
+    assert resume_store.read_metadata(path)["name"] == "tom"
+    assert not (tmp_path / "tom.resume.tmp").exists()
+
+
+def test_flipped_body_byte_is_detected(sample_builder):
+    data = bytearray(resume_store.encode(sample_builder))
+    data[-1] ^= 0x01
+    with pytest.raises(ResumeDataError, match="checksum mismatch"):
+        resume_store.decode(bytes(data))
+
+
+def test_truncated_body_is_detected(sample_builder):
+    with pytest.raises(ResumeDataError, match="checksum mismatch"):
+        resume_store.decode(resume_store.encode(sample_builder)[:-10])
+
+
+def test_not_a_saved_resume():
+    with pytest.raises(ResumeDataError, match="too short"):
+        resume_store.decode(b"RSUM")
+    with pytest.raises(ResumeDataError, match="not a saved resume"):
+        resume_store.decode(b"PK\x03\x04" + bytes(40))
+
+
+def test_newer_version_is_rejected(sample_builder):
+    metadata, body = _split(resume_store.encode(sample_builder))
+    data = _pack(metadata, body, version=FORMAT_VERSION + 1, schema_crc=resume_store._SCHEMA_CRC)
+    with pytest.raises(ResumeDataError, match="newer version of the format"):
+        resume_store.decode(data)
+    with pytest.raises(ResumeDataError, match="newer version of the format"):
+        resume_store.decode_metadata(data)
+
+
+def test_reordered_columns_are_mapped_by_name(sample_builder):
+    metadata, body = _split(resume_store.encode(sample_builder))
+    experience = dict(zip(SCHEMA["experience"], body[1]))
+    reordered = list(reversed(SCHEMA["experience"]))
+    metadata["columns"]["experience"] = reordered
+    body[1] = [experience[name] for name in reordered]
+    sections = resume_store.decode(_pack(metadata, body))
+    assert sections["experience"] == sample_builder.experience
+
+
+def test_missing_columns_stay_empty(sample_builder):
+    metadata, body = _split(resume_store.encode(sample_builder))
+    experience = dict(zip(SCHEMA["experience"], body[1]))
+    kept = ["job title", "company name"] # an older schema, without the bullets
+    metadata["columns"]["experience"] = kept
+    body[1] = [experience[name] for name in kept]
+    sections = resume_store.decode(_pack(metadata, body))
+    assert [entry.title for entry in sections["experience"]] == [entry.title for entry in sample_builder.experience]
+    assert all(entry.city == "" and entry.bullets == () for entry in sections["experience"])
+
+
+def test_extra_columns_are_ignored(sample_builder):
+    metadata, body = _split(resume_store.encode(sample_builder))
+    count = len(body[4][0])
+    metadata["columns"]["skills"] = ["level", "name"] # a newer schema
+    body[4] = [["expert"] * count, body[4][0]]
+    sections = resume_store.decode(_pack(metadata, body))
+    assert sections["skills"] == sample_builder.skills
+
+
+def test_wrong_type_names_the_column(sample_builder):
+    metadata, body = _split(resume_store.encode(sample_builder))
+    body[1][SCHEMA["experience"].index("company name")][0] = 42
+    with pytest.raises(ResumeDataError, match="experience: the 'company name' column holds values of the wrong type"):
+        resume_store.decode(_pack(metadata, body, schema_crc=resume_store._SCHEMA_CRC))
+
+
+def test_wrong_bullets_type_names_the_column(sample_builder):
+    metadata, body = _split(resume_store.encode(sample_builder))
+    body[1][SCHEMA["experience"].index(resume_store.BULLETS_COLUMN)][0] = "not a list"
+    with pytest.raises(ResumeDataError, match="the 'explanations' column"):
+        resume_store.decode(_pack(metadata, body, schema_crc=resume_store._SCHEMA_CRC))
+
+
+def test_columns_of_different_lengths(sample_builder):
+    metadata, body = _split(resume_store.encode(sample_builder))
+    body[3][0].append("extra")
+    with pytest.raises(ResumeDataError, match="certifications: expected 3 columns of the same length"):
+        resume_store.decode(_pack(metadata, body, schema_crc=resume_store._SCHEMA_CRC))
+
+
+def test_personal_info_is_a_single_record(sample_builder):
+    metadata, body = _split(resume_store.encode(sample_builder))
+    body[0] = [column * 2 for column in body[0]]
+    with pytest.raises(ResumeDataError, match="personal_info: expected one entry"):
+        resume_store.decode(_pack(metadata, body, schema_crc=resume_store._SCHEMA_CRC))
+
+
+def test_read_metadata_without_the_body(sample_builder, tmp_path):
+    data = resume_store.encode(sample_builder, "Tom")
+    metadata_length = struct.unpack_from("<I", data, 10)[0]
+    path = tmp_path / "cut.resume"
+    path.write_bytes(data[:resume_store._PREFIX.size + metadata_length]) # the body is missing altogether
+    metadata = resume_store.read_metadata(str(path))
+    assert metadata["name"] == "Tom"
+    assert metadata["version"] == FORMAT_VERSION
+    assert metadata["counts"]["experience"] == len(sample_builder.experience)
+    assert metadata["columns"] == SCHEMA
+    with pytest.raises(ResumeDataError, match="checksum mismatch"):
+        resume_store.load(str(path))
+
+
+def test_bullets_survive_the_round_trip():
+    from resume_builder import ResumeBuilder
+
+    builder = ResumeBuilder()
+    builder.experience = [Experience("Engineer", "Acme", "2020 - 2022", "Paris", "France", ["Built, \"things\"", "Ünïcode"])]
+    sections = resume_store.decode(resume_store.encode(builder))
+    assert sections["experience"][0].bullets == ("Built, \"things\"", "Ünïcode")
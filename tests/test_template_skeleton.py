@@ -0,0 +1,107 @@
+"""
+Tests of the fill-in skeletons of the LaTeX templates (template_skeleton.py).
+"""
+
+import re
+
+import pytest
+
+from resume_model import Certification, Experience, PersonalInfo, Skill
+from template_skeleton import SkeletonStore, TemplateSkeleton, TemplateSkeletonError, template_key
+
+PERSONAL_INFO = PersonalInfo("Ann Lee", "Lyon", "Rhone", "555-0100", "ann@example.com", "annlee")
+EXPERIENCE = [Experience("Engineer", "R&D Labs", "2021-2023", "Paris", "France", ["Cut costs by 10%", "Led 3 people"]),
+              Experience("Intern", "Acme", "2020", "Lyon", "France", [])]
+SKILLS = [Skill("Python"), Skill("C#"), Skill("SQL")]
+
+
+def _document(body):
+    return "\\begin{document}\n" + body + "\n\\end{document}"
+
+
+def _render(body, experience=EXPERIENCE, skills=SKILLS, certifications=()):
+    return TemplateSkeleton(_document(body)).render(PERSONAL_INFO, experience, [], list(certifications), skills)
+
+
+def _body(text):
+    return text[len("\\begin{document}\n"):-len("\n\\end{document}")]
+
+
+def test_fields_of_the_document():
+    assert _body(_render("<<name>>, << email >>")) == "Ann Lee, ann@example.com"
+
+
+def test_values_are_escaped():
+    assert _body(_render("<<#experience>><<company>>;<</experience>>")) == "R\\&D Labs;Acme;"
+
+
+def test_scoped_field_lookup():
+    # city is a field of the entry, so it hides the city of the candidate; email is looked up in the document
+    rendered = _render("<<city>>|<<#experience>><<city>>/<<email>>|<</experience>>")
+    assert _body(rendered) == "Lyon|Paris/ann@example.com|Lyon/ann@example.com|"
+
+
+def test_between():
+    assert _body(_render("<<#skills>><<name>><<#between>>, <</between>><</skills>>")) == "Python, C\\#, SQL"
+    assert _body(_render("<<#skills>><<name>><<#between>>, <</between>><</skills>>", skills=[])) == ""
+    assert _body(_render("<<#skills>><<name>><<#between>>, <</between>><</skills>>", skills=SKILLS[:1])) == "Python"
+
+
+def test_nested_bullets():
+    rendered = _render("<<#experience>>[<<title>>:<<#bullets>> * <<bullet>> (<<company>>)<</bullets>>]<</experience>>")
+    assert _body(rendered) == "[Engineer: * Cut costs by 10\\% (R\\&D Labs) * Led 3 people (R\\&D Labs)][Intern:]"
+
+
+def test_between_in_nested_bullets():
+    rendered = _render("<<#experience>><<#bullets>><<bullet>><<#between>>; <</between>><</bullets>>.<</experience>>")
+    assert _body(rendered) == "Cut costs by 10\\%; Led 3 people.."
+
+
+def test_tags_are_case_insensitive():
+    assert _body(_render("<<#SKILLS>><<Name>><</skills>>")) == "PythonC\\#SQL"
+
+
+def test_empty_sections():
+    rendered = _render("<<#certifications>><<credential>> (<<school>>)<</certifications>>",
+                       certifications=[Certification("AWS", "Amazon", "2022")])
+    assert _body(rendered) == "AWS (Amazon)"
+    assert _body(_render("<<#certifications>><<credential>><</certifications>>")) == ""
+
+
+@pytest.mark.parametrize("body, message", [
+    ("<<nickname>>", "line 2: unknown placeholder <<nickname>>"),
+    ("<<title>>", "unknown placeholder <<title>>"), # a field of the entries, outside their block
+    ("<<#skills>><<bullet>><</skills>>", "unknown placeholder <<bullet>>"),
+    ("<<#hobbies>><</hobbies>>", "the block <<#hobbies>> cannot be in the document"),
+    ("<<#bullets>><</bullets>>", "the block <<#bullets>> cannot be in the document"),
+    ("<<#skills>><<#bullets>><</bullets>><</skills>>", "the block <<#bullets>> cannot be in <<#skills>>"),
+    ("<<#between>>,<</between>>", "the block <<#between>> cannot be in the document"),
+    ("<<#skills>><<#between>><<#between>><</between>><</between>><</skills>>", "cannot be in <<#between>>"),
+    ("<<#skills>><<name>>", "the block <<#skills>> is not closed"),
+    ("<<#experience>><<#bullets>><</experience>>", "<</experience>> found, expected <</bullets>>"),
+    ("<</skills>>", "<</skills>> found, expected no closing tag"),
+])
+def test_invalid_skeletons(body, message):
+    with pytest.raises(TemplateSkeletonError, match=re.escape(message)):
+        TemplateSkeleton(_document(body))
+
+
+def test_document_body_is_required():
+    with pytest.raises(TemplateSkeletonError, match=r"no \\end\{document\}"):
+        TemplateSkeleton("\\begin{document}<<name>>")
+
+
+def test_store(tmp_path):
+    store = SkeletonStore(str(tmp_path / "skeletons"))
+    template = "\\documentclass{article}\\begin{document}Jane\\end{document}"
+    assert store.get(template) is None
+    store.put(template, TemplateSkeleton(_document("<<name>>")))
+    assert SkeletonStore(store.skeleton_dir).get(template).render(PERSONAL_INFO, [], [], [], []) == _document("Ann Lee")
+    assert template_key(template) != template_key(template + " ")
+
+    with open(store.path(template), 'w', encoding="utf-8") as file:
+        file.write(_document("<<nickname>>")) # an edit by hand
+    with pytest.raises(TemplateSkeletonError, match="unknown placeholder"):
+        SkeletonStore(store.skeleton_dir).get(template)
+    assert store.forget(template) and not store.forget(template)
+    assert store.clear() == 0